@@ -11,6 +11,8 @@ class Options {
    public OutputMethod $output;
    public InstrumentPolicy $type;
    public bool $verbose = false;
+   public string $feedbackDir = "/var/instr";
+   public int $mapSize = 0;
    public array $excludedFiles = [];
 }
 
@@ -24,7 +26,7 @@ class Argparser {
    }
 
    public function usage():void {
-      echo "Usage: $this->programName [--help] | [--verbose] [--method STR] [--policy STR] --dir STR 
+      echo "Usage: $this->programName [--help] | [--verbose] [--method STR] [--policy STR] [--feedback-dir STR] [--map-size INT] --dir STR 
 PHP Code Instrumentor
 
 Required arguments:
@@ -38,11 +40,20 @@ Optional arguments:
    --method             The output method: file,http
                            Default: file
 
+   --feedback-dir       Directory the file output method writes the feedback to.
+                        Best a tmpfs, e.g. /dev/shm/webfuzz
+                           Default: /var/instr
+
    --exclude            Filename with path names (relative to --dir)
                         of directories/files to exclude (separated by a newline character)
 
    --policy             The type of instrumentation: node,edge,node-edge,path
-                           Default: node\n";
+                           Default: node
+
+   --map-size           Number the basic blocks sequentially and keep the edge
+                        labels below this size (a power of two), like AFL.
+                        Only for the edge policy
+                           Default: random block ids\n";
       exit(1);
    }
 
@@ -53,7 +64,9 @@ Optional arguments:
          "method:",
          "policy:",
          "verbose",
-         "exclude:"
+         "exclude:",
+         "feedback-dir:",
+         "map-size:"
       );
       
       $options = getopt("", $long_opts);
@@ -67,6 +80,16 @@ Optional arguments:
       $args->verbose = isset($options["verbose"]);
       $args->output = new OutputMethod($options["method"] ?? "file");
       $args->policy = new InstrumentPolicy($options["policy"] ?? "node");
+      $args->feedbackDir = $options["feedback-dir"] ?? "/var/instr";
+
+      if (isset($options["map-size"])) {
+         $args->mapSize = intval($options["map-size"]);
+
+         if ($args->mapSize < 2 || ($args->mapSize & ($args->mapSize - 1)) != 0)
+            throw new ArgumentParserException("--map-size must be a power of two");
+         if ($args->policy != InstrumentPolicy::EDGE())
+            throw new ArgumentParserException("--map-size is only supported by the edge policy");
+      }
 
       if (isset($options["exclude"]) && \file_exists($options["exclude"])) {
          $args->excludedFiles = array_filter(explode("\n", file_get_contents($options["exclude"])));
@@ -41,18 +41,21 @@ foreach ($files as $_ => $file) {
    try {      
       switch ($args->policy) {
          case InstrumentPolicy::NODE():
-            $visitor = new NodeVisitor($args->output);
+            $visitor = new NodeVisitor($args->output, $args->feedbackDir);
             break;
          case InstrumentPolicy::EDGE():
-            $visitor = new EdgeVisitor($args->output);
+            $visitor = new EdgeVisitor($args->output, $args->feedbackDir);
             break;
          case InstrumentPolicy::NODE_EDGE():
-            $visitor = new NodeEdgeVisitor($args->output);
+            $visitor = new NodeEdgeVisitor($args->output, $args->feedbackDir);
             break;
          case InstrumentPolicy::PATH():
-            $visitor = new PathVisitor($args->output);
+            $visitor = new PathVisitor($args->output, $args->feedbackDir);
             break;
          }
+
+      $visitor->mapSize = $args->mapSize;
+      $visitor->firstBlockId = $numBlocksInstrumented;
         
       $traverser = new NodeTraverser;
       $traverser->addVisitor($visitor);
@@ -95,7 +98,7 @@ if (count($errors) > 0) {
 }
 
 if ($args->output == OutputMethod::FILE())
-   echo "==> Feedback will be written in '/var/instr/'. Make sure it is writable".PHP_EOL;
+   echo "==> Feedback will be written in '$args->feedbackDir/'. Make sure it is writable".PHP_EOL;
 
 
 # create meta file
@@ -103,11 +106,21 @@ $meta = array("basic-block-count" =>  $numBlocksInstrumented - 1,
               "output-method" => $args->output,
               "instrument-policy" => $args->policy);
 
-if ($args->policy == InstrumentPolicy::EDGE() || 
-    $args->policy == InstrumentPolicy::NODE_EDGE()) {
+if ($args->mapSize > 0) {
+   // edge labels are below the map size
+   $meta["edge-count"] = $args->mapSize;
+   $meta["map-size"] = $args->mapSize;
+} elseif ($args->policy == InstrumentPolicy::EDGE() || 
+          $args->policy == InstrumentPolicy::NODE_EDGE()) {
    // Calculate an estimate on the total number of possible CFG edges
    $edges = pow(2, ceil(log($numBlocksInstrumented - 1, 2)));
    $meta["edge-count"] = $edges;
 }
 
+if ($args->mapSize > 0 && $numBlocksInstrumented > $args->mapSize)
+   echo "==> Warning: more basic blocks than --map-size, some blocks share an id".PHP_EOL;
+
+if ($args->output == OutputMethod::FILE())
+   $meta["feedback-dir"] = $args->feedbackDir;
+
 file_put_contents($args->dir . "/instr.meta", json_encode($meta));
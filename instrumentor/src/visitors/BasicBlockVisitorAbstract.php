@@ -25,15 +25,54 @@ namespace App {
 
    abstract class BasicBlockVisitorAbstract extends NodeVisitorAbstract {
       public    OutputMethod $output;
+      public    string $feedbackDir;
       public    int $numBlocksInstrumented = 0;
+      // with a map size, blocks get dense sequential ids starting
+      // at firstBlockId instead of random ones (edge policy only)
+      public    int $mapSize = 0;
+      public    int $firstBlockId = 0;
       protected int $level = 0;
       protected Parser $parser;
 
-      function __construct(OutputMethod $output) {
+      function __construct(OutputMethod $output, string $feedbackDir = "/var/instr") {
          $this->output = $output;
+         $this->feedbackDir = rtrim($feedbackDir, "/");
          $this->parser = (new ParserFactory)->create(ParserFactory::PREFER_PHP7);
       }
 
+      /**
+       * The code of the map file name of the current request, used by the file output method
+       *
+       * The fuzzer gives every request its own id (Http Header Req-Id, e.g. Req-Id: 3-127)
+       * so that the requests in flight never share a map file. Only characters
+       * that are safe in a file name are kept.
+       *
+       * @return string  a php expression
+       */
+      public function mapFileExpr(): string {
+         return var_export($this->feedbackDir . "/map.", true) .
+                ' . preg_replace("/[^0-9A-Za-z_-]/", "", isset($_SERVER["HTTP_REQ_ID"]) ? $_SERVER["HTTP_REQ_ID"] : "0")';
+      }
+
+      /**
+       * The id of the next basic block
+       *
+       * Dense ids are the sequence number of the block times an odd constant,
+       * modulo the map size (a power of two). This numbers the blocks without
+       * repeats until the map is full, and keeps AFL style edge keys
+       * (cur ^ prev >> 1) below the map size too. The multiplication scatters
+       * the ids of neighbouring blocks, as plain sequential ids make many of
+       * their edge keys collide.
+       *
+       * @return int
+       */
+      public function newBlockId(): int {
+         if ($this->mapSize > 0)
+            return (($this->firstBlockId + $this->numBlocksInstrumented) * 2654435761) & ($this->mapSize - 1);
+
+         return random_int(256, 268435456);
+      }
+
       public function codeToNodes(string $code) {
          $code = "<?php \n".$code;
          $stmts = $this->parser->parse($code);
@@ -6,7 +6,7 @@ use App\BasicBlockVisitorAbstract;
 
 class EdgeVisitor extends BasicBlockVisitorAbstract {
    protected function makeBasicBlockStub() {
-      $uid = random_int(256, 268435456);
+      $uid = $this->newBlockId();
       $this->numBlocksInstrumented += 1;
 
       $code = '$____key = '.$uid.' ^ $GLOBALS["____instr"]["prev"];'.
@@ -18,17 +18,17 @@ class EdgeVisitor extends BasicBlockVisitorAbstract {
    }
 
    protected function makeModuleStubFile() {
-      // Request ID should be provided by Http Header Req-Id, e.g. Req-Id: 12345
+      // the map is written at once, see mapFileExpr for the file name
 
       $code = 'if (! array_key_exists("____instr", $GLOBALS)) {'.
               '   $GLOBALS["____instr"]["map"] = array();'.
               '   $GLOBALS["____instr"]["prev"] = 0;'.
               '   function ____instr_write_map() {'.
-              '      $f = fopen("/var/instr/map." . (isset($_SERVER["HTTP_REQ_ID"]) ? $_SERVER["HTTP_REQ_ID"] : 0), "w+");'.
+              '      $buf = "";'.
               '      foreach ($GLOBALS["____instr"]["map"] as $k=>$v) {'.
-              '          fwrite($f, $k . "-" . $v . "\n");'.
+              '          $buf .= $k . "-" . $v . "\n";'.
               '      }'.
-              '      fclose($f);'.
+              '      file_put_contents(' . $this->mapFileExpr() . ', $buf);'.
               '   }'.
               '   register_shutdown_function("____instr_write_map");'.
               '}';
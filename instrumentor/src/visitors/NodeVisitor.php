@@ -16,16 +16,16 @@ class NodeVisitor extends BasicBlockVisitorAbstract {
    }
 
    protected function makeModuleStubFile() {
-      // Request ID should be provided by Http Header Req-Id, e.g. Req-Id: 12345
+      // the map is written at once, see mapFileExpr for the file name
 
       $code = 'if (! array_key_exists("____instr", $GLOBALS)) {'.
               '   $GLOBALS["____instr"]["map"] = array();'.
               '   function ____instr_write_map() {'.
-              '      $f = fopen("/var/instr/map." . (isset($_SERVER["HTTP_REQ_ID"]) ? $_SERVER["HTTP_REQ_ID"] : 0), "w+");'.
+              '      $buf = "";'.
               '      foreach ($GLOBALS["____instr"]["map"] as $k=>$v) {'.
-              '          fwrite($f, $k . "-" . $v . "\n");'.
+              '          $buf .= $k . "-" . $v . "\n";'.
               '      }'.
-              '      fclose($f);'.
+              '      file_put_contents(' . $this->mapFileExpr() . ', $buf);'.
               '   }'.
               '   register_shutdown_function("____instr_write_map");'.
               '}';
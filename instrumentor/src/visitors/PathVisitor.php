@@ -5,6 +5,8 @@ require_once(__DIR__ . "/../../vendor/autoload.php");
 use App\BasicBlockVisitorAbstract;
 
 class PathVisitor extends BasicBlockVisitorAbstract {
+   const TRACE_LIMIT_EXPR = 'isset($_SERVER["HTTP_TRACE_LIMIT"]) ? (int) $_SERVER["HTTP_TRACE_LIMIT"] : PHP_INT_MAX';
+
    protected function makeBasicBlockStub() {
       $uid = random_int(256, 268435456);
       $this->numBlocksInstrumented += 1;
@@ -15,13 +17,19 @@ class PathVisitor extends BasicBlockVisitorAbstract {
    }
 
    protected function makeModuleStubFile() {
+      // one index-uid-level line per block in the order they ran,
+      // the same pairs as the I-<index>: uid-level headers of makeModuleStubHttp.
+      // Only the first blocks are written, as many as the fuzzer looks at
+      // (Http Header Trace-Limit)
+
       $code = 'if (! array_key_exists("____instr", $GLOBALS)) {'.
               '   $GLOBALS["____instr"]["map"] = array();'.
               '   function ____instr_write_map() {'.
-              '      $f = fopen("/var/instr/map." . (isset($_SERVER["HTTP_REQ_ID"]) ? $_SERVER["HTTP_REQ_ID"] : 0), "w+");'.
-              '      foreach ($GLOBALS["____instr"]["map"] as $k=>$v) {'.
-              '          fwrite($f, $v . "\n");'.
+              '      $buf = "";'.
+              '      foreach (array_slice($GLOBALS["____instr"]["map"], 0, ' . self::TRACE_LIMIT_EXPR . ', true) as $k=>$v) {'.
+              '          $buf .= $k . "-" . $v . "\n";'.
               '      }'.
+              '      file_put_contents(' . $this->mapFileExpr() . ', $buf);'.
               '   }'.
               '   register_shutdown_function("____instr_write_map");'.
               '   ob_start(null, 0, 0);'.
@@ -40,7 +48,7 @@ class PathVisitor extends BasicBlockVisitorAbstract {
       $code = 'if (! array_key_exists("____instr", $GLOBALS)) {'.
               '   $GLOBALS["____instr"]["map"] = array();'.
               '   function ____instr_write_map() {'.
-              '      foreach ($GLOBALS["____instr"]["map"] as $k=>$v) {'.
+              '      foreach (array_slice($GLOBALS["____instr"]["map"], 0, ' . self::TRACE_LIMIT_EXPR . ', true) as $k=>$v) {'.
               '          header("I-" . $k . ": " . $v);'.
               '      }'.
               '   }'.
@@ -0,0 +1,176 @@
+"""
+    End-to-end throughput benchmarks of the fuzzer against the mock target.
+
+    Each scenario starts a benchmarks/mock_target.py server and runs the
+    Fuzzer in a fresh process, with fixed random and hash seeds, for a fixed
+    duration. Reported are the requests/s, the coverage reached (and its rate),
+    the corpus size and the peak memory of the fuzzer process.
+
+    usage: python -m benchmarks.fuzzer_benchmark [--scenarios http-edge file-edge] [--duration 30]
+"""
+import json
+import os
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from os.path     import dirname, abspath
+from typing      import Any, Dict, List, Optional
+
+from tap         import Tap
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+RESULT_PREFIX = "BENCHMARK RESULT "
+
+# (mock target options, fuzzer options) of each scenario
+SCENARIOS: Dict[str, Dict[str, List[str]]] = {
+    "http-edge":     { "target": [], "fuzzer": [] },
+    "dense-edge":    { "target": ["--map_size", "65536"], "fuzzer": ["--header_fast_path"] },
+    "http-node-edge":{ "target": ["--policy", "node-edge"], "fuzzer": [] },
+    "file-edge":     { "target": ["--output_method", "file"], "fuzzer": [] },
+    "file-path":     { "target": ["--output_method", "file", "--policy", "path"], "fuzzer": [] },
+    "fast-path":     { "target": [], "fuzzer": ["--header_fast_path"] },
+    "latency":       { "target": ["--latency", "20", "--jitter", "5"], "fuzzer": [] },
+    "large-pages":   { "target": ["--links", "50", "--forms", "4", "--params", "8", "--blocks", "100"], "fuzzer": [] },
+}
+
+class BenchmarkArguments(Tap):
+    scenarios: List[str] = list(SCENARIOS.keys())
+    """Scenarios to run"""
+
+    duration: int = 30
+    """Time in seconds to run the fuzzer for in each scenario"""
+
+    worker: int = 8
+    """Number of workers of the fuzzer"""
+
+    seed: int = 0
+    """Seed of the mock target and of the fuzzer"""
+
+    port: int = 18090
+    """Port of the mock target"""
+
+    output: Optional[str] = None
+    """Also write the results as json to this file"""
+
+    child: Optional[str] = None
+    """(internal) run the fuzzer with this json configuration and print its results"""
+
+def run_fuzzer(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+        Runs in the child process
+    """
+    import random
+
+    sys.path.insert(0, ROOT)
+    from webFuzz.fuzzer import Fuzzer
+    from webFuzz.types  import Arguments
+
+    random.seed(config["seed"])
+
+    args = Arguments().parse_args(config["args"])
+    fuzzer = Fuzzer(args)
+
+    # stopped by misc.sigalarm_handler
+    signal.alarm(config["duration"])
+
+    start = time.monotonic()
+    fuzzer.run()
+    elapsed = time.monotonic() - start
+
+    return {
+        "requests": fuzzer.stats.total_requests,
+        "elapsed": elapsed,
+        "coverage": fuzzer.stats.total_cover_score,
+        "corpus": len(fuzzer._node_iterator.node_list),
+        "xss": fuzzer.stats.total_xss,
+        # in KB on linux
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+def wait_for_port(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+
+    raise TimeoutError(f"mock target did not start on port {port}")
+
+def run_scenario(name: str, args: BenchmarkArguments) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        meta_file = os.path.join(tmp, "instr.meta")
+        # the fuzzer stores its seed in ./seeds
+        os.mkdir(os.path.join(tmp, "seeds"))
+        # the target writes file feedback here, as told by instr.meta
+        feedback_dir = os.path.join(tmp, "instr")
+        os.mkdir(feedback_dir)
+        env = dict(os.environ, PYTHONPATH=ROOT, PYTHONHASHSEED=str(args.seed))
+
+        target = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_target",
+                                   "--port", str(args.port),
+                                   "--seed", str(args.seed),
+                                   "--meta_file", meta_file,
+                                   "--feedback_dir", feedback_dir] + scenario["target"],
+                                  cwd=ROOT, env=env)
+        try:
+            wait_for_port(args.port)
+
+            config = {
+                "seed": args.seed,
+                "duration": args.duration,
+                "args": ["-m", meta_file,
+                         "-w", str(args.worker),
+                         "-r", "file"] + scenario["fuzzer"] + [f"http://127.0.0.1:{args.port}/"]
+            }
+
+            # the fuzzer runs in the temporary directory, where it writes its logs
+            out = subprocess.run([sys.executable, "-m", "benchmarks.fuzzer_benchmark",
+                                  "--child", json.dumps(config)],
+                                 cwd=tmp, env=env, capture_output=True, text=True)
+        finally:
+            target.terminate()
+            target.wait()
+
+    for line in out.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+
+    raise RuntimeError(f"scenario {name} failed:\n{out.stdout}\n{out.stderr}")
+
+def report(results: Dict[str, Dict[str, Any]]) -> None:
+    print("{:<16s} {:>9s} {:>9s} {:>10s} {:>10s} {:>8s} {:>9s}".format(
+          "Scenario", "Requests", "Req/s", "Coverage%", "Cov%/min", "Corpus", "RSS (MB)"))
+
+    for (name, r) in results.items():
+        print("{:<16s} {:>9d} {:>9.1f} {:>10.3f} {:>10.3f} {:>8d} {:>9.1f}".format(
+              name, r["requests"], r["requests"] / r["elapsed"],
+              r["coverage"], 60 * r["coverage"] / r["elapsed"],
+              r["corpus"], r["max_rss"] / 1024))
+
+if __name__ == "__main__":
+    args = BenchmarkArguments().parse_args()
+
+    if args.child:
+        result = run_fuzzer(json.loads(args.child))
+        print(RESULT_PREFIX + json.dumps(result))
+        sys.exit(0)
+
+    results = {}
+    for name in args.scenarios:
+        print(f"Running {name} for {args.duration}s...", file=sys.stderr)
+        results[name] = run_scenario(name, args)
+
+    report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=3)
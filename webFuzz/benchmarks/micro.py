@@ -0,0 +1,326 @@
+"""
+    Microbenchmarks of the hot functions of the fuzzer.
+
+    Each benchmark builds its fixtures once and returns the function to time.
+    Timings are the best of several repeats (each long enough to be measured
+    reliably), in microseconds per call. Results can be stored as a named
+    baseline in benchmarks/baselines/ and later runs compared against it,
+    reporting the benchmarks that got slower (or faster) than a threshold.
+
+    usage: python -m benchmarks.micro [--filter parse] [--save NAME] [--compare NAME]
+"""
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from os          import path, makedirs
+from statistics  import median
+from typing      import Callable, Dict, List, Optional
+
+from bs4         import BeautifulSoup
+from multidict   import CIMultiDict, CIMultiDictProxy
+from tap         import Tap
+
+from webFuzz.environment   import env
+from webFuzz.types         import Arguments, CFGTuple, HTTPMethod, InstrumentArgs
+from webFuzz.misc          import request_hash, parse_file, parse_headers, to_bucket
+from webFuzz.node          import Node
+from webFuzz.node_iterator import NodeIterator
+from webFuzz.crawler       import Crawler
+from webFuzz.mutator       import Mutator
+from webFuzz.parser        import Parser
+from webFuzz.detector      import Detector
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+BASELINE_DIR = path.join(path.dirname(path.abspath(__file__)), "baselines")
+
+# minimum duration of a repeat in seconds
+MIN_REPEAT_TIME = 0.2
+REPEATS = 5
+
+# number of labels in the instrumentation feedback of a response
+FEEDBACK_LABELS = 300
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+def init_env() -> None:
+    env.args = Arguments().parse_args(["http://localhost/"])
+    env.instrument_args = InstrumentArgs({ "basic-block-count": 10000,
+                                           "output-method": "http",
+                                           "instrument-policy": "edge",
+                                           "edge-count": 16384 })
+
+def mk_node(rng: random.Random, i: int, parent: Optional[Node] = None) -> Node:
+    method = HTTPMethod.POST if i % 3 == 0 else HTTPMethod.GET
+    params = {
+        HTTPMethod.GET: { f"g{k}": [rng.choice(["1", "abc", "<b>x</b>", ""])] for k in range(3) },
+        HTTPMethod.POST: { f"p{k}": [str(rng.randrange(1000))] for k in range(2) } if method == HTTPMethod.POST else {}
+    }
+    node = Node(f"http://localhost/app/page{i % 50}.php", method, params, parent_request=parent)
+    node.exec_time = rng.uniform(0.01, 0.2)
+    node._cover_score_xor = rng.randrange(50, 300)
+
+    return node
+
+def mk_feedback(rng: random.Random) -> Dict[int, int]:
+    return { rng.randrange(256, 268435456): rng.choice([1, 1, 1, 2, 3, 7, 40]) for _ in range(FEEDBACK_LABELS) }
+
+def mk_cfg(rng: random.Random, labels: List[int]) -> CFGTuple:
+    return CFGTuple(xor_cfg={ label: to_bucket(rng.choice([1, 1, 2, 5, 40])) for label in rng.sample(labels, FEEDBACK_LABELS) },
+                    single_cfg={})
+
+def mk_corpus(rng: random.Random, size: int) -> NodeIterator:
+    labels = list(range(256, 256 + 4 * FEEDBACK_LABELS))
+    corpus = NodeIterator()
+    for i in range(size):
+        corpus.add(mk_node(rng, i), mk_cfg(rng, labels))
+
+    return corpus
+
+@benchmark("parse_headers")
+def bench_parse_headers():
+    feedback = mk_feedback(random.Random(1))
+    headers = CIMultiDict((f"I-{label}", str(count)) for (label, count) in feedback.items())
+    for (name, value) in [("Content-Type", "text/html"), ("Server", "nginx"), ("Set-Cookie", "a=b")]:
+        headers.add(name, value)
+    headers = CIMultiDictProxy(headers)
+
+    return lambda: dict(parse_headers(headers))
+
+@benchmark("parse_file")
+def bench_parse_file():
+    feedback = mk_feedback(random.Random(2))
+    f = tempfile.NamedTemporaryFile("w", suffix=".map", delete=False)
+    f.write("".join(f"{label}-{count}\n" for (label, count) in feedback.items()))
+    f.close()
+
+    return lambda: dict(parse_file(f.name))
+
+@benchmark("to_bucket")
+def bench_to_bucket():
+    counts = [count for count in mk_feedback(random.Random(3)).values()]
+    return lambda: [to_bucket(count) for count in counts]
+
+@benchmark("Node.__hash__")
+def bench_node_hash():
+    node = mk_node(random.Random(4), 0)
+
+    def run():
+        node.__dict__.pop('_hash', None)
+        return hash(node)
+
+    return run
+
+@benchmark("request_hash")
+def bench_request_hash():
+    node = mk_node(random.Random(5), 0)
+    return lambda: request_hash(node.url, node.method, node.params)
+
+@benchmark("Node.__lt__")
+def bench_node_lt():
+    rng = random.Random(6)
+    parent = mk_node(rng, 0)
+    nodes = [mk_node(rng, i, parent) for i in range(100)]
+    pairs = list(zip(nodes, reversed(nodes)))
+
+    return lambda: [a < b for (a, b) in pairs]
+
+@benchmark("NodeIterator.add")
+def bench_node_iterator_add():
+    rng = random.Random(7)
+    corpus = mk_corpus(rng, 500)
+    labels = list(range(256, 256 + 4 * FEEDBACK_LABELS))
+    candidates = [(mk_node(rng, i), mk_cfg(rng, labels)) for i in range(1000)]
+    index = [0]
+
+    def run():
+        (node, cfg) = candidates[index[0] % len(candidates)]
+        index[0] += 1
+        node.ref_count = 0
+        return corpus.add(node, cfg)
+
+    return run
+
+def mk_coverage_check(map_size: Optional[int]) -> Callable[[], object]:
+    rng = random.Random(8)
+    labels = list(range(256, 256 + 4 * FEEDBACK_LABELS))
+
+    instrument_args = env.instrument_args
+    if map_size:
+        env.instrument_args = InstrumentArgs({ "basic-block-count": 10000,
+                                               "output-method": "http",
+                                               "instrument-policy": "edge",
+                                               "edge-count": map_size,
+                                               "map-size": map_size })
+    try:
+        corpus = NodeIterator()
+    finally:
+        env.instrument_args = instrument_args
+
+    # responses without new coverage are checked in full
+    cfgs = [mk_cfg(rng, labels) for _ in range(50)]
+    for (i, cfg) in enumerate(cfgs):
+        corpus.add(mk_node(rng, i), cfg)
+
+    return lambda: [corpus.has_new_coverage(cfg) for cfg in cfgs]
+
+@benchmark("NodeIterator.has_new_coverage")
+def bench_has_new_coverage():
+    return mk_coverage_check(None)
+
+@benchmark("NodeIterator.has_new_coverage[dense]")
+def bench_has_new_coverage_dense():
+    return mk_coverage_check(16384)
+
+@benchmark("Crawler.__add__")
+def bench_crawler_add():
+    rng = random.Random(8)
+    crawler = Crawler(init_seed=set(), block_rules=[])
+    # links of a page, mostly seen before and a few new ones
+    known = [mk_node(rng, i) for i in range(45)]
+    crawler += set(known)
+    for _ in known:
+        # sent links become seen
+        next(crawler)
+    index = [0]
+
+    def run():
+        index[0] += 1
+        new = { Node(f"http://localhost/app/new{index[0]}_{k}.php", HTTPMethod.GET) for k in range(5) }
+        crawler.__add__(set(known) | new)
+
+    return run
+
+@benchmark("Mutator.mutate")
+def bench_mutate():
+    rng = random.Random(9)
+    corpus = mk_corpus(rng, 200)
+    mutator = Mutator()
+    nodes = corpus.node_list[:50]
+
+    return lambda: [mutator.mutate(node, corpus) for node in nodes[:10]]
+
+@benchmark("Parser.parse")
+def bench_parser():
+    with open(path.join(ROOT, "tests", "test_html.html")) as f:
+        soup = BeautifulSoup(f.read(), "html5lib")
+    node = Node("http://localhost/app/index.php", HTTPMethod.GET)
+
+    return lambda: Parser.parse(node, soup)
+
+@benchmark("Detector.xss_scanner")
+def bench_xss_scanner():
+    with open(path.join(ROOT, "tests", "xss.html")) as f:
+        soup = BeautifulSoup(f.read(), "html5lib")
+    detector = Detector()
+    node = Node("http://localhost/app/index.php", HTTPMethod.GET, { HTTPMethod.GET: { "q": ["x"] } })
+
+    return lambda: detector.xss_scanner(node, soup)
+
+def time_benchmark(func: Callable[[], object]) -> Dict[str, float]:
+    """
+        :return: the best and median time per call in microseconds
+    """
+    timer = timeit.Timer(func)
+    (number, elapsed) = timer.autorange()
+    number = max(1, int(number * MIN_REPEAT_TIME / max(elapsed, 1e-9)))
+
+    times = [t / number * 1e6 for t in timer.repeat(repeat=REPEATS, number=number)]
+    return { "best": min(times), "median": median(times) }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+class MicroArguments(Tap):
+    filter: Optional[str] = None
+    """Only run the benchmarks whose name contains this string"""
+
+    save: Optional[str] = None
+    """Store the results as the named baseline"""
+
+    compare: Optional[str] = None
+    """Compare the results against the named baseline"""
+
+    threshold: float = 0.10
+    """Relative slowdown (of the best time) reported as a regression"""
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """
+        Print the change of each benchmark against the baseline
+
+        :return: the names of the regressed benchmarks
+    """
+    regressions = []
+
+    print("\n{:<22s} {:>12s} {:>12s} {:>8s}".format("Benchmark", "Baseline", "Current", "Change"))
+    for (name, result) in results.items():
+        if name not in baseline:
+            print("{:<22s} {:>12s} {:>12.2f} {:>8s}".format(name, "-", result["best"], "new"))
+            continue
+
+        before = baseline[name]["best"]
+        change = result["best"] / before - 1
+
+        verdict = ""
+        if change > threshold:
+            verdict = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            verdict = "faster"
+
+        print("{:<22s} {:>12.2f} {:>12.2f} {:>+7.1f}% {:s}".format(name, before, result["best"], 100 * change, verdict))
+
+    return regressions
+
+def main() -> int:
+    args = MicroArguments().parse_args()
+    init_env()
+
+    # logging is not set up, so warnings the benchmarks trigger (e.g. the
+    # xss found by the Detector) would go to stderr, amid the results
+    logging.getLogger("webFuzz").addHandler(logging.NullHandler())
+
+    results = {}
+    print("{:<22s} {:>12s} {:>12s}".format("Benchmark", "Best (us)", "Median (us)"))
+    for (name, setup) in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+
+        random.seed(0)
+        results[name] = time_benchmark(setup())
+        print("{:<22s} {:>12.2f} {:>12.2f}".format(name, results[name]["best"], results[name]["median"]))
+
+    if args.save:
+        makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path.join(BASELINE_DIR, args.save + ".json"), "w") as f:
+            json.dump({ "revision": git_revision(),
+                        "python": platform.python_version(),
+                        "results": results }, f, indent=3)
+
+    if args.compare:
+        with open(path.join(BASELINE_DIR, args.compare + ".json")) as f:
+            baseline = json.load(f)
+
+        print(f"\nBaseline {args.compare} (revision {baseline['revision']}, python {baseline['python']})")
+        if compare(results, baseline["results"], args.threshold):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+    A stand-in for a web application instrumented by instrumentor/src/instrumentor.php,
+    for benchmarking the fuzzer without PHP and a web server.
+
+    The application is a graph of pages generated from a seed. Each page links
+    to other pages, has forms, and runs a "program" of basic blocks whose path
+    depends on the parameters it receives (whether they are set, numeric, contain
+    special characters, are arrays...), with loops whose hit counts depend on the
+    parameter lengths. The path is reported like the instrumentor does: edges are
+    labelled AFL-style (block ^ prev >> 1), or for the path policy the blocks are
+    listed in order, and the map is sent in I-<label> headers
+    or written to <feedback_dir>/map.<REQ-ID> by the end of the request.
+
+    usage: python -m benchmarks.mock_target --port 8080 --meta_file /tmp/instr.meta
+"""
+import asyncio
+import html
+import json
+import os
+import random
+
+from collections import Counter
+from typing      import Dict, List, Optional
+
+from aiohttp     import web
+from tap         import Tap
+
+# blocks of the code shared by all pages (bootstrapping, templates...)
+COMMON_BLOCKS = 20
+
+# for each parameter a page reads: how its value is classified, see Page.trace
+VALUE_CLASSES = ["missing", "empty", "numeric", "alpha", "special", "array", "long"]
+
+SPECIAL_CHARS = set("<>'\"&;()")
+
+class TargetArguments(Tap):
+    port: int = 8080
+    """Port to listen on"""
+
+    seed: int = 0
+    """Seed of the generated application"""
+
+    pages: int = 1000
+    """Number of pages of the application"""
+
+    links: int = 5
+    """Number of links on each page"""
+
+    forms: int = 1
+    """Number of forms on each page"""
+
+    params: int = 3
+    """Number of parameters each page reads (and each form has)"""
+
+    blocks: int = 10
+    """Number of basic blocks in the code of each page"""
+
+    reflect: float = 0.2
+    """Fraction of pages that reflect their parameters without escaping them"""
+
+    latency: float = 0
+    """Mean time in ms added to each response"""
+
+    jitter: float = 0
+    """Standard deviation in ms of the added time"""
+
+    output_method: str = "http"
+    """Feedback output method: http, file"""
+
+    policy: str = "edge"
+    """Instrumentation policy: edge, node, node-edge, path"""
+
+    map_size: int = 0
+    """Number the blocks sequentially below this size like the instrumentor's --map-size (edge policy), 0 for random ids"""
+
+    feedback_dir: str = "/var/instr"
+    """Directory of the feedback files of the file output method"""
+
+    meta_file: Optional[str] = None
+    """Write the instr.meta of the application to this file"""
+
+class Page:
+    def __init__(self, id_: int, args: TargetArguments, rng: random.Random, new_block):
+        self.id = id_
+        self.url = f"/page{id_}.php"
+        self.params = [f"p{id_}_{i}" for i in range(args.params)]
+        self.links = [rng.randrange(args.pages) for _ in range(args.links)]
+        self.reflect = rng.random() < args.reflect
+        self.forms = args.forms
+
+        self.blocks = [new_block() for _ in range(args.blocks)]
+        # one branch per value class of each parameter, plus a loop body
+        self.branches = { param: { cls: new_block() for cls in VALUE_CLASSES + ["loop"] }
+                            for param in self.params }
+
+    @staticmethod
+    def classify(name: str, value: str) -> str:
+        if name.endswith("[]"):
+            return "array"
+        if value == "":
+            return "empty"
+        if len(value) > 32:
+            return "long"
+        if value.isdigit():
+            return "numeric"
+        if SPECIAL_CHARS.intersection(value):
+            return "special"
+        return "alpha"
+
+    def trace(self, common: List[int], query: Dict[str, str]) -> List[int]:
+        """
+            The basic blocks executed for a request with the given parameters
+        """
+        path = list(common[:COMMON_BLOCKS // 2])
+        # the first page block runs before the parameters are read
+        path.append(self.blocks[0])
+
+        for param in self.params:
+            branches = self.branches[param]
+
+            name = param if param in query else param + "[]"
+            if name not in query:
+                path.append(branches["missing"])
+                continue
+
+            value = query[name]
+            path.append(branches[Page.classify(name, value)])
+            # e.g. a sanitization loop over the value
+            path.extend([branches["loop"]] * min(len(value), 200))
+
+        path.extend(self.blocks[1:])
+        path.extend(common[COMMON_BLOCKS // 2:])
+
+        return path
+
+    def render(self, pages: List["Page"], query: Dict[str, str]) -> str:
+        body = [f"<html><head><title>Page {self.id}</title></head><body>"]
+
+        for target in self.links:
+            page = pages[target]
+            body.append(f'<a href="{page.url}?{page.params[0]}=1">{page.url}</a>')
+
+        inputs = "".join(f'<input type="text" name="{param}" value="a">' for param in self.params)
+        for i in range(self.forms):
+            method = "post" if i % 2 == 0 else "get"
+            body.append(f'<form method="{method}" action="{self.url}">{inputs}<input type="submit"></form>')
+
+        for (name, value) in query.items():
+            if not self.reflect:
+                value = html.escape(value)
+            body.append(f"<div>{html.escape(name)}: {value}</div>")
+
+        body.append("</body></html>")
+        return "\n".join(body)
+
+class MockTarget:
+    def __init__(self, args: TargetArguments):
+        self.args = args
+        self.requests = 0
+
+        rng = random.Random(args.seed)
+        used = set()
+        count = 0
+
+        def new_block() -> int:
+            nonlocal count
+            count += 1
+
+            if args.map_size:
+                # dense ids like the instrumentor's
+                return ((count - 1) * 2654435761) & (args.map_size - 1)
+
+            # labels are random like the instrumentor's
+            while True:
+                uid = rng.randint(256, 268435456)
+                if uid not in used:
+                    used.add(uid)
+                    return uid
+
+        self.common = [new_block() for _ in range(COMMON_BLOCKS)]
+        self.pages = [Page(i, args, rng, new_block) for i in range(args.pages)]
+        self.block_count = count
+
+        self._rng = random.Random(args.seed)
+
+    @property
+    def meta(self) -> Dict:
+        meta = {
+            "basic-block-count": self.block_count,
+            "output-method": self.args.output_method,
+            "instrument-policy": self.args.policy
+        }
+        if self.args.map_size:
+            meta["edge-count"] = meta["map-size"] = self.args.map_size
+        elif self.args.policy in ("edge", "node-edge"):
+            meta["edge-count"] = 1 << (self.block_count - 1).bit_length()
+        if self.args.output_method == "file":
+            meta["feedback-dir"] = self.args.feedback_dir
+
+        return meta
+
+    def feedback(self, path: List[int]) -> Dict[int, str]:
+        if self.args.policy == "path":
+            # blocks of the generated pages are not nested
+            return { index: f"{uid}-0" for (index, uid) in enumerate(path) }
+
+        edges: Counter = Counter()
+        nodes: Counter = Counter()
+
+        prev = 0
+        for uid in path:
+            edges[uid ^ prev] += 1
+            nodes[uid] += 1
+            prev = uid >> 1
+
+        if self.args.policy == "edge":
+            return { label: str(count) for (label, count) in edges.items() }
+        if self.args.policy == "node":
+            return { label: str(count) for (label, count) in nodes.items() }
+
+        return { label: f"{edges.get(label, 0)}-{nodes.get(label, 0)}"
+                    for label in edges.keys() | nodes.keys() }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+
+        query = dict(request.query)
+        if request.method == "POST":
+            query.update((name, str(value)) for (name, value) in (await request.post()).items())
+
+        page_id = request.path[len("/page"):-len(".php")]
+        if request.path == "/":
+            page = self.pages[0]
+        elif page_id.isdigit() and int(page_id) < len(self.pages):
+            page = self.pages[int(page_id)]
+        else:
+            raise web.HTTPNotFound()
+
+        if self.args.latency or self.args.jitter:
+            await asyncio.sleep(max(0, self._rng.gauss(self.args.latency, self.args.jitter)) / 1000)
+
+        feedback = self.feedback(page.trace(self.common, query))
+        response = web.Response(text=page.render(self.pages, query), content_type="text/html")
+
+        if self.args.output_method == "http":
+            for (label, value) in feedback.items():
+                response.headers[f"I-{label}"] = value
+        else:
+            req_id = request.headers.get("REQ-ID", "0")
+            with open(os.path.join(self.args.feedback_dir, f"map.{req_id}"), "w") as f:
+                f.write("".join(f"{label}-{value}\n" for (label, value) in feedback.items()))
+
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        return app
+
+    def write_meta(self, filename: str) -> None:
+        with open(filename, "w") as f:
+            json.dump(self.meta, f)
+
+if __name__ == "__main__":
+    args = TargetArguments().parse_args()
+    target = MockTarget(args)
+
+    if args.meta_file:
+        target.write_meta(args.meta_file)
+
+    web.run_app(target.app(), host="127.0.0.1", port=args.port, print=None, access_log=None)
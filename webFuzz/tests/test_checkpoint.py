@@ -0,0 +1,110 @@
+"""
+pytest tests/test_checkpoint.py -v
+"""
+import copy
+import pytest
+
+from unittest.mock import Mock, patch
+
+from webFuzz.checkpoint import Checkpoint
+from webFuzz.crawler import Crawler
+from webFuzz.node_iterator import NodeIterator
+from webFuzz.detector import Detector
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod, Policy, Statistics, CFGTuple, XSSConfidence
+
+env = Mock()
+env.instrument_args.policy = Policy.EDGE
+env.instrument_args.edges = 1024
+env.instrument_args.new_bitmap.return_value = None
+env.args.uniq_frag = False
+
+def mk_state():
+    crawler = Crawler(init_seed=set(), block_rules=[])
+    iterator = NodeIterator()
+    detector = Detector()
+    stats = Statistics(None)
+
+    return (crawler, iterator, detector, stats)
+
+def fuzz(crawler, iterator, start, count):
+    for i in range(start, start + count):
+        crawler += { Node("http://a/page%d.php" % i, HTTPMethod.GET),
+                     Node("http://a/link%d.php?x=%d" % (i, i), HTTPMethod.GET) }
+
+        request = next(crawler)
+        request.exec_time = 0.01 * i
+        request._cover_score_xor = 1
+        iterator.add(request, CFGTuple(xor_cfg={ i: 1 }, single_cfg={}))
+
+        mutated = Node(request.url, HTTPMethod.POST,
+                       { HTTPMethod.POST: { "p": [str(i)] } },
+                       parent_request=request)
+        mutated._cover_score_xor = 2
+        mutated.xss_confidence = XSSConfidence.LOW
+        iterator.add(mutated, CFGTuple(xor_cfg={ i: 2, 1000 + i: 1 }, single_cfg={}))
+
+def summary(crawler, iterator, detector):
+    corpus = sorted((n.url, n.method, n.picked_score, n.ref_count, n.cover_score_raw,
+                     n.mutated_score, n.xss_confidence, n.exec_time) for n in iterator.node_list)
+    cfg = { label: tuple((n.url, n.method) if n else None for n in nodes)
+                for (label, nodes) in iterator._total_cfg_xor.items() }
+
+    return (corpus, cfg,
+            set(n.full_url for n in crawler._crawler_unseen),
+            crawler._crawler_seen_full,
+            crawler._crawler_seen_base,
+            detector._flagged_elements)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('rounds', [1, 3, 25])
+@patch("webFuzz.node.env", env)
+@patch("webFuzz.node_iterator.env", env)
+async def test_save_resume(tmp_path, rounds):
+    filename = str(tmp_path / "checkpoint.bin")
+
+    (crawler, iterator, detector, stats) = mk_state()
+    checkpoint = Checkpoint(filename, crawler, iterator, detector, stats)
+
+    # incremental checkpoints, with compaction every COMPACT_EVERY
+    for r in range(rounds):
+        fuzz(crawler, iterator, r * 5, 5)
+        for node in iterator.node_list[:3]:
+            node.picked_score += 1
+
+        detector._flagged_elements[XSSConfidence.LOW]["http://a/%d" % r] = {"id%d" % r}
+        stats.total_requests += 10
+
+        await checkpoint.save()
+
+    (crawler2, iterator2, detector2, stats2) = mk_state()
+    assert Checkpoint(filename, crawler2, iterator2, detector2, stats2).load()
+
+    assert summary(crawler2, iterator2, detector2) == summary(crawler, iterator, detector)
+    assert stats2.total_requests == 10 * rounds
+
+@pytest.mark.asyncio
+@patch("webFuzz.node.env", env)
+@patch("webFuzz.node_iterator.env", env)
+async def test_truncated_record(tmp_path):
+    filename = str(tmp_path / "checkpoint.bin")
+
+    (crawler, iterator, detector, stats) = mk_state()
+    checkpoint = Checkpoint(filename, crawler, iterator, detector, stats)
+
+    fuzz(crawler, iterator, 0, 5)
+    await checkpoint.save()
+    expected = copy.deepcopy(summary(crawler, iterator, detector))
+
+    fuzz(crawler, iterator, 5, 5)
+    await checkpoint.save()
+
+    # simulate a crash in the middle of the second write
+    with open(filename, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3)
+
+    (crawler2, iterator2, detector2, stats2) = mk_state()
+    assert Checkpoint(filename, crawler2, iterator2, detector2, stats2).load()
+
+    (corpus, cfg, unseen, _, seen_base, flagged) = summary(crawler2, iterator2, detector2)
+    assert (corpus, cfg, unseen, seen_base, flagged) == expected[:3] + expected[4:]
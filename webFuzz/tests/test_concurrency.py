@@ -0,0 +1,46 @@
+"""
+pytest tests/test_concurrency.py -v
+"""
+import pytest
+
+from webFuzz.concurrency import ConcurrencyController, MIN_ROUND_SAMPLES
+
+def run_round(controller, rtt, errors=0):
+    samples = max(controller.limit, MIN_ROUND_SAMPLES)
+    for i in range(samples):
+        controller.record(rtt, error=i < errors)
+
+@pytest.mark.parametrize('rounds, expected_limit',
+                        [
+                            # slow start doubles the limit every round
+                            ([0.1, 0.1, 0.1], 8),
+                            # never above the maximum
+                            ([0.1] * 10, 32),
+                            # latency above target scales the limit by target/rtt
+                            ([0.1, 0.1, 0.1, 0.1, 1.25], 12),
+                            # additive increase after the first decrease
+                            ([0.1, 0.1, 0.1, 0.1, 1.25, 0.1, 0.1], 14),
+                        ])
+def test_latency_rounds(rounds, expected_limit):
+    controller = ConcurrencyController(max_limit=32, latency_target=1.0)
+
+    for rtt in rounds:
+        run_round(controller, rtt)
+
+    assert controller.limit == expected_limit
+
+def test_error_backoff():
+    controller = ConcurrencyController(max_limit=32, latency_target=1.0)
+
+    for _ in range(4):
+        run_round(controller, 0.1)
+    assert controller.limit == 16
+
+    run_round(controller, 0.1, errors=8)
+    assert controller.limit == 8
+    assert controller.last_decision.startswith("backoff")
+
+    # never below a single request
+    for _ in range(10):
+        run_round(controller, 0.1, errors=10)
+    assert controller.limit == 1
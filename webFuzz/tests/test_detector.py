@@ -0,0 +1,45 @@
+"""
+pytest tests/test_detector.py -v
+"""
+import pytest
+
+from bs4 import BeautifulSoup
+from unittest.mock import Mock, patch
+
+from webFuzz.detector import Detector, MarkerScanner, has_marker
+from webFuzz.misc import longest_str_match
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod, Policy, XSSConfidence
+
+@pytest.mark.parametrize('content',
+                        [
+                            "<p>nothing here</p>",
+                            "<img src=x onerror=alert(0xdeadbeef)>",
+                            "<b>deadb</b>",
+                            "<b>0xdea db</b>",
+                            "0xdeadbeef"[5:] + "....",
+                        ])
+def test_has_marker(content):
+    assert has_marker(content) == (longest_str_match(content, "0xdeadbeef") >= 5)
+
+@pytest.mark.parametrize('chunks, expected_out',
+                        [
+                            (["<a>0xd", "eadbeef</a>"], True),
+                            (["<a>0x", "d", "e", "a", "d</a>"], True),
+                            (["<a>0xde", "</a>adbe"], False),
+                            ([], False),
+                        ])
+def test_marker_scanner(chunks, expected_out):
+    scanner = MarkerScanner()
+    for chunk in chunks:
+        scanner.feed(chunk)
+
+    assert scanner.found == expected_out
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False),
+                                instrument_args=Mock(policy=Policy.EDGE, edges=1000)))
+def test_xss_scanner_multi_valued_attribute():
+    html = BeautifulSoup('<div class="a 0xdeadbeef b" onclick="alert(0xdeadbeef)">x</div>', "html5lib")
+    node = Node("http://a/b.php", HTTPMethod.GET)
+
+    assert Detector().xss_scanner(node, html) == XSSConfidence.HIGH
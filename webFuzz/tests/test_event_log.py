@@ -0,0 +1,73 @@
+"""
+pytest tests/test_event_log.py -v
+"""
+import pytest
+
+from unittest.mock import Mock, patch
+
+from webFuzz.event_log import EventLog, read_events
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod, XSSConfidence
+
+@pytest.mark.parametrize('count', [0, 1, 1000])
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_round_trip(tmp_path, count):
+    filename = str(tmp_path / "events.bin")
+
+    log = EventLog(filename)
+    parent = None
+    for i in range(count):
+        node = Node("http://a/%d.php" % i, HTTPMethod.GET, parent_request=parent)
+        node.exec_time = 0.5
+        node.new_buckets = i % 3
+        node.mutation_ops = i % 128
+        node._cover_score_xor = i
+        node.xss_confidence = XSSConfidence.HIGH if i % 2 else XSSConfidence.NONE
+
+        log.record(node, 200 if i % 10 else 0)
+        parent = node
+    log.close()
+
+    events = read_events(filename)
+
+    assert list(events["id"]) == list(range(1, count + 1))
+    assert list(events["parent_id"]) == list(range(0, count))
+    assert list(events["status"]) == [200 if i % 10 else 0 for i in range(count)]
+    assert list(events["new_buckets"]) == [i % 3 for i in range(count)]
+    assert list(events["mutation_ops"]) == [i % 128 for i in range(count)]
+    assert list(events["cover_score"]) == list(range(count))
+    assert list(events["exec_time"]) == [0.5] * count
+    assert list(events["xss_confidence"]) == [XSSConfidence.HIGH.value if i % 2 else 0 for i in range(count)]
+    assert all(a <= b for (a, b) in zip(events["time"], events["time"][1:]))
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_partial_record(tmp_path):
+    filename = str(tmp_path / "events.bin")
+
+    log = EventLog(filename)
+    for i in range(5):
+        log.record(Node("http://a/%d.php" % i, HTTPMethod.GET), 200)
+    log.close()
+
+    # simulate a crash in the middle of a write
+    with open(filename, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3)
+
+    assert list(read_events(filename)["id"]) == [1, 2, 3, 4]
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_read_some_fields(tmp_path):
+    filename = str(tmp_path / "events.bin")
+
+    log = EventLog(filename)
+    for i in range(3):
+        log.record(Node("http://a/%d.php" % i, HTTPMethod.GET), 200 + i)
+    log.close()
+
+    events = read_events(filename, names=["status"])
+
+    assert list(events) == ["status"]
+    assert list(events["status"]) == [200, 201, 202]
+
+    with pytest.raises(ValueError):
+        read_events(filename, names=["nope"])
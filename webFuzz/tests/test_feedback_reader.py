@@ -0,0 +1,150 @@
+"""
+pytest tests/test_feedback_reader.py -v
+"""
+import asyncio
+import sys
+import pytest
+
+from unittest.mock import Mock, patch
+
+from webFuzz.feedback_reader import FeedbackReader, read_feedback_file
+from webFuzz.worker import Worker
+
+env = Mock(instrument_args=Mock(max_trace=None, feedback_dir="/tmp/instr"))
+
+def test_read_feedback_file(tmp_path):
+    filename = tmp_path / "map.1"
+    filename.write_text("228253266-13\n223121378-0-1\n\n26380490-1\n")
+
+    assert read_feedback_file(str(filename)) == [(228253266, "13"), (223121378, "0-1"), (26380490, "1")]
+    assert read_feedback_file(str(tmp_path / "map.2")) == []
+    # a path trace is cut
+    assert read_feedback_file(str(filename), 2) == [(228253266, "13"), (223121378, "0-1")]
+
+@patch("webFuzz.feedback_reader.env", env)
+def test_req_id():
+    worker = Worker("2", Mock(), Mock(), Mock(), Mock(), Mock(), Mock())
+
+    assert [worker.next_req_id() for _ in range(3)] == ["2-1", "2-2", "2-3"]
+
+@patch("webFuzz.feedback_reader.env", env)
+def test_default_directory():
+    # the feedback-dir of instr.meta
+    assert FeedbackReader().directory == "/tmp/instr"
+
+@pytest.mark.asyncio
+@patch("webFuzz.feedback_reader.env", env)
+async def test_read(tmp_path):
+    reader = FeedbackReader(str(tmp_path))
+
+    (tmp_path / "map.7-1").write_text("10-1\n")
+    (tmp_path / "map.7-2").write_text("11-1\n")
+    # requests of a worker may complete out of order
+    assert await reader.read("7-2") == [(11, "1")]
+    assert await reader.read("7-1") == [(10, "1")]
+    assert await reader.read("7-3") == []
+
+    reader.close()
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+@patch("webFuzz.feedback_reader.CLEANUP_BATCH", 3)
+@patch("webFuzz.feedback_reader.env", env)
+async def test_cleanup_batch(tmp_path):
+    reader = FeedbackReader(str(tmp_path))
+
+    for seq in range(1, 5):
+        (tmp_path / f"map.1-{seq}").write_text("10-1\n")
+
+    await reader.read("1-1")
+    reader.discard("1-2")
+    assert len(list(tmp_path.iterdir())) == 4
+
+    await reader.read("1-3")
+    # removed in the executor
+    await asyncio.sleep(0.05)
+    assert [f.name for f in tmp_path.iterdir()] == ["map.1-4"]
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is linux only")
+@patch("webFuzz.feedback_reader.env", env)
+async def test_read_waits_for_close(tmp_path):
+    reader = FeedbackReader(str(tmp_path), inotify=True)
+
+    async def write_late():
+        await asyncio.sleep(0.05)
+        with open(tmp_path / "map.3-1", "w") as f:
+            f.write("10-1\n")
+            # a partial map must not be read
+            f.flush()
+            await asyncio.sleep(0.05)
+            f.write("11-2\n")
+
+    writer = asyncio.create_task(write_late())
+    assert await reader.read("3-1") == [(10, "1"), (11, "2")]
+    await writer
+
+    # closed before it was asked for
+    (tmp_path / "map.3-2").write_text("12-1\n")
+    await asyncio.sleep(0.05)
+    assert await reader.read("3-2") == [(12, "1")]
+
+    reader.close()
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is linux only")
+@patch("webFuzz.feedback_reader.CLOSE_WAIT_TIMEOUT", 0.05)
+@patch("webFuzz.feedback_reader.env", env)
+async def test_read_close_timeout(tmp_path):
+    reader = FeedbackReader(str(tmp_path), inotify=True)
+
+    assert await reader.read("4-1") == []
+
+    reader.close()
+
+@pytest.mark.asyncio
+@patch("webFuzz.feedback_reader.env", env)
+@patch("webFuzz.feedback_reader.CLEANUP_BATCH", 2)
+async def test_discard_late_map(tmp_path):
+    reader = FeedbackReader(str(tmp_path))
+
+    async def read(seq):
+        reader.expect(f"5-{seq}")
+        (tmp_path / f"map.5-{seq}").write_text("10-1\n")
+        await reader.read(f"5-{seq}")
+
+    reader.expect("5-1")
+    reader.discard("5-1")
+    await read(2)
+    await asyncio.sleep(0.05)
+
+    # written after the request was given up on (and after its batch)
+    (tmp_path / "map.5-1").write_text("10-1\n")
+
+    await read(3)
+    await read(4)
+    await asyncio.sleep(0.05)
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is linux only")
+@patch("webFuzz.feedback_reader.env", env)
+async def test_discard_late_map_inotify(tmp_path):
+    reader = FeedbackReader(str(tmp_path), inotify=True)
+
+    # start watching
+    reader.expect("6-1")
+    (tmp_path / "map.6-1").write_text("10-1\n")
+    await reader.read("6-1")
+
+    reader.expect("6-2")
+    reader.discard("6-2")
+    (tmp_path / "map.6-2").write_text("10-1\n")
+    # the map of no request of ours
+    (tmp_path / "map.other").write_text("10-1\n")
+    await asyncio.sleep(0.05)
+
+    assert reader._closed == set()
+
+    reader.close()
+    assert [f.name for f in tmp_path.iterdir()] == ["map.other"]
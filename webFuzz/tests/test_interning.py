@@ -0,0 +1,83 @@
+"""
+pytest tests/test_interning.py -v
+"""
+from unittest.mock import Mock, patch
+
+from webFuzz.interning import InternTable, UrlTable, URLS, PARAM_NAMES
+from webFuzz.crawler import Crawler
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod
+
+def test_intern_table():
+    table = InternTable()
+
+    assert table.id("a") == 0
+    assert table.id("b") == 1
+    assert table.id("".join(["a"])) == 0
+    assert len(table) == 2
+
+    value = "".join(["b", "c"])
+    assert table.intern(value) is value
+    assert table.intern("".join(["b", "c"])) is value
+    assert table.value(table.id("bc")) is value
+
+def test_url_table():
+    table = UrlTable()
+    id_ = table.id("http://a/b.php")
+    table.id("http://a/c.php")
+
+    assert table.parsed(id_).path == "/b.php"
+    # parsed once
+    assert table.parsed(id_) is table.parsed(id_)
+    assert table.parsed(table.id("http://a/d.php")).path == "/d.php"
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_node_shares_strings():
+    node1 = Node("http://a/b.php?" + "".join(["na", "me"]) + "=1", HTTPMethod.GET)
+    node2 = Node("http://a/b.php?" + "".join(["na", "me"]) + "=2", HTTPMethod.POST,
+                 { HTTPMethod.POST: { "".join(["na", "me"]): ["3"] } })
+
+    assert node1.url_id == node2.url_id
+    assert node1.url is node2.url
+    assert node1.url_object.query == "name=1"
+
+    (name1,) = node1.params[HTTPMethod.GET]
+    (name2,) = node2.params[HTTPMethod.POST]
+    assert name1 is name2 is PARAM_NAMES.intern("name")
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_crawler_state():
+    crawler = Crawler(init_seed={ Node("http://a/e.php?x=1", HTTPMethod.GET) }, block_rules=[])
+    request = next(crawler)
+    crawler.mark_crawled(request)
+
+    state = crawler.dump_state(lambda node: 0)
+    # stored by url, not by the process local id
+    assert state["seen_base"][HTTPMethod.GET.value] == { "http://a/e.php": 0 }
+    assert state["parsed_base"][HTTPMethod.GET.value] == ["http://a/e.php"]
+
+    crawler2 = Crawler(block_rules=[])
+    crawler2.load_state(state, {})
+    assert crawler2.is_crawled(Node("http://a/e.php?y=2", HTTPMethod.GET))
+    assert crawler2._crawler_seen_base[HTTPMethod.GET] == { URLS.id("http://a/e.php"): 0 }
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_node_params_copied():
+    params = { HTTPMethod.GET: { "a": ["1"] } }
+    node = Node("http://a/b.php?c=2", HTTPMethod.GET, params)
+
+    assert params == { HTTPMethod.GET: { "a": ["1"] } }
+    assert node.params == { HTTPMethod.GET: { "a": ["1"], "c": ["2"] }, HTTPMethod.POST: {} }
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_mutated_names_not_interned():
+    parent = Node("http://a/b.php?known=1", HTTPMethod.GET)
+    size = len(PARAM_NAMES)
+
+    mutated = Node("http://a/b.php", HTTPMethod.GET,
+                   { HTTPMethod.GET: { "".join(["kno", "wn"]): ["2"], "x8f3kq": ["3"] } },
+                   parent_request=parent)
+
+    assert len(PARAM_NAMES) == size
+    (known, _) = mutated.params[HTTPMethod.GET]
+    assert known is PARAM_NAMES.intern("known")
@@ -0,0 +1,46 @@
+"""
+pytest tests/test_logging.py -v
+"""
+import logging
+import pytest
+
+from queue import SimpleQueue
+
+from webFuzz.types import CustomFormatter, DeferredQueueHandler, get_logger
+
+@pytest.mark.parametrize('name, level, expected_out',
+                        [
+                            ("webFuzz.worker/1234", logging.INFO,
+                             "\x1b[96;11m[T] webFuzz.worker INFO [Worker 1234] f(1) hello 5\x1b[0m"),
+                            ("webFuzz.fuzzer", logging.ERROR,
+                             "\x1b[31;21m[T] webFuzz.fuzzer ERROR f(1) hello 5\x1b[0m"),
+                            ("webFuzz.fuzzer", 25,
+                             "[T] webFuzz.fuzzer Level 25 f(1) hello 5"),
+                        ])
+def test_custom_formatter(name, level, expected_out):
+    formatter = CustomFormatter()
+    formatter.formatTime = lambda record, datefmt=None: "T"
+    for formatter_ in formatter._formatters.values():
+        formatter_.formatTime = formatter.formatTime
+
+    record = logging.LogRecord(name, level, "x.py", 1, "hello %d", (5,), None, func="f")
+
+    # formatting twice gives the same result
+    assert formatter.format(record) == expected_out
+    assert formatter.format(record) == expected_out
+
+def test_deferred_queue_handler():
+    queue = SimpleQueue()
+    handler = DeferredQueueHandler(queue)
+
+    args = ["a"]
+    record = logging.LogRecord("webFuzz.x", logging.INFO, "x.py", 1, "list %s", (args,), None)
+    handler.emit(record)
+
+    # the message is fixed at the time of the call
+    args.append("b")
+    assert queue.get_nowait().getMessage() == "list ['a']"
+
+def test_get_logger_cached():
+    assert get_logger("webFuzz.x", "1") is get_logger("webFuzz.x", "1")
+    assert get_logger("webFuzz.x", "1").name == "webFuzz.x/1"
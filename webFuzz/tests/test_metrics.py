@@ -0,0 +1,63 @@
+"""
+pytest tests/test_metrics.py -v
+"""
+import aiohttp
+import pytest
+import socket
+
+from webFuzz.metrics import Counter, Gauge, Histogram, Metrics, MetricsServer
+
+def test_render():
+    counter = Counter("c_total", "A counter")
+    counter.inc()
+    counter.inc(2)
+
+    gauge = Gauge("g", "A gauge", lambda: 7)
+
+    histogram = Histogram("h_seconds", "A histogram", [1, 0.1])
+    for value in [0.05, 0.1, 0.5, 3]:
+        histogram.observe(value)
+
+    assert counter.render() == "# HELP c_total A counter\n# TYPE c_total counter\nc_total 3"
+    assert gauge.render() == "# HELP g A gauge\n# TYPE g gauge\ng 7"
+    assert histogram.render().split("\n") == [
+        "# HELP h_seconds A histogram",
+        "# TYPE h_seconds histogram",
+        'h_seconds_bucket{le="0.1"} 2',
+        'h_seconds_bucket{le="1"} 3',
+        'h_seconds_bucket{le="+Inf"} 4',
+        "h_seconds_sum 3.65",
+        "h_seconds_count 4",
+    ]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.mark.asyncio
+async def test_server():
+    metrics = Metrics()
+    metrics.requests.inc(5)
+    metrics.request_latency.observe(0.02)
+    metrics.corpus_size.set_function(lambda: 42)
+
+    port = free_port()
+    server = MetricsServer(metrics, port)
+    await server.start()
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as r:
+                assert r.status == 200
+                assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                body = await r.text()
+    finally:
+        await server.stop()
+
+    lines = body.split("\n")
+    assert "webfuzz_requests_total 5" in lines
+    assert "webfuzz_corpus_size 42" in lines
+    assert 'webfuzz_request_latency_seconds_bucket{le="0.025"} 1' in lines
+    assert "webfuzz_request_latency_seconds_count 1" in lines
+    assert body.endswith("\n")
@@ -0,0 +1,11 @@
+"""
+pytest tests/test_micro.py -v
+"""
+from benchmarks.micro import compare
+
+def test_compare():
+    baseline = { "a": { "best": 10.0 }, "b": { "best": 10.0 }, "c": { "best": 10.0 } }
+    results = { "a": { "best": 10.5 }, "b": { "best": 12.0 }, "c": { "best": 5.0 }, "d": { "best": 1.0 } }
+
+    assert compare(results, baseline, 0.10) == ["b"]
+    assert compare(results, baseline, 0.25) == []
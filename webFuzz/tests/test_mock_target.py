@@ -0,0 +1,47 @@
+"""
+pytest tests/test_mock_target.py -v
+"""
+import pytest
+
+from multidict import CIMultiDict, CIMultiDictProxy
+from unittest.mock import Mock, patch
+
+from benchmarks.mock_target import MockTarget, Page, TargetArguments
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod, InstrumentArgs
+
+@pytest.mark.parametrize('name, value, expected_out',
+                        [
+                            ("a", "", "empty"),
+                            ("a", "123", "numeric"),
+                            ("a", "abc", "alpha"),
+                            ("a", "<b>", "special"),
+                            ("a[]", "1", "array"),
+                            ("a", "x" * 40, "long"),
+                        ])
+def test_classify(name, value, expected_out):
+    assert Page.classify(name, value) == expected_out
+
+@pytest.mark.parametrize('policy', ["edge", "node", "node-edge", "path"])
+def test_feedback(policy):
+    args = TargetArguments().parse_args(["--pages", "10", "--policy", policy])
+    target = MockTarget(args)
+    page = target.pages[3]
+
+    env = Mock(args=Mock(uniq_frag=False, path_ngram=4, path_map_size=65536),
+               instrument_args=InstrumentArgs(target.meta))
+
+    def coverage(query):
+        feedback = target.feedback(page.trace(target.common, query))
+        headers = CIMultiDictProxy(CIMultiDict((f"I-{label}", value) for (label, value) in feedback.items()))
+
+        with patch("webFuzz.node.env", env):
+            return Node("http://a/", HTTPMethod.GET).parse_instrumentation(headers)
+
+    base = coverage({})
+    # a new value class of a parameter takes a new branch
+    assert coverage({ page.params[0]: "<x>" }) != base
+    # the same classes take the same path
+    assert coverage({ page.params[0]: "<y>" }) == coverage({ page.params[0]: "<x>" })
+    # longer values hit the loop more times
+    assert coverage({ page.params[0]: "a" * 30 }) != coverage({ page.params[0]: "a" })
@@ -1,12 +1,13 @@
 """
 pytest tests/test_node.py -v
 """
+import json
 import pytest
-from unittest.mock import patch, mock_open
+from unittest.mock import Mock, patch, mock_open
 from dataclasses import dataclass
 
 from webFuzz.node import Node, calc_weighted_difference, parse_file, parse_headers, to_bucket, CFGTuple
-from webFuzz.types import HTTPMethod
+from webFuzz.types import HTTPMethod, Policy, XSSConfidence
 
 @pytest.mark.parametrize('headers, expected_out',
                         [
@@ -182,3 +183,66 @@ def test_Node_lt(nodeMetrics1, nodeMetrics2, expected_out):
 
     actual_out = node1 < node2
     assert expected_out == actual_out
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False),
+                                instrument_args=Mock(policy=Policy.EDGE, edges=1000)))
+def test_Node_json():
+    parent = Node(url="http://a/b.php", method=HTTPMethod.GET)
+    parent._cover_score_xor = 10
+
+    node = Node(url="http://a/b.php?x=1&y[]=2&y[]=3",
+                method=HTTPMethod.POST,
+                params={ HTTPMethod.POST: { "p": ["é\"<"] } },
+                parent_request=parent)
+    node._cover_score_xor = 15
+    node.exec_time = 0.1234
+    node.xss_confidence = XSSConfidence.LOW
+
+    expected = {
+        "url": "http://a/b.php",
+        "method": "POST",
+        "params": { "GET": { "x": ["1"], "y[]": ["2", "3"] }, "POST": { "p": ["é\"<"] } },
+        "xss_confidence": "LOW",
+        "cover_score": "1.500",
+        "mutated_score": 5,
+        "exec_time": "0.123"
+    }
+    assert json.loads(node.json) == expected
+    assert str(node) == node.json
+
+    # the cached json follows changes of the node
+    node.xss_confidence = XSSConfidence.HIGH
+    assert json.loads(node.json)["xss_confidence"] == "HIGH"
+
+    assert json.loads(Node.nodes_to_json([node, parent])) == [json.loads(node.json), json.loads(parent.json)]
+    assert Node.nodes_to_json([]) == "[]"
+
+@pytest.mark.parametrize('url1, params1, url2, params2, expected_out',
+                        [
+                            # order of the parameters and of their values does not matter
+                            ("http://a/b.php?x=1&y=2", {}, "http://a/b.php?y=2&x=1", {}, True),
+                            ("http://a/b.php?y[]=2&y[]=3", {}, "http://a/b.php?y[]=3&y[]=2", {}, True),
+                            # fragments are ignored
+                            ("http://a/b.php#top", {}, "http://a/b.php", {}, True),
+                            ("http://a/b.php?x=1", {}, "http://a/b.php?x=2", {}, False),
+                            ("http://a/b.php?x=1", {}, "http://a/c.php?x=1", {}, False),
+                            # parameters are not mixed up between GET and POST
+                            ("http://a/b.php?x=1", {}, "http://a/b.php", { HTTPMethod.POST: { "x": ["1"] } }, False),
+                            ("http://a/b.php", { HTTPMethod.POST: { "x": "ab" } }, "http://a/b.php", { HTTPMethod.POST: { "x": ["a", "b"] } }, False),
+                        ])
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_Node_hash(url1, params1, url2, params2, expected_out):
+    node1 = Node(url=url1, method=HTTPMethod.POST, params=params1)
+    node2 = Node(url=url2, method=HTTPMethod.POST, params=params2)
+
+    assert (hash(node1) == hash(node2)) == expected_out
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_Node_hash_stable():
+    node = Node(url="http://a/b.php?y=3&y=2&x=é", method=HTTPMethod.GET)
+    hash(node)
+
+    # the params are left in the order they were given
+    assert node.params[HTTPMethod.GET] == { "y": ["3", "2"], "x": ["é"] }
+    # and the hash does not depend on the hash seed of the process
+    assert hash(node) == 8742786121482288138
@@ -0,0 +1,143 @@
+"""
+pytest tests/test_node_iterator.py -v
+"""
+import pytest
+from unittest.mock import Mock, patch
+
+from webFuzz.node_iterator import CrossOverIndex, NodeIterator
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod, Policy, CFGTuple, InstrumentArgs, FuzzerException
+
+def mk_node(url, get_count=0, post_count=0):
+    method = HTTPMethod.POST if post_count else HTTPMethod.GET
+    params = {
+        HTTPMethod.GET: { f"g{i}": ["1"] for i in range(get_count) },
+        HTTPMethod.POST: { f"p{i}": ["1"] for i in range(post_count) }
+    }
+    return Node(url=url, method=method, params=params)
+
+@pytest.mark.parametrize('start_count, candidates, expected_urls',
+                        [
+                            # partner needs at least half of the start node params
+                            (4, [("http://a/1", 1), ("http://a/2", 2), ("http://a/3", 5)],
+                                {"http://a/2", "http://a/3"}),
+                            # same url candidates are never picked
+                            (0, [("http://a/start", 3), ("http://a/2", 0)],
+                                {"http://a/2"}),
+                            (6, [("http://a/1", 1)],
+                                {None}),
+                        ])
+def test_cross_over_select(start_count, candidates, expected_urls):
+    index = CrossOverIndex()
+    for (url, count) in candidates:
+        index.add(mk_node(url, get_count=count))
+
+    start_node = mk_node("http://a/start", get_count=start_count)
+
+    for _ in range(20):
+        partner = index.select(start_node, HTTPMethod.GET)
+        assert (partner.url if partner else None) in expected_urls
+
+def test_cross_over_remove():
+    index = CrossOverIndex()
+    nodes = [mk_node("http://a/%d" % i, get_count=i % 3, post_count=1) for i in range(10)]
+
+    for node in nodes:
+        index.add(node)
+
+    # adding twice is a no-op
+    index.add(nodes[0])
+    assert len(index) == 10
+
+    for node in nodes[:9]:
+        index.remove(node)
+        assert node not in index
+
+    start_node = mk_node("http://a/start")
+    assert index.select(start_node, HTTPMethod.GET) is nodes[9]
+    assert index.select(start_node, HTTPMethod.POST) is nodes[9]
+
+    index.remove(nodes[9])
+    assert len(index) == 0
+    assert index.select(start_node, HTTPMethod.POST) is None
+
+def test_remove_nodes_index():
+    env = Mock(args=Mock(uniq_frag=True))
+
+    with patch("webFuzz.node_iterator.env", env), patch("webFuzz.node.env", env):
+        iterator = NodeIterator()
+        nodes = [mk_node("http://a/1", get_count=1),
+                 mk_node("http://a/1", get_count=1),
+                 mk_node("http://a/2", get_count=1),
+                 mk_node("http://a/3", get_count=1)]
+
+        # the first two share a hash
+        for node in nodes:
+            iterator.node_list.append(node)
+            iterator._cross_index.add(node)
+
+        iterator._remove_nodes({ nodes[3] })
+
+        assert len(iterator.node_list) == 2
+        assert { id(node) for node in nodes if node in iterator._cross_index } == \
+               { id(node) for node in iterator.node_list }
+
+@pytest.mark.parametrize('policy, known, cfg, expected_out',
+                        [
+                            (Policy.EDGE, CFGTuple(xor_cfg={1: 2, 2: 0}, single_cfg={}),
+                                          CFGTuple(xor_cfg={1: 2}, single_cfg={}), False),
+                            (Policy.EDGE, CFGTuple(xor_cfg={1: 2, 2: 0}, single_cfg={}),
+                                          CFGTuple(xor_cfg={1: 3}, single_cfg={}), True),
+                            (Policy.NODE, CFGTuple(xor_cfg={}, single_cfg={1: 2}),
+                                          CFGTuple(xor_cfg={}, single_cfg={5: 0}), True),
+                            (Policy.NODE_EDGE, CFGTuple(xor_cfg={1: 2}, single_cfg={7: 1}),
+                                               CFGTuple(xor_cfg={1: 2}, single_cfg={7: 4}), False),
+                            (Policy.NODE_EDGE, CFGTuple(xor_cfg={1: 2}, single_cfg={7: 1}),
+                                               CFGTuple(xor_cfg={1: 2}, single_cfg={8: 1}), True),
+                            (Policy.PATH, CFGTuple(xor_cfg={1: 2}, single_cfg={7: 1}),
+                                          CFGTuple(xor_cfg={1: 2, 3: 0}, single_cfg={7: 1}), True),
+                        ])
+def test_has_new_coverage(policy, known, cfg, expected_out):
+    env = Mock()
+    env.instrument_args.policy = policy
+    env.instrument_args.new_bitmap.return_value = None
+    env.args.uniq_frag = True
+
+    with patch("webFuzz.node_iterator.env", env), patch("webFuzz.node.env", env):
+        iterator = NodeIterator()
+        iterator.add(mk_node("http://a/1"), known)
+
+        assert iterator.has_new_coverage(known) == False
+        assert iterator.has_new_coverage(cfg) == expected_out
+
+def test_dense_map():
+    env = Mock(args=Mock(uniq_frag=True),
+               instrument_args=InstrumentArgs({ "basic-block-count": 10,
+                                                "output-method": "http",
+                                                "instrument-policy": "edge",
+                                                "edge-count": 16,
+                                                "map-size": 64 }))
+    assert env.instrument_args.edges == 64
+
+    with patch("webFuzz.node_iterator.env", env), patch("webFuzz.node.env", env):
+        iterator = NodeIterator()
+        iterator.add(mk_node("http://a/1"), CFGTuple(xor_cfg={ 1: 2, 63: 0 }, single_cfg={}))
+        iterator.add(mk_node("http://a/2"), CFGTuple(xor_cfg={ 1: 3 }, single_cfg={}))
+
+        assert iterator.has_new_coverage(CFGTuple(xor_cfg={ 1: 3, 63: 0 }, single_cfg={})) == False
+        assert iterator.has_new_coverage(CFGTuple(xor_cfg={ 1: 4 }, single_cfg={})) == True
+        assert iterator.has_new_coverage(CFGTuple(xor_cfg={ 5: 0 }, single_cfg={})) == True
+        assert iterator.total_cover_score == 100 * 2 / 64
+
+        with pytest.raises(FuzzerException):
+            iterator.add(mk_node("http://a/3"), CFGTuple(xor_cfg={ 64: 0 }, single_cfg={}))
+
+        # the bitmap is rebuilt on resume
+        nodes = { i + 1: node for (i, node) in enumerate(iterator.node_list) }
+        ids = { id(node): i for (i, node) in nodes.items() }
+        state = iterator.dump_state(lambda node: ids[id(node)])
+
+        resumed = NodeIterator()
+        resumed.load_state(state, nodes)
+        assert resumed.has_new_coverage(CFGTuple(xor_cfg={ 1: 3, 63: 0 }, single_cfg={})) == False
+        assert resumed.has_new_coverage(CFGTuple(xor_cfg={ 63: 1 }, single_cfg={})) == True
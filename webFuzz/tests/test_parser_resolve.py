@@ -0,0 +1,59 @@
+"""
+pytest tests/test_parser_resolve.py -v
+"""
+import pytest
+
+from unittest.mock import Mock, patch
+from urllib.parse import urlparse
+
+from webFuzz.parser import Parser, resolve_link
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod
+
+env = Mock(args=Mock(uniq_frag=False))
+
+@pytest.mark.parametrize('page, link, expected_url, expected_params',
+                        [
+                            ("http://localhost/app/page.php?id=3", "x.php?q=1", "http://localhost/app/x.php", { "q": ["1"] }),
+                            ("http://localhost/app/page.php?id=3", "/abs.php?z=", "http://localhost/abs.php", { "z": [""] }),
+                            ("http://localhost/app/page.php?id=3", "?a=1&a=2", "http://localhost/app/page.php", { "a": ["1", "2"] }),
+                            # links to the page itself keep its query
+                            ("http://localhost/app/page.php?id=3", "#top", "http://localhost/app/page.php#top", { "id": ["3"] }),
+                            ("http://localhost/app/page.php?id=3", "", "http://localhost/app/page.php", { "id": ["3"] }),
+                            ("http://localhost", "a.php", "http://localhost/a.php", {}),
+                            ("http://localhost/app/", "//localhost/b.php", "//localhost/b.php", {}),
+                        ])
+@patch("webFuzz.node.env", env)
+def test_resolve(page, link, expected_url, expected_params):
+    called_node = Node(page, HTTPMethod.GET)
+
+    (url_id, params) = Parser.resolve(called_node, link)
+    node = Node(url_id, HTTPMethod.GET, { HTTPMethod.GET: params })
+
+    assert node.url == expected_url
+    assert node.params[HTTPMethod.GET] == expected_params
+
+    # same as resolving with urllib
+    url_obj = Parser.normalise_url(called_node.url_object, urlparse(link))
+    assert hash(node) == hash(Node(url_obj, HTTPMethod.GET))
+
+@patch("webFuzz.node.env", env)
+def test_resolve_other_domain():
+    called_node = Node("http://localhost/a.php", HTTPMethod.GET)
+
+    assert Parser.resolve(called_node, "http://other/a.php") is None
+    assert Parser.resolve(called_node, "//other/a.php") is None
+
+@patch("webFuzz.node.env", env)
+def test_resolve_cached():
+    called_node = Node("http://localhost/cached/a.php?x=1", HTTPMethod.GET)
+    resolve_link.cache_clear()
+
+    (_, params1) = Parser.resolve(called_node, "b.php?y=1")
+    (_, params2) = Parser.resolve(Node("http://localhost/cached/a.php?x=2", HTTPMethod.GET), "b.php?y=1")
+
+    # resolved once per page base url
+    assert resolve_link.cache_info().hits == 1
+    # but each node gets its own parameters
+    params1["y"].append("2")
+    assert params2 == { "y": ["1"] }
@@ -0,0 +1,102 @@
+"""
+pytest tests/test_path_hash.py -v
+"""
+import pytest
+
+from multidict import CIMultiDict, CIMultiDictProxy
+from unittest.mock import Mock, patch
+
+from webFuzz.misc import parse_headers
+from webFuzz.node import Node
+from webFuzz.path_hash import path_counts
+from webFuzz.types import HTTPMethod, InstrumentArgs, Policy
+
+def trace(*uids):
+    return [(index, f"{uid}-1") for (index, uid) in enumerate(uids)]
+
+def test_path_counts():
+    (paths, blocks) = path_counts(trace(10, 20, 30, 20, 30), 2, 1024)
+
+    assert blocks == { 10: 1, 20: 2, 30: 2 }
+    # 10, 10-20, 20-30, 30-20, 20-30
+    assert sorted(paths.values()) == [1, 1, 1, 2]
+    assert all(0 <= label < 1024 for label in paths)
+
+def test_path_counts_order():
+    (paths1, _) = path_counts(trace(10, 20, 30), 3, 1 << 16)
+    (paths2, _) = path_counts(trace(10, 30, 20), 3, 1 << 16)
+
+    assert paths1.keys() != paths2.keys()
+    # the same blocks in the same order
+    assert path_counts(trace(10, 20, 30), 3, 1 << 16)[0] == paths1
+
+def test_path_counts_window():
+    # only the last n blocks count, whatever came before them
+    (paths1, _) = path_counts(trace(1, 2, 10, 20), 2, 1 << 16)
+    (paths2, _) = path_counts(trace(3, 4, 10, 20), 2, 1 << 16)
+
+    assert len(paths1.keys() & paths2.keys()) == 1
+
+def test_path_counts_bounded():
+    (paths, _) = path_counts(trace(*range(256, 100000)), 4, 64)
+
+    assert len(paths) <= 64
+
+def test_path_counts_max_len():
+    (paths, blocks) = path_counts(iter(trace(*range(256, 100000))), 4, 1 << 16, 1000)
+
+    assert sum(paths.values()) == sum(blocks.values()) == 1000
+
+def test_path_counts_level():
+    # the same blocks at another depth take another path
+    (paths1, _) = path_counts([(0, "10-1"), (1, "20-1")], 2, 1 << 16)
+    (paths2, _) = path_counts([(0, "10-1"), (1, "20-2")], 2, 1 << 16)
+
+    assert paths1.keys() != paths2.keys()
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False, path_ngram=2, path_map_size=1024),
+                               instrument_args=InstrumentArgs({ "basic-block-count": 10,
+                                                                "output-method": "file",
+                                                                "instrument-policy": "path" })))
+def test_parse_feedback():
+    node = Node("http://a/", HTTPMethod.GET)
+    # a loop of 4 iterations
+    cfg = node.parse_feedback(trace(10, 20, 30, 20, 30, 20, 30, 20, 30, 40))
+
+    # buckets of the hit counts
+    assert cfg.single_cfg == { 10: 0, 20: 2, 30: 2, 40: 0 }
+    # 10, 10-20, 20-30 (x4), 30-20 (x3), 30-40
+    assert sorted(cfg.xor_cfg.values()) == [0, 0, 0, 2, 2]
+    assert node.cover_score == 40.0
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False, path_ngram=2, path_map_size=1024),
+                               instrument_args=InstrumentArgs({ "basic-block-count": 10,
+                                                                "output-method": "http",
+                                                                "instrument-policy": "path" })))
+def test_parse_feedback_headers():
+    uids = [10, 20, 30] + [20, 30] * 6000 + [40]
+
+    headers = CIMultiDict([("Content-Type", "text/html")])
+    headers.extend((f"I-{index}", value) for (index, value) in trace(*uids))
+
+    node = Node("http://a/", HTTPMethod.GET)
+    cfg = node.parse_feedback(parse_headers(CIMultiDictProxy(headers)))
+
+    # the same as the trace read from a file, up to max_trace (10000) blocks
+    expected = Node("http://a/", HTTPMethod.GET).parse_feedback(trace(*uids[:10000]))
+    assert (cfg.single_cfg, cfg.xor_cfg) == (expected.single_cfg, expected.xor_cfg)
+    assert 40 not in cfg.single_cfg
+
+@pytest.mark.parametrize('policy, expected_out',
+                        [
+                            ("edge", 10000),
+                            ("path", 16 * 1000 + 100),
+                        ])
+def test_max_headers(policy, expected_out):
+    args = InstrumentArgs({ "basic-block-count": 1000,
+                            "edge-count": 10,
+                            "output-method": "http",
+                            "instrument-policy": policy })
+
+    # a path reports every block it executes, more than basic-block-count
+    assert args.max_headers() == expected_out
@@ -0,0 +1,69 @@
+"""
+pytest tests/test_pipeline.py -v
+"""
+import asyncio
+import pytest
+
+from aiohttp import ClientError
+from unittest.mock import AsyncMock, Mock, patch
+
+from webFuzz.concurrency import ConcurrencyController
+from webFuzz.pipeline import Pipeline
+
+@pytest.mark.asyncio
+@patch("webFuzz.pipeline.env", Mock(args=Mock(catch_phrase="")))
+async def test_io_worker_slots():
+    controller = ConcurrencyController(max_limit=4, latency_target=1.0)
+    pipeline = Pipeline(Mock(), Mock(), Mock(), Mock(), Mock(), Mock(), Mock(), Mock(),
+                        io_workers=2, controller=controller, feedback_reader=Mock())
+
+    fetched = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fetch(request):
+        fetched.set()
+        await release.wait()
+        return Mock(status=200)
+
+    worker = Mock(id="1", fetch=AsyncMock(side_effect=fetch))
+    workers = [asyncio.create_task(pipeline.io_worker(worker)) for _ in range(2)]
+
+    # idle workers do not hold a slot
+    await asyncio.sleep(0.01)
+    assert controller._in_use == 0
+
+    await pipeline._request_queue.put((iter([]), Mock(exec_time=0.1)))
+    await fetched.wait()
+    assert controller._in_use == 1
+
+    release.set()
+    await pipeline._request_queue.join()
+    assert controller._in_use == 0
+
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+@pytest.mark.asyncio
+@patch("webFuzz.pipeline.env", Mock(args=Mock(catch_phrase="", http_error_at_info=False)))
+async def test_io_worker_survives_errors():
+    event_log = Mock(record=Mock(side_effect=[ValueError("disk full"), None]))
+    pipeline = Pipeline(Mock(), Mock(), Mock(), Mock(), Mock(), Mock(), Mock(), Mock(),
+                        io_workers=1, event_log=event_log, feedback_reader=Mock())
+
+    worker = Mock(id="1", fetch=AsyncMock(side_effect=ClientError()))
+    task = asyncio.create_task(pipeline.io_worker(worker))
+
+    for _ in range(2):
+        pipeline._in_flight += 1
+        await pipeline._request_queue.put((iter([]), Mock(exec_time=0.1)))
+
+    await asyncio.wait_for(pipeline._request_queue.join(), 1)
+
+    # both requests are accounted for, the first one despite the error
+    assert pipeline.in_flight == 0
+    assert worker.fetch.await_count == 2
+    assert not task.done()
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
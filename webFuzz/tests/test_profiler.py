@@ -0,0 +1,68 @@
+"""
+pytest tests/test_profiler.py -v
+"""
+import pstats
+import pytest
+
+from webFuzz.profiler import RESERVOIR_SIZE, SnapshotProfiler, StageProfiler, StageStats
+from webFuzz.types import SnapshotProfiler as SnapshotProfilerType
+
+def test_stage_stats():
+    stats = StageStats()
+    for i in range(1, 3 * RESERVOIR_SIZE + 1):
+        stats.add(i)
+
+    assert stats.count == 3 * RESERVOIR_SIZE
+    assert stats.max_ns == 3 * RESERVOIR_SIZE
+    assert len(stats.samples) == RESERVOIR_SIZE
+
+    # the reservoir is a uniform sample of all the durations
+    samples = sorted(stats.samples)
+    median = StageStats.percentile(samples, 50)
+    assert abs(median - 1.5 * RESERVOIR_SIZE) < 0.1 * RESERVOIR_SIZE
+
+@pytest.mark.parametrize('samples, p, expected_out',
+                        [
+                            ([], 50, 0),
+                            ([5], 99, 5),
+                            (list(range(100)), 50, 50),
+                            (list(range(100)), 99, 99),
+                        ])
+def test_percentile(samples, p, expected_out):
+    assert StageStats.percentile(samples, p) == expected_out
+
+def test_record():
+    profiler = StageProfiler(enabled=True)
+
+    for _ in range(10):
+        start = profiler.now()
+        assert profiler.record("parse", start) >= 0
+    profiler.record("fetch", profiler.now() - 5_000_000)
+
+    assert profiler.stages["parse"].count == 10
+    assert profiler.stages["fetch"].count == 1
+
+    report = profiler.report()
+    assert report[0].split() == ["Stage", "Count", "Mean", "p50", "p90", "p99", "Max", "Share"]
+    # sorted by total time
+    assert report[1].split()[:2] == ["fetch", "1"]
+    assert report[2].split()[:2] == ["parse", "10"]
+
+def test_record_disabled():
+    profiler = StageProfiler()
+
+    start = profiler.now()
+    assert profiler.record("parse", start) >= 0
+    assert profiler.stages == {}
+
+def test_cprofile_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    profiler = SnapshotProfiler(SnapshotProfilerType.CPROFILE, 60)
+    profiler.start()
+    sorted(range(1000), key=lambda x: -x)
+    filename = profiler.snapshot()
+    profiler.stop()
+
+    stats = pstats.Stats(filename)
+    assert any(func[2] == "<lambda>" for func in stats.stats)
@@ -0,0 +1,89 @@
+"""
+pytest tests/test_proxy.py -v
+"""
+import pytest
+import aiohttp
+
+from aiohttp import web
+from contextlib import asynccontextmanager
+
+from unittest.mock import Mock, patch
+
+from webFuzz.proxy import CaptureProxy
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod
+
+TARGET_PORT = 18731
+PROXY_PORT = 18732
+
+async def target_handler(request: web.Request) -> web.Response:
+    response = web.Response(text="<html>ok</html>", content_type="text/html")
+
+    if request.path == "/login.php":
+        response.set_cookie("PHPSESSID", "abc")
+    elif request.path == "/logout.php":
+        response.del_cookie("PHPSESSID")
+
+    return response
+
+@asynccontextmanager
+async def target():
+    app = web.Application()
+    app.router.add_route('*', '/{path:.*}', target_handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', TARGET_PORT).start()
+    try:
+        yield
+    finally:
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+async def test_capture_proxy():
+    base = f"http://localhost:{TARGET_PORT}"
+    proxy_url = f"http://localhost:{PROXY_PORT}"
+
+    start_node = Node(base + "/index.php", HTTPMethod.GET)
+
+    async with target(), CaptureProxy(start_node, port=PROXY_PORT) as proxy:
+        async with aiohttp.ClientSession(cookies={"theme": "dark"}) as s:
+            async with s.get(base + "/index.php?p=1", proxy=proxy_url) as r:
+                assert r.status == 200
+                assert await r.text() == "<html>ok</html>"
+
+            async with s.post(base + "/login.php", data={"user": "admin", "pass": ""}, proxy=proxy_url) as r:
+                assert r.status == 200
+
+            assert proxy.cookies == {"theme": "dark", "PHPSESSID": "abc"}
+
+            async with s.get(base + "/logout.php", proxy=proxy_url) as r:
+                assert r.status == 200
+
+            assert proxy.cookies == {"theme": "dark"}
+
+            # other domains are forwarded but not recorded
+            async with s.get(f"http://127.0.0.1:{TARGET_PORT}/other.php", proxy=proxy_url) as r:
+                assert r.status == 200
+
+            # so are methods the fuzzer cannot send
+            async with s.put(base + "/login.php", data="x", proxy=proxy_url) as r:
+                assert r.status == 200
+
+            # a request to the proxy itself is not forwarded (to itself)
+            async with s.get(proxy_url + "/index.php") as r:
+                assert r.status == 501
+
+    nodes = { (n.url, n.method): n for n in proxy.nodes }
+
+    assert set(nodes) == {
+        (base + "/index.php", HTTPMethod.GET),
+        (base + "/login.php", HTTPMethod.POST),
+        (base + "/logout.php", HTTPMethod.GET)
+    }
+    assert nodes[(base + "/index.php", HTTPMethod.GET)].params[HTTPMethod.GET] == {"p": ["1"]}
+    assert nodes[(base + "/login.php", HTTPMethod.POST)].params[HTTPMethod.POST] == {"user": ["admin"], "pass": [""]}
+
+    # the logout request deletes the cookie, so the login ends with login.php
+    assert [(n.url, n.method) for n in proxy.login_sequence] == [(base + "/login.php", HTTPMethod.POST)]
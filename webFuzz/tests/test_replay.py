@@ -0,0 +1,99 @@
+"""
+pytest tests/test_replay.py -v
+"""
+import gzip
+import pytest
+
+from webFuzz.environment   import env
+from webFuzz.types         import Arguments, InstrumentArgs, HTTPMethod, Statistics, FuzzerException
+from webFuzz.node          import Node
+from webFuzz.node_iterator import NodeIterator
+from webFuzz.crawler       import Crawler
+from webFuzz.parser        import Parser
+from webFuzz.detector      import Detector
+from webFuzz.worker        import Worker, Response
+from webFuzz.replay        import Recorder, Replayer, read_records
+
+META = { "basic-block-count": 100, "output-method": "http", "instrument-policy": "edge", "edge-count": 128 }
+
+BODY = '<html><body><a href="/page2.php?a=1">x</a><div>a: <b>MARKER</b></div></body></html>'
+
+@pytest.fixture
+def fuzz_env(monkeypatch):
+    monkeypatch.setattr(env, "args", Arguments().parse_args(["http://localhost/"]), raising=False)
+    monkeypatch.setattr(env, "instrument_args", InstrumentArgs(META), raising=False)
+
+def mk_worker() -> Worker:
+    return Worker("replay", None, Crawler(init_seed=set(), block_rules=[]), Parser(), Detector(),
+                  NodeIterator(), Statistics(Node("http://localhost/", HTTPMethod.GET)))
+
+def mk_response(request: Node, feedback) -> Response:
+    return Response(request=request,
+                    status=200,
+                    raw_html=BODY,
+                    has_marker=False,
+                    cfg=request.parse_feedback(feedback),
+                    feedback=feedback)
+
+def test_record_replay(fuzz_env, tmp_path):
+    filename = str(tmp_path / "rec.gz")
+
+    parent = Node("http://localhost/page1.php", HTTPMethod.GET, { HTTPMethod.GET: { "a": ["1"] } }, exec_time=0.1)
+    child = Node("http://localhost/page1.php", HTTPMethod.POST,
+                 { HTTPMethod.GET: { "a": ["2"] }, HTTPMethod.POST: { "b": ["<x>"] } },
+                 parent_request=parent, exec_time=0.2)
+    child.mutation_ops = 5
+
+    recorder = Recorder(filename, META)
+    recorder.record(mk_response(parent, [(300, "1"), (301, "4")]))
+    recorder.record(mk_response(child, [(300, "1"), (302, "2")]))
+    recorder.close()
+
+    (header, records) = read_records(filename)
+    assert header["meta"] == META
+    assert [r["parent_id"] for r in records] == [0, 1]
+
+    worker = mk_worker()
+    replayer = Replayer(filename, worker)
+    responses = list(replayer)
+
+    assert [r.request for r in responses] == [parent, child]
+    assert responses[1].request.parent_request is responses[0].request
+    assert responses[1].request.mutation_ops == 5
+    assert responses[1].request.exec_time == 0.2
+    assert responses[1].cfg == child.parse_feedback([(300, "1"), (302, "2")])
+
+def test_replay_run(fuzz_env, tmp_path):
+    filename = str(tmp_path / "rec.gz")
+
+    recorder = Recorder(filename, META)
+    for i in range(3):
+        request = Node(f"http://localhost/page{i}.php", HTTPMethod.GET)
+        recorder.record(mk_response(request, [(300 + i, "1")]))
+    recorder.close()
+
+    worker = mk_worker()
+    assert Replayer(filename, worker).run() == 3
+
+    # the responses went through the whole feedback stage
+    assert len(worker._node_iterator.node_list) == 3
+    assert worker._crawler.pending_requests > 0
+
+def test_replay_truncated(fuzz_env, tmp_path):
+    filename = str(tmp_path / "rec.gz")
+
+    recorder = Recorder(filename, META)
+    recorder.record(mk_response(Node("http://localhost/", HTTPMethod.GET), [(300, "1")]))
+    recorder.close()
+
+    with gzip.open(filename, "at") as f:
+        f.write('{"id": 2, "url"')
+
+    assert Replayer(filename, mk_worker()).run() == 1
+
+def test_replay_policy_mismatch(fuzz_env, tmp_path):
+    filename = str(tmp_path / "rec.gz")
+    Recorder(filename, dict(META, **{ "instrument-policy": "node" })).close()
+
+    with pytest.raises(FuzzerException):
+        Replayer(filename, mk_worker())
@@ -0,0 +1,114 @@
+"""
+pytest tests/test_seed_reader.py -v
+"""
+import json
+import pytest
+
+from unittest.mock import Mock, patch
+
+from webFuzz.seed_reader import read_seed_entries, SeedFormatError
+from webFuzz.crawler import Crawler, SEED_BATCH_SIZE
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod
+
+ENTRIES = [
+    { "url": "http://localhost/page%d.php" % i,
+      "method": "POST" if i % 2 else "GET",
+      "params": { "GET": { "id": [str(i)] },
+                  "POST": { "text": ["x" * i, "]},[{\"\\"] } if i % 2 else {} } }
+    for i in range(300)
+]
+
+def har(entries):
+    return {
+        "log": {
+            "version": "1.2",
+            "pages": [{ "title": "\"entries\": [" }],
+            "entries": entries
+        }
+    }
+
+@pytest.mark.parametrize('content, chunk_size',
+                        [
+                            (json.dumps(ENTRIES), 7),
+                            (json.dumps(ENTRIES, indent=3), 64 * 1024),
+                            ("\n".join(json.dumps(e) for e in ENTRIES) + "\n", 13),
+                            (json.dumps(har(ENTRIES), indent=1), 5),
+                        ],
+                        ids=["array", "indented-array", "json-lines", "har"])
+def test_read_seed_entries(tmp_path, content, chunk_size):
+    filename = tmp_path / "seed.json"
+    filename.write_text(content)
+
+    assert list(read_seed_entries(str(filename), chunk_size)) == ENTRIES
+
+@pytest.mark.parametrize('content, expected_out',
+                        [
+                            ("", []),
+                            ("[ ]", []),
+                            ('{"log": {"entries": []}}', []),
+                        ])
+def test_read_empty(tmp_path, content, expected_out):
+    filename = tmp_path / "seed.json"
+    filename.write_text(content)
+
+    assert list(read_seed_entries(str(filename))) == expected_out
+
+@pytest.mark.parametrize('content, exception',
+                        [
+                            ('[{"url": 1} {"url": 2}]', SeedFormatError),
+                            ('[{"url": 1}, {"url": ', SeedFormatError),
+                            ('"url"', SeedFormatError),
+                        ])
+def test_read_invalid(tmp_path, content, exception):
+    filename = tmp_path / "seed.json"
+    filename.write_text(content)
+
+    with pytest.raises(exception):
+        list(read_seed_entries(str(filename)))
+
+def test_read_value_too_large(tmp_path):
+    filename = tmp_path / "seed.json"
+    filename.write_text('{"url": 1}\n{"url": x' + " " * 10000 + "}\n")
+
+    entries = read_seed_entries(str(filename), chunk_size=16, max_value_size=256)
+    assert next(entries) == {"url": 1}
+
+    with pytest.raises(SeedFormatError, match="offset 11 "):
+        next(entries)
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_har_entry_to_node():
+    scope = Node("http://localhost/index.php", HTTPMethod.GET).url_object
+
+    entry = { "request": { "method": "POST",
+                           "url": "http://localhost/login.php?next=a",
+                           "postData": { "mimeType": "application/x-www-form-urlencoded",
+                                         "text": "user=admin&pass=1" } } }
+    node = Crawler.har_entry_to_node(entry, scope)
+
+    assert (node.url, node.method) == ("http://localhost/login.php", HTTPMethod.POST)
+    assert node.params == { HTTPMethod.GET: { "next": ["a"] },
+                            HTTPMethod.POST: { "user": ["admin"], "pass": ["1"] } }
+
+    entry["request"]["url"] = "http://example.com/login.php"
+    assert Crawler.har_entry_to_node(entry, scope) is None
+
+    entry["request"]["method"] = "PUT"
+    assert Crawler.har_entry_to_node(entry) is None
+
+@patch("webFuzz.node.env", Mock(args=Mock(uniq_frag=False)))
+def test_crawler_lazy_seed(tmp_path):
+    filename = tmp_path / "seed.json"
+    filename.write_text(json.dumps(ENTRIES * 4))
+
+    crawler = Crawler(seed_file=str(filename))
+    assert crawler.pending_requests == 0
+
+    sent = set()
+    for request in crawler:
+        # the frontier never holds the whole seed
+        assert crawler.pending_requests <= 2 * SEED_BATCH_SIZE
+        sent.add((request.url, request.method))
+
+    assert sent == set((e["url"], HTTPMethod[e["method"]]) for e in ENTRIES)
@@ -0,0 +1,104 @@
+"""
+pytest tests/test_session.py -v
+"""
+import pytest
+
+from aiohttp import web
+from contextlib import asynccontextmanager
+
+from unittest.mock import Mock, patch
+
+from webFuzz.session import SessionManager
+from webFuzz.target_pool import TargetPool
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod
+
+TARGET_PORT = 18741
+
+env = Mock(args=Mock(uniq_frag=False,
+                     catch_phrase="Logout",
+                     request_timeout=5,
+                     keepalive_timeout=5))
+
+async def target_handler(request: web.Request) -> web.Response:
+    if request.path == "/login.php":
+        data = await request.post()
+        response = web.Response(text="<html>welcome</html>", content_type="text/html")
+
+        if data.get("pass") == "secret":
+            response.set_cookie("PHPSESSID", "fresh")
+        return response
+
+    if request.cookies.get("PHPSESSID") == "fresh":
+        return web.Response(text="<html><a>Logout</a></html>", content_type="text/html")
+
+    return web.Response(text="<html>login form</html>", content_type="text/html")
+
+@asynccontextmanager
+async def target():
+    app = web.Application()
+    app.router.add_route('*', '/{path:.*}', target_handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', TARGET_PORT).start()
+    try:
+        yield
+    finally:
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('password, expected_out',
+                        [
+                            ("secret", True),
+                            ("wrong", False),
+                        ])
+@patch("webFuzz.node.env", env)
+@patch("webFuzz.session.env", env)
+@patch("webFuzz.target_pool.env", env)
+async def test_relogin(password, expected_out):
+    base = f"http://localhost:{TARGET_PORT}"
+
+    session_node = Node(base + "/index.php", HTTPMethod.GET)
+    login_sequence = [
+        Node(base + "/index.php", HTTPMethod.GET),
+        Node(base + "/login.php", HTTPMethod.POST, {
+            HTTPMethod.GET: {},
+            HTTPMethod.POST: {"user": ["admin"], "pass": [password]}
+        })
+    ]
+
+    pool = TargetPool(base + "/index.php")
+
+    async with target(), pool.sessions({"PHPSESSID": "stale"}, {}, 2) as targets:
+        manager = SessionManager(targets, login_sequence, session_node)
+
+        assert await manager.relogin() == expected_out
+        assert manager.relogins == int(expected_out)
+
+@pytest.mark.asyncio
+@patch("webFuzz.node.env", env)
+@patch("webFuzz.session.env", env)
+@patch("webFuzz.target_pool.env", env)
+async def test_relogin_keeps_cookies():
+    base = f"http://localhost:{TARGET_PORT}"
+
+    session_node = Node(base + "/index.php", HTTPMethod.GET)
+    login_sequence = [
+        Node(base + "/login.php", HTTPMethod.POST, {
+            HTTPMethod.GET: {},
+            HTTPMethod.POST: {"user": ["admin"], "pass": ["secret"]}
+        })
+    ]
+
+    pool = TargetPool(base + "/index.php")
+
+    async with target(), pool.sessions({"PHPSESSID": "stale", "consent": "yes"}, {}, 2) as targets:
+        manager = SessionManager(targets, login_sequence, session_node)
+
+        assert await manager.relogin()
+
+        for replica in targets.replicas:
+            cookies = replica.session.cookie_jar.filter_cookies(base + "/index.php")
+            assert { k: m.value for (k, m) in cookies.items() } == \
+                   { "PHPSESSID": "fresh", "consent": "yes" }
@@ -0,0 +1,96 @@
+"""
+pytest tests/test_target_pool.py -v
+"""
+import pytest
+
+from aiohttp import web
+from unittest.mock import Mock, patch
+
+from webFuzz.target_pool import TargetPool, Replica
+from webFuzz.node import Node
+from webFuzz.types import HTTPMethod, OutputMethod, Routing
+
+REPLICAS = ["http://localhost:8081", "http://localhost:8082", "http://127.0.0.1:8083"]
+
+@pytest.mark.parametrize('origin, url, expected_out',
+                        [
+                            ("http://localhost:8081", "http://localhost/a/b.php#frag", "http://localhost:8081/a/b.php#frag"),
+                            ("https://10.0.0.1", "http://localhost:80/", "https://10.0.0.1/"),
+                        ])
+def test_rebase(origin, url, expected_out):
+    assert Replica(origin).rebase(url) == expected_out
+
+def test_primary_not_duplicated():
+    pool = TargetPool("http://localhost:8081/index.php", REPLICAS)
+    assert [r.name for r in pool.replicas] == ["localhost:8081", "localhost:8082", "127.0.0.1:8083"]
+
+def test_hash_routing():
+    pool = TargetPool("http://localhost/index.php", REPLICAS, Routing.HASH)
+    urls = ["http://localhost/page%d.php" % i for i in range(200)]
+
+    routes = [pool.route(Node(url, HTTPMethod.GET)) for url in urls]
+
+    # same base url always goes to the same replica
+    assert routes == [pool.route(Node(url + "?x=1", HTTPMethod.GET)) for url in urls]
+    # and every replica gets a share
+    assert set(routes) == set(pool.replicas)
+
+    # removing a replica only moves the base urls that it served
+    smaller = TargetPool("http://localhost/index.php", REPLICAS[:-1], Routing.HASH)
+    for (url, replica) in zip(urls, routes):
+        if replica.name != "127.0.0.1:8083":
+            assert smaller.route(Node(url, HTTPMethod.GET)).name == replica.name
+
+def test_least_loaded_routing():
+    pool = TargetPool("http://localhost/index.php", REPLICAS)
+    node = Node("http://localhost/index.php", HTTPMethod.GET)
+
+    for (load, replica) in zip([3, 1, 0, 2], pool.replicas):
+        replica.in_flight = load
+
+    assert pool.route(node) is pool.replicas[2]
+
+def test_least_loaded_ties():
+    pool = TargetPool("http://localhost/index.php", REPLICAS)
+    node = Node("http://localhost/index.php", HTTPMethod.GET)
+
+    # e.g. a single worker, every replica is idle
+    routes = [pool.route(node) for _ in range(2 * len(pool))]
+
+    assert routes == pool.replicas * 2
+
+async def cookie_handler(request: web.Request) -> web.Response:
+    response = web.Response(text=request.cookies.get("token", ""))
+    if "rotate" in request.query:
+        response.set_cookie("token", request.query["rotate"])
+    return response
+
+async def fetch(replica: Replica, path: str) -> str:
+    async with replica.session.get(f"http://{replica.netloc}{path}", trace_request_ctx=Mock()) as r:
+        return await r.text()
+
+@pytest.mark.asyncio
+@patch("webFuzz.target_pool.env", Mock(args=Mock(request_timeout=5, keepalive_timeout=5),
+                                       instrument_args=Mock(output_method=OutputMethod.FILE)))
+async def test_shared_cookies():
+    app = web.Application()
+    app.router.add_get("/{path:.*}", cookie_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 18751).start()
+    await web.TCPSite(runner, "localhost", 18752).start()
+
+    pool = TargetPool("http://localhost:18752/index.php", ["http://127.0.0.1:18751"])
+    (primary, replica) = pool.replicas
+    try:
+        async with pool.sessions({ "token": "initial" }, {}, 2):
+            assert await fetch(replica, "/a.php") == "initial"
+
+            # rotated through the replica, sent through the primary
+            await fetch(replica, "/a.php?rotate=new")
+            assert await fetch(primary, "/a.php") == "new"
+
+            await fetch(primary, "/a.php?rotate=newer")
+            assert await fetch(replica, "/a.php") == "newer"
+    finally:
+        await runner.cleanup()
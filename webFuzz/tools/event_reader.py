@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+"""
+Summarise an event log written with --event_log
+
+usage: tools/event_reader.py <event log file>
+"""
+import sys
+
+from collections import Counter
+from os.path     import dirname, abspath
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from webFuzz.event_log import read_events, OP_NAMES
+
+events = read_events(sys.argv[1])
+count = len(events["id"])
+
+if count == 0:
+    print("No events")
+    sys.exit(0)
+
+duration = events["time"][-1] - events["time"][0]
+mutated = sum(1 for ops in events["mutation_ops"] if ops)
+productive = sum(1 for n in events["new_buckets"] if n)
+
+print("Requests:         %d" % count)
+print("Duration:         %.1fs (%.1f req/s)" % (duration, count / duration if duration else 0))
+print("Mean exec time:   %.3fs" % (sum(events["exec_time"]) / count))
+print("Mutated:          %d" % mutated)
+print("New coverage:     %d requests, %d buckets" % (productive, sum(events["new_buckets"])))
+
+print("Status codes:")
+for (status, n) in sorted(Counter(events["status"]).items()):
+    print("    %s: %d" % (status if status else "failed", n))
+
+print("Mutation ops (requests / with new coverage):")
+for (i, name) in enumerate(OP_NAMES):
+    bit = 1 << i
+    used = [n for (ops, n) in zip(events["mutation_ops"], events["new_buckets"]) if ops & bit]
+    print("    %-13s %d / %d" % (name, len(used), sum(1 for n in used if n)))
+
+print("XSS confidence:")
+for (confidence, n) in sorted(Counter(events["xss_confidence"]).items()):
+    print("    %d: %d" % (confidence, n))
@@ -0,0 +1,352 @@
+"""
+    Checkpointing of the fuzzing state, so that a long campaign can be resumed
+    after a restart without crawling the web application again.
+
+    A checkpoint file is an append-only sequence of records:
+
+        header: MAGIC | version (u8)
+        record: kind (u8) | payload size (u32) | zlib compressed payload
+
+    NODES records hold the nodes (corpus nodes, their parents and the pending
+    crawler links) that have not been written before, SEEN records the hashes
+    the crawler has seen since the previous checkpoint and STATE records the
+    rest of the mutable state, which refers to the nodes by their id.
+
+    On load, the last STATE record wins and a truncated record at the end of the
+    file (e.g. due to a crash in the middle of a write) is ignored. Once enough
+    STATE records pile up, the file is compacted by rewriting only what the
+    last state refers to.
+
+    The crawler identifies the requests it has sent by their Node.__hash__,
+    which is the same in every process (see misc.request_hash). Requests that
+    are in flight while a checkpoint is taken are not part of it.
+"""
+import asyncio
+import os
+import pickle
+import struct
+import zlib
+
+from array          import array
+from typing         import Any, Dict, List, Optional, Set, Tuple
+
+from .environment   import env
+from .node          import Node
+from .types         import HTTPMethod, XSSConfidence, Statistics, ExitCode, get_logger
+from .crawler       import Crawler
+from .node_iterator import NodeIterator
+from .detector      import Detector
+
+MAGIC = b"WFCK"
+VERSION = 2
+
+HEADER = struct.Struct("<4sB")
+RECORD = struct.Struct("<BI")
+
+# record kinds
+NODES = 1
+SEEN = 2
+STATE = 3
+
+# rewrite the file after this many STATE records
+COMPACT_EVERY = 20
+
+# (id, url, method, params, exec_time, has_sinks, xss_confidence,
+#  label, cover_score_xor, cover_score_single, parent id)
+NodeRecord = Tuple[int, str, int, Dict[int, Dict[str, List[str]]], float,
+                   bool, int, str, int, int, int]
+
+class Checkpoint:
+    def __init__(self,
+                 filename: str,
+                 crawler: Crawler,
+                 iterator: NodeIterator,
+                 detector: Detector,
+                 statistics: Statistics):
+
+        self.filename = filename
+        self._crawler = crawler
+        self._node_iterator = iterator
+        self._detector = detector
+        self._stats = statistics
+
+        self._next_id = 1
+        # number of STATE records in the file, 0 if
+        # the file has to be written from scratch
+        self._states = 0
+
+        # bookkeeping of the snapshot being taken
+        self._full = False
+        self._encoded: Set[int] = set()
+        self._pending: List[NodeRecord] = []
+        # ids of the nodes written as crawler links
+        self._frontier: Set[int] = set()
+
+        crawler.track_new_seen()
+
+    def _needs_encoding(self, node: Node, in_corpus: bool) -> bool:
+        if id(node) in self._encoded:
+            return False
+
+        # in a full snapshot everything is written again
+        if self._full or not node.checkpoint_id:
+            return True
+
+        # a crawler link written before its response was processed
+        return in_corpus and node.checkpoint_id in self._frontier
+
+    def _node_id(self, node: Node, in_corpus: bool = True) -> int:
+        """
+            Id of node in the checkpoint. Nodes (and their parents) not
+            written yet are assigned a new id and queued for encoding.
+            Nodes written again keep their id, the last record wins on load.
+        """
+        # mutation chains can get long, so walk them iteratively
+        chain = []
+        current: Optional[Node] = node
+        while current is not None and self._needs_encoding(current, in_corpus):
+            chain.append(current)
+            self._encoded.add(id(current))
+            current = current.parent_request
+
+        # parents are encoded before their children
+        for current in reversed(chain):
+            if not current.checkpoint_id:
+                current.checkpoint_id = self._next_id
+                self._next_id += 1
+
+            if in_corpus:
+                self._frontier.discard(current.checkpoint_id)
+            else:
+                self._frontier.add(current.checkpoint_id)
+
+            parent = current.parent_request
+
+            self._pending.append((current.checkpoint_id,
+                                  current.url,
+                                  current.method.value,
+                                  { method.value: params for (method, params) in current.params.items() },
+                                  current.exec_time,
+                                  current.has_sinks,
+                                  current.xss_confidence.value,
+                                  current.label,
+                                  current._cover_score_xor,
+                                  current._cover_score_single,
+                                  parent.checkpoint_id if parent else 0))
+
+        return node.checkpoint_id
+
+    def _frontier_id(self, node: Node) -> int:
+        return self._node_id(node, in_corpus=False)
+
+    def snapshot(self, full: bool = False) -> bytes:
+        """
+            Encode the records of a checkpoint. Unless full is set, only
+            the nodes and seen hashes added since the last snapshot are included
+        """
+        self._full = full
+        self._encoded = set()
+        self._pending = []
+        if full:
+            self._frontier = set()
+
+        state = {
+            "crawler": self._crawler.dump_state(self._frontier_id),
+            "iterator": self._node_iterator.dump_state(self._node_id),
+            "detector": self._detector.dump_state(),
+            "stats": {
+                "total_requests": self._stats.total_requests,
+                "skipped_parses": self._stats.skipped_parses
+            },
+            "next_id": self._next_id
+        }
+
+        nodes = self._pending
+        self._encoded = set()
+        self._pending = []
+
+        seen = array('q', self._crawler.pop_new_seen(full))
+
+        records = b""
+        if nodes:
+            records += Checkpoint.encode_record(NODES, pickle.dumps(nodes, pickle.HIGHEST_PROTOCOL))
+        if seen:
+            records += Checkpoint.encode_record(SEEN, seen.tobytes())
+
+        records += Checkpoint.encode_record(STATE, pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+        return records
+
+    @staticmethod
+    def encode_record(kind: int, payload: bytes) -> bytes:
+        payload = zlib.compress(payload, 1)
+        return RECORD.pack(kind, len(payload)) + payload
+
+    def _write(self, records: bytes, compact: bool) -> None:
+        if compact:
+            # write to a new file and swap it in, so
+            # that a crash never leaves a broken checkpoint
+            tmp_name = self.filename + ".tmp"
+
+            with open(tmp_name, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION))
+                f.write(records)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_name, self.filename)
+        else:
+            with open(self.filename, "ab") as f:
+                f.write(records)
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def save(self) -> None:
+        """
+            Take the snapshot on the event loop, so that it is consistent,
+            and write it to disk in the default executor
+        """
+        logger = get_logger(__name__)
+        loop = asyncio.get_running_loop()
+
+        compact = self._states == 0 or self._states >= COMPACT_EVERY
+        records = self.snapshot(full=compact)
+
+        try:
+            await loop.run_in_executor(None, self._write, records, compact)
+        except OSError as e:
+            logger.error("Failed to write checkpoint: %s", e)
+            # the records of this snapshot are lost, rewrite everything next time
+            self._states = 0
+            return
+
+        self._states = 1 if compact else self._states + 1
+
+        logger.info("Checkpoint of %d bytes written to %s%s", len(records),
+                    self.filename, " (compacted)" if compact else "")
+
+    async def run(self, interval: float) -> None:
+        """
+            Checkpoint every interval seconds until shutdown, plus once at the end
+        """
+        elapsed = 0.0
+        while env.shutdown_signal == ExitCode.NONE:
+            await asyncio.sleep(0.5)
+            elapsed += 0.5
+
+            if elapsed >= interval:
+                elapsed = 0
+                await self.save()
+
+        await self.save()
+
+    @staticmethod
+    def read_records(filename: str) -> List[Tuple[int, bytes]]:
+        """
+            :return: the (kind, payload) records of a checkpoint file
+        """
+        logger = get_logger(__name__)
+        records = []
+
+        with open(filename, "rb") as f:
+            data = f.read()
+
+        (magic, version) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a webFuzz checkpoint")
+
+        offset = HEADER.size
+        while offset + RECORD.size <= len(data):
+            (kind, size) = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+
+            if offset + size > len(data):
+                break
+
+            records.append((kind, zlib.decompress(data[offset:offset+size])))
+            offset += size
+
+        if offset != len(data):
+            logger.warning("Ignoring truncated record at the end of %s", filename)
+
+        return records
+
+    @staticmethod
+    def decode_node(record: NodeRecord) -> Node:
+        (id_, url, method, params, exec_time, has_sinks,
+         xss_confidence, label, cover_xor, cover_single, _) = record
+
+        node = Node(url,
+                    HTTPMethod(method),
+                    { HTTPMethod(m): p for (m, p) in params.items() },
+                    exec_time=exec_time,
+                    label=label)
+
+        node.checkpoint_id = id_
+        node.has_sinks = has_sinks
+        node.xss_confidence = XSSConfidence(xss_confidence)
+        node._cover_score_xor = cover_xor
+        node._cover_score_single = cover_single
+
+        return node
+
+    def load(self) -> bool:
+        """
+            Restore the fuzzing state from the checkpoint file
+
+            :return: True if a state has been restored
+        """
+        logger = get_logger(__name__)
+
+        if not os.path.isfile(self.filename):
+            logger.warning("No checkpoint found at %s, starting from scratch", self.filename)
+            return False
+
+        records = Checkpoint.read_records(self.filename)
+
+        nodes: Dict[int, Node] = {}
+        parents: Dict[int, int] = {}
+        seen: List[array] = []
+        state: Optional[Dict[str, Any]] = None
+        self._states = 0
+
+        for (kind, payload) in records:
+            if kind == NODES:
+                for record in pickle.loads(payload):
+                    nodes[record[0]] = Checkpoint.decode_node(record)
+                    parents[record[0]] = record[-1]
+            elif kind == SEEN:
+                seen.append(array('q', payload))
+            elif kind == STATE:
+                state = pickle.loads(payload)
+                self._states += 1
+
+        if state is None:
+            logger.warning("Checkpoint %s holds no state, starting from scratch", self.filename)
+            return False
+
+        for (id_, parent_id) in parents.items():
+            if parent_id:
+                nodes[id_].parent_request = nodes[parent_id]
+
+        self._next_id = state["next_id"]
+        self._frontier = set(state["crawler"]["unseen"])
+        self._node_iterator.load_state(state["iterator"], nodes)
+        self._crawler.load_state(state["crawler"], nodes)
+        self._detector.load_state(state["detector"])
+
+        for hashes in seen:
+            self._crawler.load_seen(hashes.tolist())
+
+        self._stats.total_requests = state["stats"]["total_requests"]
+        self._stats.skipped_parses = state["stats"]["skipped_parses"]
+        self._stats.total_xss = self._detector.xss_count
+        self._stats.crawler_pending_urls = self._crawler.pending_requests
+        self._stats.total_cover_score = self._node_iterator.total_cover_score
+        if self._node_iterator.node_list:
+            self._stats.current_node = self._node_iterator.node_list[0]
+
+        logger.warning("Resumed from %s: %d corpus nodes, %d pending links",
+                       self.filename, len(self._node_iterator.node_list),
+                       self._crawler.pending_requests)
+        return True
@@ -0,0 +1,118 @@
+"""
+    The ConcurrencyController adapts the number of in-flight requests
+    at runtime towards a target response time.
+
+    It follows an AIMD scheme: the limit starts at 1 and doubles every round
+    (slow start) until the first congestion signal, then grows by one per round.
+    When the mean round trip time of a round exceeds the latency target the limit
+    is scaled down by the ratio target/rtt, and when the error rate of a round is
+    too high it is halved. A round is completed once as many responses as the
+    current limit (and at least MIN_ROUND_SAMPLES) have been recorded.
+"""
+import asyncio
+
+from typing         import Optional
+
+from .types         import get_logger
+
+MIN_ROUND_SAMPLES = 10
+
+# fraction of failed requests in a round
+# that is considered as congestion
+ERROR_RATE_THRESH = 0.10
+
+BACKOFF_FACTOR = 0.5
+MIN_GRADIENT = 0.5
+
+class ConcurrencyController:
+    def __init__(self, max_limit: int, latency_target: float):
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+
+        self._limit: float = 1
+        self._slow_start = True
+        self._in_use = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+        self._samples = 0
+        self._errors = 0
+        self._rtt_sum = 0.0
+
+        self.last_rtt: float = 0.0
+        self.last_decision: str = "slow start"
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # created lazily so that it binds to the running event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self._in_use < self.limit)
+            self._in_use += 1
+
+    async def release(self) -> None:
+        async with self.condition:
+            self._in_use -= 1
+            self.condition.notify_all()
+
+    def record(self, rtt: float, error: bool) -> None:
+        """
+            Record the outcome of a request. Failed requests only count
+            towards the error rate. Should be followed by release(), which
+            wakes up the workers waiting for any newly opened slots.
+        """
+        self._samples += 1
+        if error:
+            self._errors += 1
+        else:
+            self._rtt_sum += rtt
+
+        if self._samples >= max(self.limit, MIN_ROUND_SAMPLES):
+            self._adjust()
+
+    def _adjust(self) -> None:
+        logger = get_logger(__name__)
+
+        successes = self._samples - self._errors
+        error_rate = self._errors / self._samples
+        rtt = self._rtt_sum / successes if successes else 0.0
+
+        if error_rate > ERROR_RATE_THRESH:
+            self._limit *= BACKOFF_FACTOR
+            self._slow_start = False
+            decision = f"backoff, error rate {100 * error_rate:0.1f}%"
+
+        elif rtt > self.latency_target:
+            self._limit *= max(MIN_GRADIENT, self.latency_target / rtt)
+            self._slow_start = False
+            decision = f"decrease, rtt {rtt:0.3f}s above target"
+
+        elif self._slow_start:
+            self._limit *= 2
+            decision = "slow start"
+
+        else:
+            self._limit += 1
+            decision = "increase"
+
+        self._limit = min(max(self._limit, 1), self.max_limit)
+
+        self.last_rtt = rtt
+        self.last_decision = decision
+
+        logger.info("Concurrency limit set to %d (%s)", self.limit, decision)
+
+        self._samples = 0
+        self._errors = 0
+        self._rtt_sum = 0.0
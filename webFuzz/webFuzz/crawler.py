@@ -1,33 +1,48 @@
 import re
 import json
 
-from typing     import Dict, List, Set, Optional
-from datetime   import datetime
-
-from .types     import HTTPMethod, BlockRule, List
-from .misc      import get_logger
-from .node      import Node
+from typing         import Any, Callable, Dict, Iterator, List, Set, Optional
+from datetime       import datetime
+from itertools      import islice
+from urllib.parse   import urlparse
+
+from .types         import HTTPMethod, BlockRule, List, UrlType
+from .misc          import get_logger, query_to_dict
+from .node          import Node
+from .interning     import URLS
+from .parser        import Parser
+from .seed_reader   import read_seed_entries, SeedFormatError
 
 CRAWLER_PER_BASE_LIMIT = 2000
 
+# number of seed file entries pulled into the crawler at a time
+SEED_BATCH_SIZE = 256
+
 Hash = int
-Url = str
-BaseURLCounter = Dict[HTTPMethod, Dict[Url, int]]
+# id of a base url in interning.URLS
+UrlId = int
+BaseURLCounter = Dict[HTTPMethod, Dict[UrlId, int]]
 
 class Crawler:
     def __init__(self, 
                  init_seed: Optional[Set[Node]] = None,
                  seed_file: Optional[str] = None,
-                 block_rules: List[BlockRule] = []):
+                 block_rules: List[BlockRule] = [],
+                 scope: Optional[UrlType] = None):
 
         self._crawler_unseen: Set[Node] = set()
+        self._init_seed: Set[Node] = set()
 
         if init_seed:
-            self._crawler_unseen.update(init_seed)
-            Crawler.store_init_seed(init_seed)
+            self.add_seed(init_seed)
+
+        # the seed file is read lazily, see _load_seed_batch()
+        self._seed_entries: Optional[Iterator[Dict[str, Any]]] = None
+        self._seed_scope = scope
+        self._requests_since_seed_batch = 0
 
         if seed_file:
-            self._crawler_unseen.update(Crawler.parse_init_seed(seed_file))
+            self._seed_entries = read_seed_entries(seed_file)
 
         self._block_rules = block_rules
         self._crawler_seen_full: Set[Hash] = set()
@@ -35,28 +50,144 @@ class Crawler:
             HTTPMethod.GET: {}, 
             HTTPMethod.POST: {} 
         }
+        # base urls whose responses have been parsed for links
+        self._crawler_parsed_base: Dict[HTTPMethod, Set[UrlId]] = {
+            HTTPMethod.GET: set(),
+            HTTPMethod.POST: set()
+        }
+        # hashes added to the seen set since the last call
+        # to pop_new_seen(), only kept when checkpointing
+        self._crawler_seen_new: Optional[List[Hash]] = None
+
+    def add_seed(self, seed: Set[Node]) -> None:
+        """
+            Add nodes to the initial seed and store the whole seed on disk
+        """
+        self._init_seed.update(seed)
+        self._crawler_unseen.update(seed)
+        Crawler.store_init_seed(self._init_seed)
+
+    @staticmethod
+    def entry_to_node(entry: Dict[str, Any]) -> Node:
+        """
+            Convert an entry of a seed file to a Node
+        """
+        method = HTTPMethod[entry["method"].upper()]
+        params = {
+            HTTPMethod.GET: entry["params"]["GET"],
+            HTTPMethod.POST: entry["params"]["POST"]
+        }
+        return Node(entry["url"], method, params)
+
+    @staticmethod
+    def node_to_entry(node: Node) -> Dict[str, Any]:
+        """
+            Convert a Node to an entry of a seed file
+        """
+        return {
+            "url": node.url,
+            "method": node.method.name,
+            "params": {
+                "GET": node.params[HTTPMethod.GET],
+                "POST": node.params[HTTPMethod.POST]
+            }
+        }
+
+    @staticmethod
+    def har_entry_to_node(entry: Dict[str, Any], scope: Optional[UrlType] = None) -> Optional[Node]:
+        """
+            Convert an entry of a HAR file to a Node
+
+            :return: the Node, or None if the request is out of scope or its method is not supported
+        """
+        request = entry['request']
+        url_obj = urlparse(request['url'])
+
+        if scope and not Parser.is_same_domain(url_obj, scope):
+            return None
+
+        try:
+            method = HTTPMethod[request.get('method', 'GET').upper()]
+        except KeyError:
+            # HTTP method not supported
+            return None
+
+        post_params: Dict[str, List[str]] = {}
+
+        if method == HTTPMethod.POST:
+            post_data = request.get('postData', {})
+
+            if post_data.get('params'):
+                for kv in post_data['params']:
+                    post_params.setdefault(str(kv["name"]), []).append(str(kv["value"]))
+
+            elif post_data.get('mimeType', '').startswith('application/x-www-form-urlencoded'):
+                post_params = query_to_dict(post_data.get('text', ''))
+
+        return Node(url_obj, method, { HTTPMethod.GET: {}, HTTPMethod.POST: post_params })
 
     @staticmethod
-    def parse_init_seed(filename:str) -> Set[Node]:
+    def seed_entry_to_node(entry: Dict[str, Any], scope: Optional[UrlType] = None) -> Optional[Node]:
+        if 'request' in entry:
+            return Crawler.har_entry_to_node(entry, scope)
+
+        return Crawler.entry_to_node(entry)
+
+    def _load_seed_batch(self) -> bool:
+        """
+            Pull the next entries of the seed file into the crawler.
+            Entries already seen (e.g. when resuming) are filtered out.
+
+            :return: if new requests have been added
+        """
         logger = get_logger(__name__)
 
-        nodes = set()
+        while self._seed_entries is not None:
+            nodes = set()
+            count = 0
 
-        with open(filename, "r") as f:
-            data = json.loads(f.read())
-        
-        for entry in data:
-            method = HTTPMethod[entry["method"].upper()]
-            params = {
-                HTTPMethod.GET: entry["params"]["GET"],
-                HTTPMethod.POST: entry["params"]["POST"]
-            }
-            nodes.add(Node(entry["url"], method, params))
-    
-        logger.info("Seed file number of entries %d", len(nodes))
-        logger.debug("Read seed file as %s", nodes)
+            try:
+                for entry in islice(self._seed_entries, SEED_BATCH_SIZE):
+                    count += 1
+
+                    try:
+                        node = Crawler.seed_entry_to_node(entry, self._seed_scope)
+                    except (KeyError, TypeError, AttributeError):
+                        logger.warning("Skipping invalid seed entry %s", entry)
+                        continue
+
+                    if node:
+                        nodes.add(node)
+
+            except SeedFormatError as e:
+                logger.error("Stopped reading seed file: %s", e)
+                count = 0
 
-        return nodes
+            if count < SEED_BATCH_SIZE:
+                logger.info("Seed file read to the end")
+                self._seed_entries = None
+
+            self._requests_since_seed_batch = 0
+
+            pending = len(self._crawler_unseen)
+            self.__add__(nodes)
+
+            logger.info("Loaded %d seed entries", len(self._crawler_unseen) - pending)
+
+            if len(self._crawler_unseen) > pending:
+                return True
+
+        return False
+
+    def _should_load_seed(self) -> bool:
+        """
+            Keep the seed file entries flowing while bounding the frontier:
+            read a batch when the frontier runs low, or after sending
+            a batch worth of requests since the previous one
+        """
+        return self._seed_entries is not None and \
+               (len(self._crawler_unseen) < SEED_BATCH_SIZE or \
+                self._requests_since_seed_batch >= SEED_BATCH_SIZE)
 
     @staticmethod
     def store_init_seed(seed: Set[Node]) -> None:
@@ -71,19 +202,47 @@ class Crawler:
         logger.info("Writing seed to %s", filename)
 
         for node in seed:
-            entry = {
-                "url": node.url,
-                "method": node.method.name,
-                "params": {
-                    "GET": node.params[HTTPMethod.GET],
-                    "POST": node.params[HTTPMethod.POST]
-                }
-            }
-            entries.append(entry)
+            entries.append(Crawler.node_to_entry(node))
 
         with open(filename, "w+") as f:
             json.dump(entries, f, indent=3)
 
+    def track_new_seen(self) -> None:
+        self._crawler_seen_new = []
+
+    def pop_new_seen(self, full: bool = False) -> List[Hash]:
+        """
+            Return the hashes of the requests seen since the last call,
+            or all of them if full is set
+        """
+        new_seen = list(self._crawler_seen_full) if full else self._crawler_seen_new or []
+        self._crawler_seen_new = []
+        return new_seen
+
+    def load_seen(self, hashes: List[Hash]) -> None:
+        self._crawler_seen_full.update(hashes)
+
+    def dump_state(self, node_id: Callable[[Node], int]) -> Dict[str, Any]:
+        """
+            The crawler state apart from the seen set, see pop_new_seen()
+        """
+        return {
+            "unseen": [node_id(node) for node in self._crawler_unseen],
+            "seen_base": { method.value: { URLS.value(url_id): count for (url_id, count) in counter.items() }
+                            for (method, counter) in self._crawler_seen_base.items() },
+            "parsed_base": { method.value: [URLS.value(url_id) for url_id in url_ids]
+                            for (method, url_ids) in self._crawler_parsed_base.items() }
+        }
+
+    def load_state(self, state: Dict[str, Any], nodes: Dict[int, Node]) -> None:
+        self._crawler_unseen = set(nodes[i] for i in state["unseen"])
+
+        for (method, counter) in state["seen_base"].items():
+            self._crawler_seen_base[HTTPMethod(method)] = { URLS.id(url): count for (url, count) in counter.items() }
+
+        for (method, urls) in state["parsed_base"].items():
+            self._crawler_parsed_base[HTTPMethod(method)] = set(map(URLS.id, urls))
+
     @property
     def pending_requests(self) -> int:
         return len(self._crawler_unseen)
@@ -182,20 +341,31 @@ class Crawler:
         logger = get_logger(__name__)
 
         base_dict = self._crawler_seen_base[new_request.method]
+        url_id = new_request.url_id
 
-        if new_request.url not in base_dict:
-            base_dict[new_request.url] = 0
+        if url_id not in base_dict:
+            base_dict[url_id] = 0
             return True
         else:
-            base_dict[new_request.url] += 1
-            if base_dict[new_request.url] == CRAWLER_PER_BASE_LIMIT:
+            base_dict[url_id] += 1
+            if base_dict[url_id] == CRAWLER_PER_BASE_LIMIT:
                 logger.warning("Base URL %s added to blocklist", new_request.url)
             
-            if base_dict[new_request.url] >= CRAWLER_PER_BASE_LIMIT:
+            if base_dict[url_id] >= CRAWLER_PER_BASE_LIMIT:
                 return False
 
         return True
 
+    def mark_crawled(self, request: Node) -> None:
+        self._crawler_parsed_base[request.method].add(request.url_id)
+
+    def is_crawled(self, request: Node) -> bool:
+        """
+            Whether a response from the base url of request
+            has already been parsed for links
+        """
+        return request.url_id in self._crawler_parsed_base[request.method]
+
     def __iter__(self):
        return self
 
@@ -210,12 +380,18 @@ class Crawler:
     """
     def __next__(self):
 
-        while len(self._crawler_unseen) != 0:
+        if self._should_load_seed():
+            self._load_seed_batch()
+
+        while len(self._crawler_unseen) != 0 or self._load_seed_batch():
             new_request = self._crawler_unseen.pop()
+            self._requests_since_seed_batch += 1
 
             # store only the hash in the set
             # as the whole node is not needed
             self._crawler_seen_full.add(new_request.__hash__())
+            if self._crawler_seen_new is not None:
+                self._crawler_seen_new.append(new_request.__hash__())
 
             if self._should_block(new_request):
                 continue
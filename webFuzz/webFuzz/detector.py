@@ -1,4 +1,5 @@
 import esprima
+import re
 
 from yarl         import URL
 from aiohttp      import ClientResponse
@@ -21,6 +22,39 @@ urlAttributes = [
     "src"
 ]
 
+XSS_MARKER = "0xdeadbeef"
+# a string matches the marker if it shares with it a substring of at least this length
+XSS_MARKER_MATCH = 5
+XSS_MARKER_RE = re.compile("|".join(
+    re.escape(XSS_MARKER[i:i + XSS_MARKER_MATCH]) for i in range(len(XSS_MARKER) - XSS_MARKER_MATCH + 1)
+))
+
+def has_marker(content: str) -> bool:
+    """
+        Equivalent to longest_str_match(content, XSS_MARKER) >= XSS_MARKER_MATCH
+        but runs in linear time over content.
+    """
+    return XSS_MARKER_RE.search(content) is not None
+
+class MarkerScanner():
+    """
+        Searches for the xss marker in text that arrives in chunks,
+        including matches spanning two consecutive chunks
+    """
+    def __init__(self):
+        self.found = False
+        self._tail = ""
+
+    def feed(self, text: str) -> None:
+        if self.found:
+            return
+
+        text = self._tail + text
+        if has_marker(text):
+            self.found = True
+
+        self._tail = text[-(XSS_MARKER_MATCH - 1):]
+
 class Detector():
     def __init__(self):
         self.xss_count = 0
@@ -31,6 +65,19 @@ class Detector():
             XSSConfidence.HIGH : {}
         }
 
+    def dump_state(self) -> Dict[str, Any]:
+        return {
+            "xss_count": self.xss_count,
+            "flagged": { conf.value: { url: list(ids) for (url, ids) in flagged.items() }
+                            for (conf, flagged) in self._flagged_elements.items() }
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.xss_count = state["xss_count"]
+
+        for (conf, flagged) in state["flagged"].items():
+            self._flagged_elements[XSSConfidence(conf)] = { url: set(ids) for (url, ids) in flagged.items() }
+
     @staticmethod
     def js_ast_traversal(node: Any) -> XSSConfidence:
         # TODO: manage javascript label statements
@@ -140,16 +187,14 @@ class Detector():
 
     def should_analyze(self, id_: str, url: str, content: str) -> bool:
         if id_ not in self._flagged_elements[XSSConfidence.HIGH].get(url, []) and \
-            longest_str_match(content, "0xdeadbeef") >= 5:
+            has_marker(content):
             return True
         
         return False
 
     @staticmethod
     def xss_precheck(raw_html: str) -> bool:
-        if longest_str_match(raw_html, "0xdeadbeef") >= 5:
-            return True
-        return False
+        return has_marker(raw_html)
 
     def xss_scanner(self,
                     node: Node,
@@ -182,6 +227,10 @@ class Detector():
             for (attr_name, attr_value) in elem.attrs.items():
                 param_id = id_ + "/" + attr_name
 
+                if isinstance(attr_value, list):
+                    # multi-valued attributes, e.g. class
+                    attr_value = " ".join(attr_value)
+
                 if not self.should_analyze(param_id, node.url, attr_value):
                     continue
 
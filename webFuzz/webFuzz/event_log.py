@@ -0,0 +1,142 @@
+"""
+    A compact binary log with one record per request, meant for analysing
+    a fuzzing run after the fact (see tools/event_reader.py).
+
+    The file starts with a header:
+
+        MAGIC | version (u8) | record format length (u8) | record format (struct format string)
+
+    followed by fixed size records of the fields listed in FIELDS. The format
+    string is part of the header, so readers do not depend on this module's
+    version of it. Records are written through a large file buffer, so logging
+    a request costs a struct.pack and a memory copy.
+"""
+import struct
+import time
+
+from array          import array
+from typing         import BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+from .node          import Node
+from .types         import get_logger
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"WFEV"
+VERSION = 1
+
+# (name, struct format) of each field of a record
+FIELDS: List[Tuple[str, str]] = [
+    ("id",            "I"),  # sequence number of the request, starting from 1
+    ("parent_id",     "I"),  # id of the request it was mutated from, 0 if none
+    ("time",          "d"),  # seconds since the start of the run
+    ("exec_time",     "f"),  # response time in seconds
+    ("status",        "H"),  # HTTP status code, 0 if the request failed
+    ("new_buckets",   "H"),  # label-buckets that were new to the corpus
+    ("cover_score",   "I"),  # number of labels the request covered
+    ("mutation_ops",  "B"),  # bitmask of the mutation functions, see Mutator
+    ("xss_confidence","B"),  # XSSConfidence value
+]
+
+# names of the bits of mutation_ops, bit i is the MutateFunc with id i+1
+# (see Mutator.op_bit) and the last one is cross_over (CROSS_OVER_OP)
+OP_NAMES = ["strxss", "xss", "alter_type", "random_text", "syntax_token", "skip_param", "cross_over"]
+
+RECORD_FORMAT = "<" + "".join(fmt for (_, fmt) in FIELDS)
+RECORD = struct.Struct(RECORD_FORMAT)
+
+WRITE_BUFFER_SIZE = 256 * 1024
+
+STATUS_FAILED = 0
+
+class EventLog:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.count = 0
+
+        self._start = time.monotonic()
+        self._file: Optional[BinaryIO] = open(filename, "wb", buffering=WRITE_BUFFER_SIZE)
+
+        header_format = RECORD_FORMAT.encode()
+        self._file.write(MAGIC + bytes([VERSION, len(header_format)]) + header_format)
+
+    def record(self, request: Node, status: int = STATUS_FAILED) -> None:
+        if self._file is None:
+            return
+
+        self.count += 1
+        request.event_id = self.count
+
+        parent = request.parent_request
+
+        self._file.write(RECORD.pack(self.count,
+                                     parent.event_id if parent else 0,
+                                     time.monotonic() - self._start,
+                                     request.exec_time,
+                                     status,
+                                     min(request.new_buckets, 0xffff),
+                                     request.cover_score_raw,
+                                     request.mutation_ops,
+                                     request.xss_confidence.value))
+
+    def close(self) -> None:
+        logger = get_logger(__name__)
+
+        if self._file:
+            self._file.close()
+            self._file = None
+
+            logger.info("Event log with %d records written to %s", self.count, self.filename)
+
+def read_header(data: bytes) -> Tuple[struct.Struct, int]:
+    """
+        :return: the record struct of the file and the offset of the first record
+    """
+    if data[:len(MAGIC)] != MAGIC or data[len(MAGIC)] != VERSION:
+        raise ValueError("Not a webFuzz event log")
+
+    fmt_length = data[len(MAGIC) + 1]
+    offset = len(MAGIC) + 2
+
+    record = struct.Struct(data[offset:offset + fmt_length].decode())
+    return (record, offset + fmt_length)
+
+def read_events(filename: str, names: Optional[Sequence[str]] = None) -> Dict[str, Sequence]:
+    """
+        Load an event log into one array per field.
+        With numpy, the columns are views of a single structured array.
+        A partially written last record is ignored.
+
+        :param names: the fields to load, all of FIELDS if None
+    """
+    field_names = [name for (name, _) in FIELDS]
+
+    unknown = set(names or []) - set(field_names)
+    if unknown:
+        raise ValueError(f"Unknown event fields {sorted(unknown)}")
+
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    (record, offset) = read_header(data)
+    formats = record.format.lstrip("<")
+    count = (len(data) - offset) // record.size
+    end = offset + count * record.size
+
+    if len(formats) != len(field_names):
+        raise ValueError(f"Unknown record format {record.format}")
+
+    selected = [(i, name, formats[i]) for (i, name) in enumerate(field_names)
+                                      if names is None or name in names]
+
+    if numpy is not None:
+        dtype = numpy.dtype([(name, "<" + fmt) for (name, fmt) in zip(field_names, formats)])
+        events = numpy.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        return { name: events[name] for (_, name, _) in selected }
+
+    columns = list(zip(*record.iter_unpack(memoryview(data)[offset:end]))) if count else [()] * len(formats)
+
+    return { name: array(fmt, columns[i]) for (i, name, fmt) in selected }
@@ -0,0 +1,248 @@
+"""
+    Reading of the instrumentation feedback of the file output method.
+
+    The instrumented application writes the map of each request to
+    <directory>/map.<REQ-ID> from a shutdown function, where the directory is
+    the instrumentor's --feedback-dir (best a tmpfs). Every request gets its
+    own REQ-ID (the worker id and a sequence number, see Worker.next_req_id),
+    so a worker can have several requests in flight and a request that
+    produces no map (e.g. a static file) is never credited with another one.
+
+    The map is read in the default executor, so that the open and read do not
+    stall the event loop. Consumed maps, and those of requests that failed,
+    are removed in batches of CLEANUP_BATCH, again in the executor.
+
+    The shutdown function may still be writing when the response arrives. With
+    inotify the reader waits (up to CLOSE_WAIT_TIMEOUT) for the application to
+    close the file after writing it.
+
+    The map of a failed request may be written after the fuzzer gave up on it.
+    Such maps are removed when their close event arrives (with inotify), and
+    their removal is retried with the next batch as well.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+
+from itertools      import islice
+from typing         import Dict, List, Optional, Set, Tuple
+
+from .environment   import env
+from .types         import get_logger, FuzzerException, Label
+
+# seconds to wait for the application to close a map file
+CLOSE_WAIT_TIMEOUT = 1.0
+
+# number of map files removed at once
+CLEANUP_BATCH = 64
+
+def read_feedback_file(filename: str, limit: Optional[int] = None) -> List[Tuple[Label, str]]:
+    """
+        Read a map file
+
+        :param limit: number of lines to read at most (all if None)
+        :return: its (label, value) pairs, none if there is no file
+    """
+    feedback = []
+    try:
+        with open(filename, "r") as f:
+            for line in islice(f, limit):
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+
+                (label, _, value) = line.partition('-')
+                feedback.append((int(label), value))
+    except FileNotFoundError:
+        return []
+
+    return feedback
+
+def remove_files(filenames: List[str]) -> None:
+    for filename in filenames:
+        try:
+            os.unlink(filename)
+        except OSError:
+            # not written (no map or a failed request) or
+            # the directory is not writable
+            pass
+
+class Inotify:
+    """
+        The names of the files closed after writing in a directory,
+        through the inotify API of libc (linux only)
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    # wd, mask, cookie, length of the name that follows
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, directory: str):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            init = libc.inotify_init1
+            add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            raise FuzzerException("inotify is not available on this system")
+
+        self.fd = init(Inotify.IN_NONBLOCK | Inotify.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        if add_watch(self.fd, os.fsencode(directory), Inotify.IN_CLOSE_WRITE) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"cannot watch {directory}")
+
+    def read_names(self) -> List[str]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset + Inotify.EVENT.size <= len(data):
+            (_, _, _, length) = Inotify.EVENT.unpack_from(data, offset)
+            offset += Inotify.EVENT.size
+
+            names.append(os.fsdecode(data[offset:offset+length].rstrip(b"\0")))
+            offset += length
+
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class FeedbackReader:
+    def __init__(self, directory: Optional[str] = None, inotify: bool = False):
+        # the instrumentor's --feedback-dir (see InstrumentArgs)
+        self.directory = directory or env.instrument_args.feedback_dir
+
+        self._inotify: Optional[Inotify] = Inotify(directory) if inotify else None
+        self._watching = False
+
+        # maps of requests in flight, and those of them
+        # that were closed before a worker asked for them
+        self._pending: Set[str] = set()
+        self._closed: Set[str] = set()
+        # workers waiting for their map to be closed
+        self._waiters: Dict[str, asyncio.Future] = {}
+
+        # maps of failed requests that may not be written yet
+        self._discarded: Set[str] = set()
+
+        # maps to remove in the next batch
+        self._spent: List[str] = []
+        # maps of failed requests to try removing once
+        # more with the next batch, in case they were late
+        self._retry: List[str] = []
+
+    def _on_events(self) -> None:
+        if self._inotify is None:
+            return
+
+        for name in self._inotify.read_names():
+            waiter = self._waiters.pop(name, None)
+            if waiter and not waiter.done():
+                waiter.set_result(None)
+            elif name in self._pending:
+                self._closed.add(name)
+            elif name in self._discarded:
+                # written after its request failed
+                self._discarded.discard(name)
+                self._mark_spent(os.path.join(self.directory, name))
+
+    async def _wait_closed(self, name: str) -> None:
+        logger = get_logger(__name__)
+        loop = asyncio.get_running_loop()
+
+        if not self._watching:
+            loop.add_reader(self._inotify.fd, self._on_events)
+            self._watching = True
+
+        if name in self._closed:
+            return
+
+        waiter = loop.create_future()
+        self._waiters[name] = waiter
+        try:
+            await asyncio.wait_for(waiter, CLOSE_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.info("%s was not written in time, reading it anyway", name)
+        finally:
+            self._waiters.pop(name, None)
+
+    def _mark_spent(self, filename: str) -> None:
+        self._spent.append(filename)
+
+        if len(self._spent) >= CLEANUP_BATCH:
+            batch = self._spent + self._retry
+            self._retry = [os.path.join(self.directory, name) for name in self._discarded]
+            self._discarded.clear()
+            self._spent = []
+            asyncio.get_running_loop().run_in_executor(None, remove_files, batch)
+
+    def expect(self, req_id: str) -> None:
+        """
+            A request with this REQ-ID is about to be sent
+        """
+        self._pending.add("map." + req_id)
+
+    async def read(self, req_id: str) -> List[Tuple[Label, str]]:
+        """
+            :return: the instrumentation feedback of the request with this REQ-ID
+        """
+        name = "map." + req_id
+        filename = os.path.join(self.directory, name)
+
+        try:
+            if self._inotify:
+                await self._wait_closed(name)
+
+            loop = asyncio.get_running_loop()
+            # a path trace is only read up to where it is looked at
+            return await loop.run_in_executor(None, read_feedback_file, filename,
+                                              env.instrument_args.max_trace)
+        finally:
+            self._pending.discard(name)
+            self._closed.discard(name)
+            self._mark_spent(filename)
+
+    def discard(self, req_id: str) -> None:
+        """
+            The request with this REQ-ID failed, its map (if any) is not read
+        """
+        name = "map." + req_id
+
+        self._pending.discard(name)
+        if name not in self._closed:
+            # not written yet, or never will be
+            self._discarded.add(name)
+
+        self._closed.discard(name)
+        self._mark_spent(os.path.join(self.directory, name))
+
+    def close(self) -> None:
+        batch = self._spent + self._retry + \
+                [os.path.join(self.directory, name) for name in self._discarded]
+        (self._spent, self._retry) = ([], [])
+        self._discarded.clear()
+        remove_files(batch)
+
+        if self._inotify is None:
+            return
+
+        if self._watching:
+            try:
+                asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            except RuntimeError:
+                pass
+            self._watching = False
+
+        self._inotify.close()
+        self._inotify = None
@@ -7,14 +7,20 @@ import logging
 import random
 import signal
 
-from typing          import ContextManager, List, AsyncIterator, Dict
-from aiohttp.client  import ClientSession
-from aiohttp.tracing import TraceConfig
+from typing          import ContextManager, Dict, List, Optional
 from urllib.parse    import urlparse
-from contextlib      import asynccontextmanager
 
 # User defined modules
-from .worker        import Worker
+from .pipeline      import Pipeline
+from .target_pool   import TargetPool
+from .concurrency   import ConcurrencyController
+from .session       import SessionManager
+from .checkpoint    import Checkpoint
+from .event_log     import EventLog
+from .replay        import Recorder, Replayer
+from .metrics       import Metrics, MetricsServer
+from .profiler      import StageProfiler, SnapshotProfiler
+from .feedback_reader import FeedbackReader
 #from .curses_menu   import Curses_menu
 from .environment   import env
 from .node          import Node
@@ -27,6 +33,7 @@ from .browser       import Browser
 from .parser        import Parser
 from .detector      import Detector
 from .simple_menu   import Simple_menu
+from .worker        import Worker
 
 class Fuzzer:
     def __init__(self, args: Arguments) -> None:
@@ -40,6 +47,9 @@ class Fuzzer:
         logger = get_logger(__name__)
         logger.debug(args)
 
+        if args.seed is not None:
+            random.seed(args.seed)
+
         self.worker_count = args.worker
 
         meta = json.loads(open(args.meta_file).read())
@@ -49,23 +59,22 @@ class Fuzzer:
 
         if env.instrument_args.output_method == OutputMethod.HTTP:
             # expect instr. feedback in http-header form so adjust this
-            http.client._MAXHEADERS = max(10000, env.instrument_args.basic_blocks) # type:ignore
+            http.client._MAXHEADERS = env.instrument_args.max_headers() # type:ignore
 
         self._session_node = Node(url=urlparse(args.URL), method=HTTPMethod.GET, label="session_check")
         start_node = Node(url=urlparse(args.URL), method=HTTPMethod.GET)
+        self._start_node = start_node
         initial_seed = set([start_node])
-            
-        cookies = {}
-        if args.proxy:
-            b = Browser(args.driver_file, proxy_port=args.proxy_port)
-            result = b.run_browser(start_node)
-
-            if args.session:
-                cookies = result.cookies
-            if args.proxy:
-                initial_seed.update(result.nodes)
-        
-        self.http_cookies = cookies
+
+        # in proxy mode the rest of the seed (and the cookies)
+        # are recorded from a browser session, see record_seed()
+        self.http_cookies: Dict[str, str] = {}
+
+        # requests that log us in, replayed when logged out
+        self._login_sequence: List[Node] = []
+        if args.login_file:
+            self._login_sequence = SessionManager.parse_login_file(args.login_file)
+
         logger.debug("Initial Seed: %s", initial_seed)
 
         headers = retrieve_headers()
@@ -73,7 +82,8 @@ class Fuzzer:
 
         self._crawler = Crawler(block_rules=args.block,
                                 init_seed=initial_seed,
-                                seed_file=args.seed_file)
+                                seed_file=args.seed_file,
+                                scope=start_node.url_object)
 
         self._node_iterator = NodeIterator()
         
@@ -85,69 +95,114 @@ class Fuzzer:
 
         self.stats = Statistics(start_node)
 
-    @asynccontextmanager
-    async def http_session(cookies: Dict[str, str],
-                           headers: Dict[str, str],
-                           conn_count: int) -> AsyncIterator[ClientSession]:
+        self.pipeline: Optional[Pipeline] = None
+
+        self.targets = TargetPool(args.URL, args.replica, args.routing)
+
+        self.checkpoint: Optional[Checkpoint] = None
+        if args.checkpoint:
+            self.checkpoint = Checkpoint(args.checkpoint,
+                                         self._crawler,
+                                         self._node_iterator,
+                                         self._detector,
+                                         self.stats)
+            if args.resume:
+                self.checkpoint.load()
+
+        self.event_log: Optional[EventLog] = None
+        if args.event_log:
+            self.event_log = EventLog(args.event_log)
+
+        self.recorder: Optional[Recorder] = None
+        if args.record:
+            self.recorder = Recorder(args.record, meta)
+
+        self.metrics = Metrics()
+        self.metrics.frontier_size.set_function(lambda: self._crawler.pending_requests)
+        self.metrics.corpus_size.set_function(lambda: len(self._node_iterator.node_list))
+        self.metrics.coverage.set_function(lambda: self._node_iterator.total_cover_score)
+        self.metrics.xss_found.set_function(lambda: self._detector.xss_count)
+
+        self.profiler = StageProfiler(enabled=args.profile_stages)
+
+        self.snapshot_profiler: Optional[SnapshotProfiler] = None
+        if args.profile_snapshot:
+            self.snapshot_profiler = SnapshotProfiler(args.profile_snapshot,
+                                                      args.profile_snapshot_interval)
+
+        self.feedback_reader = FeedbackReader(inotify=args.feedback_inotify and \
+                                              env.instrument_args.output_method == OutputMethod.FILE)
+
+        self.controller: Optional[ConcurrencyController] = None
+        if args.adaptive_concurrency:
+            # --worker becomes the upper bound of in-flight requests
+            self.controller = ConcurrencyController(max_limit=self.worker_count,
+                                                    latency_target=args.latency_target)
+
+    async def record_seed(self) -> None:
+        """
+            Proxy mode. Record the requests of a browser session as seed
+        """
         logger = get_logger(__name__)
-        logger.info("New session to be created")
 
-        # timeout per link in seconds
-        timeout = aiohttp.ClientTimeout(total=env.args.request_timeout) # type: ignore
-        trace_configs = [rtt_trace_config()]
+        b = Browser(env.args.driver_file, proxy_port=env.args.proxy_port)
+        result = await b.run_browser(self._start_node)
+
+        if env.args.session:
+            self.http_cookies = result.cookies
+            self.record_login(result.login)
+
+        logger.debug("Recorded Seed: %s", result.nodes)
+        self._crawler.add_seed(result.nodes)
+
+    def record_login(self, login_sequence: List[Node]) -> None:
+        if not login_sequence:
+            return
 
-        conn = aiohttp.TCPConnector(limit=conn_count, limit_per_host=conn_count)
+        self._login_sequence = login_sequence
+        SessionManager.store_login_file(login_sequence)
 
-        async with aiohttp.ClientSession(cookies=cookies,
-                                         headers=headers,
-                                         connector=conn,
-                                         timeout=timeout,
-                                         trace_configs=trace_configs) as s:
-            yield s
-    
     async def fuzzer_loop(self) -> ExitCode:
         logger = get_logger(__name__)
         exit_code = ExitCode.NONE
 
         if env.args.session and not self.http_cookies:
             b = Browser(env.args.driver_file, proxy_port=env.args.proxy_port)
-            result = b.run_browser(self._session_node)
+            result = await b.run_browser(self._session_node)
 
             self.http_cookies = result.cookies
+            self.record_login(result.login)
 
-        async with Fuzzer.http_session(self.http_cookies, 
-                                       self.http_headers, 
-                                       self.worker_count) as s:
+        async with self.targets.sessions(self.http_cookies, 
+                                         self.http_headers, 
+                                         self.worker_count) as targets:
 
-            logger.info("Spawning %d workers", self.worker_count)
+            session_manager = None
+            if self._login_sequence:
+                session_manager = SessionManager(targets,
+                                                 self._login_sequence,
+                                                 self._session_node)
 
-            workers: List[asyncio.Task] = []
-            for count in range(self.worker_count):
-                worker_id = str(random.randrange(10000, 1000000))
-                worker = Worker(worker_id,
-                                s,
+            pipeline = Pipeline(targets,
                                 self._crawler,
                                 self._mutator,
                                 self._parser,
                                 self._detector,
                                 self._node_iterator,
                                 self._session_node,
-                                self.stats)
-
-                workers.append(worker.async_run())
-
-                if count == 0:
-                    # if it is the first worker spawned
-                    # wait until at least one request/response cycle is done
-                    # this is needed because workers that find an empty queue exit
-                    await asyncio.sleep(8)
-
-                if env.shutdown_signal != ExitCode.NONE:
-                    break
-        
-            # wait for them to finish
-            for worker in workers:
-                exit_code: ExitCode = await worker
+                                self.stats,
+                                io_workers=self.worker_count,
+                                queue_size=env.args.queue_size,
+                                controller=self.controller,
+                                session_manager=session_manager,
+                                event_log=self.event_log,
+                                recorder=self.recorder,
+                                metrics=self.metrics,
+                                profiler=self.profiler,
+                                feedback_reader=self.feedback_reader)
+            self.pipeline = pipeline
+
+            exit_code = await pipeline.run()
         
         if exit_code == exit_code.LOGGED_OUT and env.args.session:
             self.http_cookies = {}
@@ -155,7 +210,6 @@ class Fuzzer:
         
         env.shutdown_signal = exit_code
         logger.warning('Shutting Down...')
-        logging.shutdown()
 
         return env.shutdown_signal
 
@@ -168,15 +222,76 @@ class Fuzzer:
         loop.add_signal_handler(signal.SIGINT, sigint_handler)
         loop.add_signal_handler(signal.SIGALRM, sigalarm_handler)
 
+        if env.args.proxy:
+            await self.record_seed()
+
+        metrics_server = None
+        if env.args.metrics_port:
+            metrics_server = MetricsServer(self.metrics, env.args.metrics_port, env.args.metrics_host)
+            await metrics_server.start()
+
         interface_task = asyncio.create_task(interface.run(self))
         fuzzer_loop_task = asyncio.create_task(self.fuzzer_loop())
 
+        checkpoint_task = None
+        if self.checkpoint:
+            checkpoint_task = asyncio.create_task(self.checkpoint.run(env.args.checkpoint_interval))
+
+        snapshot_task = None
+        if self.snapshot_profiler:
+            snapshot_task = asyncio.create_task(self.snapshot_profiler.run())
+
         exit_code = await fuzzer_loop_task
         await interface_task
 
+        if checkpoint_task:
+            await checkpoint_task
+
+        if snapshot_task:
+            await snapshot_task
+
+        if metrics_server:
+            await metrics_server.stop()
+
+        self.feedback_reader.close()
+
         return exit_code
 
+    def replay(self) -> ExitCode:
+        """
+            Process the responses of a --record file instead of fuzzing
+        """
+        worker = Worker("replay",
+                        self.targets,
+                        self._crawler,
+                        self._parser,
+                        self._detector,
+                        self._node_iterator,
+                        self.stats,
+                        self.metrics,
+                        self.profiler)
+
+        signal.signal(signal.SIGINT, sigint_handler)
+
+        replayer = Replayer(env.args.replay, worker, self.event_log)
+        count = replayer.run()
+
+        print(f"Replayed {count} responses in {replayer.elapsed:.2f}s CPU time " \
+              f"({count / max(replayer.elapsed, 1e-9):.1f} responses/s)")
+        print(f"Coverage: {self.stats.total_cover_score:.3f}%, " \
+              f"corpus: {len(self._node_iterator.node_list)} nodes, " \
+              f"pending urls: {self._crawler.pending_requests}, " \
+              f"xss found: {self._detector.xss_count}")
+
+        return ExitCode.NONE
+
     def run(self) -> ExitCode:
+        if env.args.replay:
+            try:
+                return self.replay()
+            finally:
+                self.close()
+
         if env.args.run_mode == RunMode.SIMPLE:
             interface = Simple_menu(print_to_file=False)
         elif env.args.run_mode == RunMode.FILE:
@@ -185,4 +300,21 @@ class Fuzzer:
             raise Exception("Curses interface not available")
             #interface = Curses_menu()
         
-        return asyncio.run(self.async_run(interface))
+        try:
+            return asyncio.run(self.async_run(interface))
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.event_log:
+            self.event_log.close()
+
+        if self.recorder:
+            self.recorder.close()
+
+        if self.profiler.enabled:
+            print("\n".join(["Stage times (ms):"] + self.profiler.report()))
+
+        # flush the log records still queued
+        FuzzerLogger.stop_logging()
+        logging.shutdown()
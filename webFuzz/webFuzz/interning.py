@@ -0,0 +1,80 @@
+"""
+    Process-wide tables of the strings that many nodes share: the base urls
+    and the parameter names. Each distinct string is stored once and numbered
+    in the order it is first seen.
+
+    Nodes keep the id of their base url (and the table's copy of their
+    parameter names), so the thousands of nodes parsed from the links of
+    the same pages do not each hold a copy of the same strings. The crawler
+    and the corpus key their per url counters by the id, which is cheaper
+    to hash and compare than the url.
+
+    Ids are only valid within a process, anything stored on disk (or hashed,
+    see misc.request_hash) uses the strings.
+
+    Entries are never dropped, so only strings that come from the target
+    (parsed pages, seeds, recorded requests) are added. Mutation keeps the url
+    of a node, and the parameter names it makes up are not added, see
+    Node.params.
+"""
+from typing         import Dict, List, Optional
+from urllib.parse   import urlparse
+
+from .types         import UrlType
+
+class InternTable:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def id(self, value: str) -> int:
+        id_ = self._ids.get(value)
+        if id_ is None:
+            id_ = len(self._values)
+            self._ids[value] = id_
+            self._values.append(value)
+
+        return id_
+
+    def value(self, id_: int) -> str:
+        return self._values[id_]
+
+    def intern(self, value: str) -> str:
+        """
+            :return: the table's copy of value
+        """
+        return self._values[self.id(value)]
+
+    def get(self, value: str) -> str:
+        """
+            :return: the table's copy of value if it has one, value otherwise
+        """
+        id_ = self._ids.get(value)
+        return value if id_ is None else self._values[id_]
+
+class UrlTable(InternTable):
+    """
+        Also keeps the parsed form of each url, so
+        that a url is parsed once per process
+    """
+    def __init__(self):
+        super().__init__()
+        self._parsed: List[Optional[UrlType]] = []
+
+    def parsed(self, id_: int) -> UrlType:
+        if id_ >= len(self._parsed):
+            self._parsed.extend([None] * (len(self._values) - len(self._parsed)))
+
+        url_obj = self._parsed[id_]
+        if url_obj is None:
+            url_obj = urlparse(self._values[id_])
+            self._parsed[id_] = url_obj
+
+        return url_obj
+
+URLS = UrlTable()
+
+PARAM_NAMES = InternTable()
@@ -0,0 +1,184 @@
+"""
+    In-process metrics of the fuzzer, served in the Prometheus text format
+    (https://prometheus.io/docs/instrumenting/exposition_formats/) so that
+    fuzzing farms can be monitored without scraping the logs.
+
+    Counters and histograms are updated in the hot path, so they are plain
+    attribute updates. Gauges of sizes that are already tracked elsewhere
+    (queue depths, frontier and corpus size) are read only when scraped.
+"""
+from bisect        import bisect_left
+from typing        import Callable, List, Optional, Sequence
+
+from aiohttp       import web
+
+from .types        import get_logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type_ = "untyped"
+
+    def __init__(self, name: str, help_: str):
+        self.name = name
+        self.help = help_
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} {self.type_}"]
+        lines.extend(self.samples())
+
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type_ = "counter"
+
+    def __init__(self, name: str, help_: str):
+        super().__init__(name, help_)
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {format_value(self.value)}"]
+
+class Gauge(Metric):
+    type_ = "gauge"
+
+    def __init__(self, name: str, help_: str, func: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_)
+        self.value: float = 0
+        self._func = func
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        """
+            Read the value from func when scraped
+        """
+        self._func = func
+
+    def samples(self) -> List[str]:
+        value = self._func() if self._func else self.value
+        return [f"{self.name} {format_value(value)}"]
+
+class Histogram(Metric):
+    type_ = "histogram"
+
+    def __init__(self, name: str, help_: str, buckets: Sequence[float]):
+        super().__init__(name, help_)
+        self.buckets = tuple(sorted(buckets))
+        # the last slot counts the values above the largest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        cumulative = 0
+
+        for (bound, count) in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{format_value(bound)}"}} {cumulative}')
+
+        lines.append(f"{self.name}_sum {format_value(self.sum)}")
+        lines.append(f"{self.name}_count {self.count}")
+
+        return lines
+
+class Metrics:
+    """
+        The metrics of a fuzzer instance. The size gauges are
+        connected to their sources with Gauge.set_function
+    """
+    def __init__(self, prefix: str = "webfuzz"):
+        self.requests = Counter(f"{prefix}_requests_total",
+                                "Requests sent to the target")
+        self.request_errors = Counter(f"{prefix}_request_errors_total",
+                                      "Requests that failed without a response")
+        self.skipped_parses = Counter(f"{prefix}_skipped_parses_total",
+                                      "Responses that were not parsed by the header fast path")
+
+        self.request_latency = Histogram(f"{prefix}_request_latency_seconds",
+                                         "Time from sending a request to receiving its response headers",
+                                         LATENCY_BUCKETS)
+        self.parse_time = Histogram(f"{prefix}_parse_seconds",
+                                    "Time spent parsing response bodies and extracting their links",
+                                    STAGE_BUCKETS)
+        self.detector_time = Histogram(f"{prefix}_detector_seconds",
+                                       "Time spent scanning responses for XSS",
+                                       STAGE_BUCKETS)
+        self.merge_time = Histogram(f"{prefix}_coverage_merge_seconds",
+                                    "Time spent merging the coverage of responses into the corpus",
+                                    STAGE_BUCKETS)
+
+        self.request_queue_depth = Gauge(f"{prefix}_request_queue_depth",
+                                         "Requests waiting for an I/O worker")
+        self.feedback_queue_depth = Gauge(f"{prefix}_feedback_queue_depth",
+                                          "Responses waiting for the feedback stage")
+        self.in_flight = Gauge(f"{prefix}_in_flight_requests",
+                               "Requests scheduled whose feedback is not processed yet")
+        self.frontier_size = Gauge(f"{prefix}_frontier_size",
+                                   "Links found by the crawler that are not requested yet")
+        self.corpus_size = Gauge(f"{prefix}_corpus_size",
+                                 "Nodes in the corpus")
+        self.coverage = Gauge(f"{prefix}_coverage_percent",
+                              "Total coverage score")
+        self.xss_found = Gauge(f"{prefix}_xss_found",
+                               "XSS vulnerabilities found")
+
+    def all(self) -> List[Metric]:
+        return [metric for metric in vars(self).values() if isinstance(metric, Metric)]
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.all()) + "\n"
+
+class MetricsServer:
+    """
+        Serves the metrics in the Prometheus text format at /metrics
+    """
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1"):
+        self._metrics = metrics
+        self.port = port
+        self.host = host
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._metrics.render().encode(),
+                            headers={ "Content-Type": CONTENT_TYPE })
+
+    async def start(self) -> None:
+        logger = get_logger(__name__)
+
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        logger.info("Serving metrics at http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
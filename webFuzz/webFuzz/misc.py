@@ -1,3 +1,4 @@
+import json
 import logging
 
 import asyncio
@@ -11,25 +12,28 @@ from aiohttp.client   import ClientSession, TraceConfig
 from aiohttp.typedefs import CIMultiDictProxy
 from os               import path, access, R_OK
 from functools        import partial
+from hashlib          import blake2b
 
-from .types           import get_logger, ExitCode, Numeric, Label, Bucket
+from .types           import get_logger, ExitCode, Numeric, Label, Bucket, HTTPMethod, Params
 from .environment     import env
 
-def object_to_tuple(d: object) -> tuple:
-    if isinstance(d, str) or isinstance(d, int) or isinstance(d, float):
-        return tuple(str(d))
+def request_hash(url: str, method: HTTPMethod, params: Params) -> int:
+    """
+        Hash of a request over a canonical encoding of it, i.e. with the
+        parameter names and values sorted (params is left untouched). Unlike
+        hash() it does not depend on the hash seed, so it is the same in
+        every process and can be stored.
+    """
+    canonical: List[Any] = [url, method.value]
 
-    if isinstance(d, list):
-        d.sort()
-        return tuple([object_to_tuple(x) for x in d])
-    
-    if isinstance(d, dict):
-        keys = list(d.keys())
+    for param_type in (HTTPMethod.GET, HTTPMethod.POST):
+        typed_params = params.get(param_type, {})
+        canonical.append([(name, [values] if isinstance(values, str) else sorted(map(str, values)))
+                            for (name, values) in sorted(typed_params.items())])
 
-        keys.sort()
-        return tuple([(k, object_to_tuple(d[k])) for k in keys])
-    
-    return tuple('')
+    encoded = json.dumps(canonical, separators=(',', ':')).encode()
+
+    return int.from_bytes(blake2b(encoded, digest_size=8).digest(), "little", signed=True)
 
 def retrieve_headers() -> Dict[str,str]:
     return {
@@ -5,11 +5,11 @@ import string
 import copy
 
 from typing         import Callable, List, Optional, Tuple, NamedTuple
-from math           import ceil
 from os.path        import dirname
 
 # User defined modules
 from .node          import Node
+from .node_iterator import NodeIterator
 from .types         import HTTPMethod, Params, get_logger
 
 # Weights that govern how often a mutation
@@ -24,6 +24,10 @@ FREQ_SKIP_PARAM      = 20
 # Smaller values indicate higher frequency
 FREQ_CLEAR_PARAM     = 5 
 
+# id of cross_over in the mutation_ops bitmask of a Node,
+# after the ids of the per parameter MutateFuncs
+CROSS_OVER_OP = 7
+
 # these should remain as is
 HEADS = 1
 TAILS = 2
@@ -74,11 +78,14 @@ class MutateFunctions(NamedTuple):
         return weights
 
     @property
-    def mutator(self) -> Callable:
-        func = random.choices(self.functions,
+    def choice(self) -> MutateFunc:
+        return random.choices(self.funcs,
                               weights=self.weights,
                               k=1)[0]
-        return func
+
+    @property
+    def mutator(self) -> Callable:
+        return self.choice.func
 
 def read_tokens(filename:str) -> List[str]:
     with open(dirname(__file__) + "/" + filename) as fl:
@@ -110,32 +117,43 @@ class Mutator:
             MutateFunc(6, FREQ_SKIP_PARAM, self.skip_param)
         ])
 
-    def mutate(self, from_node: Node, node_list: List[Node]) -> Node:
+        # bitmask of the ids of the functions applied by the last mutate()
+        self._ops = 0
+
+    @staticmethod
+    def op_bit(op_id: int) -> int:
+        return 1 << (op_id - 1)
+
+    def mutate(self, from_node: Node, corpus: NodeIterator) -> Node:
         """
             Returns a new Node with mutated input parameters
         """
         logger = get_logger(__name__)
         logger.debug("Start node: %s", from_node)
 
+        self._ops = 0
+
         if from_node.size == 0:
             # does not have any parameters
-            new_params = self.cross_over(from_node, node_list)
+            self._ops |= Mutator.op_bit(CROSS_OVER_OP)
+            new_params = self.cross_over(from_node, corpus)
         else:
             choice = random.choices([self.per_param_mutate, self.all_param_mutate], 
                                     weights=[80,20], 
                                     k=1)[0]
 
-            new_params = choice(from_node, node_list)
+            new_params = choice(from_node, corpus)
 
         new_node = Node(url=from_node.url,
                         method=from_node.method,
                         params=new_params,
                         parent_request=from_node)
+        new_node.mutation_ops = self._ops
 
         logger.debug("Mutated node: %s", new_node)
         return new_node
     
-    def per_param_mutate(self, from_node: Node, node_list: List[Node]) -> Params:
+    def per_param_mutate(self, from_node: Node, corpus: NodeIterator) -> Params:
         logger = logging.getLogger(__name__)
         logger.debug("Mutating each parameter")
         
@@ -148,7 +166,10 @@ class Mutator:
                 if (random.randint(0, FREQ_CLEAR_PARAM) == 0):
                     value = ""
 
-                (param, val) = self.per_param_mutators.mutator(key, value)
+                mutate_func = self.per_param_mutators.choice
+                self._ops |= Mutator.op_bit(mutate_func.id)
+
+                (param, val) = mutate_func.func(key, value)
 
                 if param != key:
                     # delete the original parameter if mutated parameter name is different
@@ -160,39 +181,23 @@ class Mutator:
 
         return params
 
-    def all_param_mutate(self, from_node:Node, node_list: List[Node]) -> Params:
+    def all_param_mutate(self, from_node:Node, corpus: NodeIterator) -> Params:
         logger = logging.getLogger(__name__)
         logger.debug("Mutating all parameters")
 
         functions = [self.cross_over]
 
-        return random.choice(functions)(from_node, node_list)
+        self._ops |= Mutator.op_bit(CROSS_OVER_OP)
+        return random.choice(functions)(from_node, corpus)
 
     @staticmethod
-    def select_favourable_node(node_list: List[Node], 
+    def select_favourable_node(corpus: NodeIterator, 
                                start_node: Node, 
                                cross_type: HTTPMethod) -> Optional[Node]:
-        if len(node_list) == 0:
-            return None
-
-        len_params_self = len(start_node.params[cross_type])
-
-        cross_node = node_list[0]
-        for node in node_list:
-
-            len_params_node = len(node.params[cross_type])
-            
-            if len_params_node > len(cross_node.params[cross_type]) and \
-                 node.url != start_node.url:
-                cross_node = node
-                break
-            elif len_params_node >= ceil(len_params_self/2):
-                cross_node = node
-        
-        return cross_node
+        return corpus.cross_over_partner(start_node, cross_type)
 
     @staticmethod
-    def cross_over(from_node:Node, node_list: List[Node]) -> Params:
+    def cross_over(from_node:Node, corpus: NodeIterator) -> Params:
         """
             Cross over the parameters of two different
             nodes to form a new one. Note that the url and method
@@ -215,8 +220,8 @@ class Mutator:
                 # GET requests should not have post parameters
                 continue
 
-            cross_node = Mutator.select_favourable_node(node_list, from_node, param_type)
-            logger.debug("Selected cross-over node as %s")
+            cross_node = Mutator.select_favourable_node(corpus, from_node, param_type)
+            logger.debug("Selected cross-over node as %s", cross_node)
 
             if cross_node is None:
                 continue
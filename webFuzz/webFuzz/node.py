@@ -3,16 +3,20 @@
 """
 from __future__ import annotations
 
-import jsonpickle
+import json
 
-from typing           import Dict, Any, Union, Optional
+from os                import path
+
+from typing           import Dict, Any, Iterable, Iterator, Tuple, Union, Optional
 from urllib.parse     import ParseResult, urlparse, urlunparse, urlencode
 from aiohttp.typedefs import CIMultiDictProxy
 
 
 from .environment     import env
-from .misc            import object_to_tuple, query_to_dict, calc_weighted_difference, to_bucket, parse_headers, parse_file
-from .types           import OutputMethod, Params, Policy, XSSConfidence, UrlType, HTTPMethod, FuzzerException, CFGTuple, CFG
+from .interning       import URLS, PARAM_NAMES
+from .path_hash       import path_counts
+from .misc            import request_hash, query_to_dict, calc_weighted_difference, to_bucket, parse_headers, parse_file
+from .types           import OutputMethod, Params, Policy, XSSConfidence, UrlType, HTTPMethod, FuzzerException, CFGTuple, CFG, Label
 
 # post (and maybe get) parameters can get pretty huge. for instance when sending a file
 # via post. Or sometimes a parameter can get reescaped in every request/response cycle
@@ -34,30 +38,39 @@ UNCERTAINTY_THRESH = 0.10
 
 class Node:
     def __init__(self,
-                 url: Union[str|UrlType],
+                 url: Union[str|UrlType|int],
                  method: HTTPMethod,
                  params: Optional[Params] = None,
                  parent_request: Optional[Node] = None,
                  exec_time: float = 0,
                  label: str = ""):
 
-        if not params:
-            params = {}
-            
-        params[HTTPMethod.GET] = params.get(HTTPMethod.GET, {})
-        params[HTTPMethod.POST] = params.get(HTTPMethod.POST, {})
+        # the params setter copies them, the caller's dicts are left as they are
+        params = params or {}
+        params = { HTTPMethod.GET: params.get(HTTPMethod.GET, {}),
+                   HTTPMethod.POST: params.get(HTTPMethod.POST, {}) }
+
+        # set before the params, see the params setter
+        self.parent_request = parent_request  # coverage score of the parent (node that we got mutated from)
 
         if isinstance(url, str):
             url = urlparse(url)
 
-        if isinstance(url, ParseResult):
+        if isinstance(url, int):
+            # id of an already split base url (without the query) in URLS,
+            # with its query parameters in params, see Parser.resolve
+            self.url_id: int = url
+            self.params = params
+
+        elif isinstance(url, ParseResult):
             # Parse a query string to dict of its parameters.
             get_params = query_to_dict(url.query)
-            params[HTTPMethod.GET].update(get_params)
+            params[HTTPMethod.GET] = { **params[HTTPMethod.GET], **get_params }
             self.params = params
 
             # Convert the url object back to string without the query.
-            self._url: str = urlunparse(url._replace(query=''))
+            # The string itself is kept once per process in URLS
+            self.url_id = URLS.id(urlunparse(url._replace(query='')))
         else:
             raise FuzzerException(f"Invalid url type {str(type(url))}")
 
@@ -68,7 +81,6 @@ class Node:
 
         self.exec_time: float = exec_time
         self.picked_score: int = 0  # how many times it has been chosen for further mutation
-        self.parent_request = parent_request  # coverage score of the parent (node that we got mutated from)
         self.has_sinks = False
 
         self.ref_count: int = 0
@@ -76,13 +88,25 @@ class Node:
 
         self.label = label
 
+        # id of the node in the checkpoint file (0 if not stored yet)
+        self.checkpoint_id: int = 0
+
+        # sequence number of the request in the event log (0 if not logged)
+        self.event_id: int = 0
+        # sequence number of the response in the --record file (0 if not recorded)
+        self.record_id: int = 0
+        # bitmask of the mutation functions that produced this node, see Mutator
+        self.mutation_ops: int = 0
+        # number of label-buckets this request was the first to hit
+        self.new_buckets: int = 0
+
         # instrumentation related metadata
         self._cover_score_xor: int = 0  # coverage score (xor label count)
         self._cover_score_single: int = 0  # coverage score (simple label count)
 
     @property
     def url(self) -> str:
-        return self._url
+        return URLS.value(self.url_id)
 
     @property
     def full_url(self) -> str:
@@ -94,7 +118,7 @@ class Node:
     @property
     def url_object(self) -> UrlType:
         if not hasattr(self, '_url_object'):
-            url_obj = urlparse(self._url)
+            url_obj = URLS.parsed(self.url_id)
             query = urlencode(self.params[HTTPMethod.GET], doseq=True)
             self._url_object = url_obj._replace(query=query)
         
@@ -132,14 +156,22 @@ class Node:
 
     @params.setter
     def params(self, new_value: Params) -> Node:
-        self._params = new_value
-
-        # trim all parameters to a maximum allowed length
-        for (_, params) in self._params.items():
-            for key in params:
-                length = len(params[key])
+        # share the parameter names with the other nodes. The names a
+        # mutation makes up are not added to the table, as they would
+        # stay there for the rest of the run
+        intern = PARAM_NAMES.get if self.is_mutated else PARAM_NAMES.intern
+
+        self._params = {}
+        for (method, params) in new_value.items():
+            self._params[method] = {}
+
+            for (key, value) in params.items():
+                # trim all parameters to a maximum allowed length
+                length = len(value)
                 if length > MAX_PARAMETER_SIZE:
-                    params[key] = params[key][length - MAX_PARAMETER_SIZE:]
+                    value = value[length - MAX_PARAMETER_SIZE:]
+
+                self._params[method][intern(key)] = value
 
         # force recalculation of the following
         # attr since they depend on params
@@ -192,35 +224,45 @@ class Node:
     def json(self) -> str:
         """
             The json format of the node. Note that not all the attributes
-            are outputted to the json. See Node.__getstate__
+            are outputted to the json. See Node.to_dict
         """
         if not hasattr(self, '_json'):
-            self._json = jsonpickle.encode(self, unpicklable=False)
+            self._json = json.dumps(self.to_dict())
         
         return self._json
 
+    @staticmethod
+    def read_instrumentation(headers: CIMultiDictProxy[str],
+                             worker_id: str = "") -> Iterator[Tuple[Label, str]]:
+        """
+           The raw (label, value) pairs of the instrumentation feedback of a request.
+        """
+        if env.instrument_args.output_method == OutputMethod.HTTP:
+            return parse_headers(headers)
+
+        return parse_file(path.join(env.instrument_args.feedback_dir, "map." + worker_id))
+
     def parse_instrumentation(self, 
                               headers: CIMultiDictProxy[str],
                               worker_id: str = "") -> CFGTuple:
         """
            Parses the instrumentation feedback from a request. 
         """
+        return self.parse_feedback(Node.read_instrumentation(headers, worker_id))
+
+    def parse_feedback(self, feedback: Iterable[Tuple[Label, str]]) -> CFGTuple:
+        """
+           Converts the raw instrumentation feedback to label buckets
+        """
         cfg_xor: CFG = {}
         cfg_single: CFG = {}
         instrument_args = env.instrument_args
         
-        iterator = None
-        if instrument_args.output_method == OutputMethod.HTTP:
-            iterator = parse_headers(headers)
-
-        elif instrument_args.output_method == OutputMethod.FILE:
-            iterator = parse_file("/var/instr/map." + worker_id)
-
         if instrument_args.policy == Policy.EDGE or \
            instrument_args.policy == Policy.NODE:
            
             cfg: CFG = {}
-            for (label, hit_count) in iterator:
+            for (label, hit_count) in feedback:
                 cfg[label] = to_bucket(int(hit_count))
 
             if instrument_args.policy == Policy.EDGE:
@@ -229,13 +271,21 @@ class Node:
                 cfg_single = cfg
 
         elif instrument_args.policy == Policy.NODE_EDGE:
-            for (label, value) in iterator:
+            for (label, value) in feedback:
                 (xor, single) = map(int, value.split('-'))
                 if xor > 0:
                     cfg_xor[label] = to_bucket(xor)
                 if single > 0:
                     cfg_single[label] = to_bucket(single)
 
+        elif instrument_args.policy == Policy.PATH:
+            (paths, blocks) = path_counts(feedback,
+                                           env.args.path_ngram,
+                                           env.args.path_map_size,
+                                           instrument_args.max_trace)
+            cfg_xor = { label: to_bucket(count) for (label, count) in paths.items() }
+            cfg_single = { label: to_bucket(count) for (label, count) in blocks.items() }
+
         self._cover_score_xor = len(cfg_xor)
         self._cover_score_single = len(cfg_single)
 
@@ -311,24 +361,22 @@ class Node:
                 url = self.url
             else:
                 # remove fragment
-                url = urlparse(self.url)._replace(fragment='')
-                url = urlunparse(url)
+                url = self.url.partition('#')[0]
 
-            self._hash = hash((url, self.method, object_to_tuple(self.params)))
+            self._hash = request_hash(url, self.method, self.params)
 
         return self._hash
 
-    def __getstate__(self) -> Dict[str, Any]:
+    def to_dict(self) -> Dict[str, Any]:
         """
-            Tell jsonpickle which attributes from the Node
-            to output in the json
+            The attributes of the Node to output in the json
         """
 
-        state = {}
+        state: Dict[str, Any] = {}
 
         state['url'] = self.url
         state['method'] = self.method.name
-        state['params'] = self.params
+        state['params'] = { method.name: params for (method, params) in self.params.items() }
         state['xss_confidence'] = self.xss_confidence.name
         state['cover_score'] = str(f"{self.cover_score:.3f}")
         state['mutated_score'] = self.mutated_score
@@ -336,6 +384,14 @@ class Node:
 
         return state
 
+    @staticmethod
+    def nodes_to_json(nodes: Iterable[Node]) -> str:
+        """
+            The json array of many nodes, built from (and caching)
+            the json of each node
+        """
+        return "[" + ", ".join(node.json for node in nodes) + "]"
+
     def __str__(self) -> str:
         """
             Defines the printable format of a node
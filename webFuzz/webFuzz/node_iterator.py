@@ -7,14 +7,130 @@
 """
 
 import heapq
+import logging
 
-from typing         import Dict, List, Set, Optional
+from array          import array
+from typing         import Any, Callable, Dict, List, Set, Optional, Tuple
+from bisect         import bisect_left, insort
+from math           import ceil
 import random
 
 from .node          import Node
-from .types         import CFGTuple, HTTPMethod, List, Label, CFG, Policy, get_logger
+from .types         import CFGTuple, HTTPMethod, List, Label, CFG, Policy, FuzzerException, get_logger
 from .environment   import env
 
+# id of a base url in interning.URLS
+UrlId = int
+ParamCount = int
+
+# number of corpus nodes to dump in debug logs
+LIST_DUMP_SIZE = 10
+
+class CrossOverIndex:
+    """
+        Index of the corpus nodes used for picking cross-over partners.
+        For each parameter type the nodes are bucketed by their parameter count
+        and each bucket is further split by the base url of the node, so that
+        same-url candidates can be skipped without looking at them.
+
+        Inside a bucket, urls are visited in a round robin fashion and a node of
+        the chosen url is picked at random. Insertion, removal and selection are
+        O(1) apart from a bisect on the (small) sorted list of parameter counts.
+    """
+    def __init__(self):
+        self._buckets: Dict[HTTPMethod, Dict[ParamCount, Dict[UrlId, List[Node]]]] = {
+            HTTPMethod.GET: {},
+            HTTPMethod.POST: {}
+        }
+        # sorted list of the non-empty parameter counts per type
+        self._counts: Dict[HTTPMethod, List[ParamCount]] = {
+            HTTPMethod.GET: [],
+            HTTPMethod.POST: []
+        }
+        # position of each indexed node inside its bucket list per type.
+        # keyed by id() as distinct nodes may share the same hash
+        self._positions: Dict[int, Dict[HTTPMethod, Tuple[ParamCount, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, node: Node) -> bool:
+        return id(node) in self._positions
+
+    def add(self, node: Node) -> None:
+        if id(node) in self._positions:
+            return
+
+        positions = {}
+        for param_type in self._buckets:
+            count = len(node.params[param_type])
+            buckets = self._buckets[param_type]
+
+            if count not in buckets:
+                buckets[count] = {}
+                insort(self._counts[param_type], count)
+
+            nodes = buckets[count].setdefault(node.url_id, [])
+            nodes.append(node)
+            positions[param_type] = (count, len(nodes) - 1)
+
+        self._positions[id(node)] = positions
+
+    def remove(self, node: Node) -> None:
+        positions = self._positions.pop(id(node), None)
+        if positions is None:
+            return
+
+        for param_type, (count, pos) in positions.items():
+            bucket = self._buckets[param_type][count]
+            nodes = bucket[node.url_id]
+
+            # swap with the last element to remove in O(1)
+            last = nodes.pop()
+            if last is not node:
+                nodes[pos] = last
+                self._positions[id(last)][param_type] = (count, pos)
+
+            if not nodes:
+                del bucket[node.url_id]
+
+            if not bucket:
+                del self._buckets[param_type][count]
+                counts = self._counts[param_type]
+                del counts[bisect_left(counts, count)]
+
+    def select(self, start_node: Node, cross_type: HTTPMethod) -> Optional[Node]:
+        """
+            Pick a cross-over partner for start_node that has a different url
+            and at least half of its cross_type parameters. Returns None if
+            no such node exists.
+        """
+        counts = self._counts[cross_type]
+        threshold = ceil(len(start_node.params[cross_type]) / 2)
+
+        first = bisect_left(counts, threshold)
+        eligible = len(counts) - first
+        if eligible == 0:
+            return None
+
+        offset = random.randrange(eligible)
+        for i in range(eligible):
+            count = counts[first + (offset + i) % eligible]
+            bucket = self._buckets[cross_type][count]
+
+            for url_id in bucket:
+                if url_id == start_node.url_id:
+                    continue
+
+                nodes = bucket[url_id]
+                # move url to the end for round robin selection
+                del bucket[url_id]
+                bucket[url_id] = nodes
+
+                return random.choice(nodes)
+
+        return None
+
 class NodeIterator:
     """
         Constructs a heap tree of nodes plus a bunch of other data structures
@@ -28,8 +144,12 @@ class NodeIterator:
     """
     def __init__(self):
         self.node_list: List[Node] = []
+        self._cross_index = CrossOverIndex()
         self._total_cfg_xor: Dict[Label, List[Optional[Node]]] = {}
         self._total_cfg_single: Dict[Label, List[Optional[Node]]] = {}
+        # for dense edge maps, the buckets of each label that
+        # have a node in self._total_cfg_xor as bits
+        self._seen_xor: Optional[array] = env.instrument_args.new_bitmap()
 
     @property
     def total_cover_score(self):
@@ -42,6 +162,40 @@ class NodeIterator:
 
         return 100*len(total_cfg) / total_count
 
+    def has_new_coverage(self, node_cfg: CFGTuple) -> bool:
+        """
+            Check, without modifying the global map, whether
+            the CFGs of a node contain a label-bucket we have not seen before
+        """
+        seen = self._seen_xor
+        if seen is not None:
+            try:
+                for label, bucket in node_cfg.xor_cfg.items():
+                    if not seen[label] >> bucket & 1:
+                        return True
+            except IndexError:
+                raise FuzzerException(f"Edge label {label} is outside the map size of instr.meta")
+
+            return False
+
+        if env.instrument_args.policy == Policy.NODE:
+            local_cfg, total_cfg = node_cfg.single_cfg, self._total_cfg_single
+        else:
+            local_cfg, total_cfg = node_cfg.xor_cfg, self._total_cfg_xor
+
+        for label, bucket in local_cfg.items():
+            nodes = total_cfg.get(label)
+            if nodes is None or nodes[bucket] is None:
+                return True
+
+        if env.instrument_args.policy in (Policy.NODE_EDGE, Policy.PATH):
+            # single labels are only counted for the coverage score
+            for label in node_cfg.single_cfg:
+                if label not in self._total_cfg_single:
+                    return True
+
+        return False
+
     def _remove_nodes(self, tobe_removed: Set[Node]):
         logger = get_logger(__name__)
 
@@ -53,7 +207,17 @@ class NodeIterator:
         # making self._node_list a set reduces its length (why !?)
         prev_len = len(self.node_list)
 
-        self.node_list = list(set(self.node_list) - tobe_removed)
+        node_list = list(set(self.node_list) - tobe_removed)
+
+        # the set difference compares by hash, so besides tobe_removed it
+        # also drops all but one of the nodes sharing a hash. Whatever it
+        # dropped must leave the cross-over index too
+        kept = { id(node) for node in node_list }
+        for node in self.node_list:
+            if id(node) not in kept:
+                self._cross_index.remove(node)
+
+        self.node_list = node_list
 
         logger.info("New node replaced %d/%d nodes", \
                     prev_len - len(self.node_list), len(tobe_removed))
@@ -85,17 +249,26 @@ class NodeIterator:
 
         if env.instrument_args.policy == Policy.NODE:
             total_cfg = self._total_cfg_single
+            seen = None
         else:
             total_cfg = self._total_cfg_xor
+            seen = self._seen_xor
 
         tobe_removed = set()
+        new_buckets = 0
         for label, bucket in local_cfg.items():
 
             if label not in total_cfg:
+                if seen is not None and not 0 <= label < len(seen):
+                    raise FuzzerException(f"Edge label {label} is outside the map size of instr.meta")
+
                 nodes: List[Optional[Node]] = [None,None,None,None,None,None,None,None,None]
                 nodes[bucket] = new_node
                 total_cfg[label] = nodes
                 new_node.ref_count += 1
+                new_buckets += 1
+                if seen is not None:
+                    seen[label] = 1 << bucket
                 continue
 
             existing_node = total_cfg[label][bucket]
@@ -103,6 +276,9 @@ class NodeIterator:
             if existing_node is None:
                 total_cfg[label][bucket] = new_node
                 new_node.ref_count += 1
+                new_buckets += 1
+                if seen is not None:
+                    seen[label] |= 1 << bucket
 
             elif new_node.is_lighter_than(existing_node):
                 existing_node.ref_count -= 1
@@ -112,6 +288,7 @@ class NodeIterator:
                 new_node.ref_count += 1
                 total_cfg[label][bucket] = new_node
 
+        new_node.new_buckets = new_buckets
         self._remove_nodes(tobe_removed)
 
     """
@@ -127,7 +304,7 @@ class NodeIterator:
     def add(self, new_node: Node, node_cfg: CFGTuple):
         logger = get_logger(__name__)
 
-        if env.instrument_args.policy == Policy.NODE_EDGE:
+        if env.instrument_args.policy in (Policy.NODE_EDGE, Policy.PATH):
             for label in node_cfg.single_cfg.keys():
                 self._total_cfg_single[label] = []
         
@@ -142,11 +319,74 @@ class NodeIterator:
         else:
             # add the node to the heaptree
             heapq.heappush(self.node_list, new_node)
+            self._cross_index.add(new_node)
 
             logger.info("New list length: %d", len(self.node_list))
-            logger.debug("List dump %s", self.node_list)
+            if logger.isEnabledFor(logging.DEBUG):
+                # dumping the whole corpus on every add is quadratic
+                logger.debug("List head %s", Node.nodes_to_json(self.node_list[:LIST_DUMP_SIZE]))
             return True
 
+    def cross_over_partner(self, start_node: Node, cross_type: HTTPMethod) -> Optional[Node]:
+        """
+            Select a node from the corpus to cross over the cross_type
+            parameters of start_node with. Falls back to the most favourable
+            node if there is no suitable partner with a different url.
+        """
+        if len(self.node_list) == 0:
+            return None
+
+        partner = self._cross_index.select(start_node, cross_type)
+
+        return partner if partner is not None else self.node_list[0]
+
+    def dump_state(self, node_id: Callable[[Node], int]) -> Dict[str, Any]:
+        """
+            The corpus and the global CFG maps, with nodes replaced by their id
+        """
+        def dump_cfg(total_cfg: Dict[Label, List[Optional[Node]]]) -> Dict[Label, Tuple[int, ...]]:
+            return { label: tuple(node_id(node) if node else 0 for node in nodes)
+                        for (label, nodes) in total_cfg.items() }
+
+        return {
+            "heap": [(node_id(node), node.picked_score) for node in self.node_list],
+            "cfg_xor": dump_cfg(self._total_cfg_xor),
+            "cfg_single": dump_cfg(self._total_cfg_single)
+        }
+
+    def load_state(self, state: Dict[str, Any], nodes: Dict[int, Node]) -> None:
+        def load_cfg(cfg: Dict[Label, Tuple[int, ...]]) -> Dict[Label, List[Optional[Node]]]:
+            total_cfg: Dict[Label, List[Optional[Node]]] = {}
+
+            for (label, ids) in cfg.items():
+                total_cfg[label] = [nodes[i] if i else None for i in ids]
+
+                for node in total_cfg[label]:
+                    if node:
+                        node.ref_count += 1
+
+            return total_cfg
+
+        self.node_list = []
+        self._cross_index = CrossOverIndex()
+
+        for (i, picked_score) in state["heap"]:
+            node = nodes[i]
+            node.picked_score = picked_score
+            node.ref_count = 0
+            self.node_list.append(node)
+            self._cross_index.add(node)
+
+        heapq.heapify(self.node_list)
+
+        self._total_cfg_xor = load_cfg(state["cfg_xor"])
+        self._total_cfg_single = load_cfg(state["cfg_single"])
+
+        self._seen_xor = env.instrument_args.new_bitmap()
+        if self._seen_xor is not None:
+            for (label, nodes) in self._total_cfg_xor.items():
+                self._seen_xor[label] = sum(1 << bucket for (bucket, node) in enumerate(nodes) if node)
+
     def __iter__(self):
         return self
 
@@ -163,7 +403,7 @@ class NodeIterator:
         logger = get_logger(__name__)
 
         if len(self.node_list) == 0:
-            logger.error("No more links to follow found.")
+            logger.info("No more links to follow found.")
             raise StopIteration
         
         node = heapq.heappop(self.node_list)
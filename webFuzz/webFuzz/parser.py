@@ -1,10 +1,45 @@
 from urllib.parse import urlparse, urlunparse
 from bs4          import BeautifulSoup
-from typing       import Set, List, Dict
+from functools    import lru_cache
+from typing       import Set, List, Dict, Optional, Tuple
 
 from .misc        import get_logger, query_to_dict
 from .types       import HTTPMethod, UrlType
 from .node        import Node
+from .interning   import URLS
+
+# number of (page, link) resolutions to keep, see resolve_link()
+RESOLVE_CACHE_SIZE = 65536
+
+# (id of the base url, query parameters) of a link. The parameters
+# are None when the link points to the page itself, with its query
+ResolvedLink = Tuple[int, Optional[Tuple[Tuple[str, Tuple[str, ...]], ...]]]
+
+@lru_cache(maxsize=RESOLVE_CACHE_SIZE)
+def resolve_link(page_url_id: int, link: str) -> Optional[ResolvedLink]:
+    """
+        Resolve a link found in a page, given the id of the page's base url.
+        The same links appear in every page of a site (menus, footers...)
+        so the resolutions are cached per page base url.
+
+        :return: the split link, or None if it points to another domain
+    """
+    page_url = URLS.parsed(page_url_id)
+    url_obj = urlparse(link)
+
+    if not Parser.is_same_domain(url_obj, page_url):
+        return None
+
+    same_query = not url_obj.netloc and not url_obj.path and not url_obj.query
+
+    url_obj = Parser.normalise_url(page_url, url_obj)
+    url_id = URLS.id(urlunparse(url_obj._replace(query='')))
+
+    if same_query:
+        return (url_id, None)
+
+    query = query_to_dict(url_obj.query)
+    return (url_id, tuple((name, tuple(values)) for (name, values) in query.items()))
 
 
 class Parser:
@@ -15,6 +50,25 @@ class Parser:
 
         return a_links | form_links
 
+    @staticmethod
+    def resolve(called_node: Node, link: str) -> Optional[Tuple[int, Dict[str, List[str]]]]:
+        """
+            Resolve a link found in the response of called_node
+
+            :return: the id of the base url of the link and its query
+                     parameters, or None if it points to another domain
+        """
+        resolved = resolve_link(called_node.url_id, link)
+        if resolved is None:
+            return None
+
+        (url_id, query) = resolved
+        if query is None:
+            return (url_id, query_to_dict(called_node.url_object.query))
+
+        # a fresh copy, as nodes own their parameters
+        return (url_id, { name: list(values) for (name, values) in query })
+
     @staticmethod
     def parse_anchors(html: BeautifulSoup, called_node: Node) -> Set[Node]:
         """
@@ -28,15 +82,15 @@ class Parser:
         for anchor in html.findAll('a'):  # Search for all anchor elements.
             logger.debug("==> link parsing: %s", anchor)
 
-            url_obj = urlparse(anchor.get('href') or "")
-
-            if not Parser.is_same_domain(url_obj, called_node.url_object):
+            resolved = Parser.resolve(called_node, anchor.get('href') or "")
+            if resolved is None:
                 continue
 
-            url_obj = Parser.normalise_url(called_node.url_object, url_obj)
+            (url_id, get_params) = resolved
 
-            links.add(Node(url=url_obj,
-                           method=HTTPMethod.GET))
+            links.add(Node(url=url_id,
+                           method=HTTPMethod.GET,
+                           params={HTTPMethod.GET: get_params}))
 
         logger.debug("==> got new links: %s", links)
         return links
@@ -54,17 +108,11 @@ class Parser:
         for form in html.findAll('form'):
             logger.debug("==> Form parsing: %s", form)
 
-            url_obj = urlparse(form.get('action') or "")
-
-            if not Parser.is_same_domain(url_obj, called_node.url_object):
+            resolved = Parser.resolve(called_node, form.get('action') or "")
+            if resolved is None:
                 continue
 
-            url_obj = Parser.normalise_url(called_node.url_object, url_obj)
-
-            get_params = query_to_dict(url_obj.query)
-
-            # Convert the url object back to string but without the query.
-            url: str = urlunparse(url_obj._replace(query=''))
+            (url_id, get_params) = resolved
 
             # Extract post/get parameters from select, input, or textarea html elements
             selects: Dict[str, List[str]]   = Parser.parse_input_like(form.findAll('select'))
@@ -85,7 +133,7 @@ class Parser:
             logger.debug("==> Form get: %s", get_params)
             logger.debug("==> Form body: %s", body_params)
 
-            links.add(Node(url=url,
+            links.add(Node(url=url_id,
                            method=method,
                            params={HTTPMethod.GET: get_params, HTTPMethod.POST: body_params}))
 
@@ -0,0 +1,52 @@
+"""
+    Reduction of the feedback of the path instrument policy to labels.
+
+    The application reports the ordered list of the basic blocks a request
+    went through, as (index, "uid-level") pairs. Keeping whole paths would
+    make every extra loop iteration a new path, so, like the edges of the
+    edge policy, the trace is cut into overlapping n-grams of consecutive
+    blocks. Each n-gram is hashed and folded into a table of map_size slots.
+    The hash of a tuple of ints does not depend on PYTHONHASHSEED, so a path
+    gets the same slot in every run (of the same python version).
+
+    The slots take the place of the edge labels: their hit counts are
+    bucketed and the corpus keeps a node for each slot-bucket not seen before,
+    so memory is bounded by map_size however many distinct paths there are.
+
+    An n-gram is made of the (uid, level) pairs of its blocks, the level being
+    the nesting depth of the block. The trace is hashed as it is read through
+    a window of the last n blocks, and is cut after max_len blocks, so the
+    cost of a request is bounded whatever its loops do.
+"""
+from collections    import Counter, deque
+from itertools      import islice
+from typing         import Dict, Iterable, Optional, Tuple
+
+from .types         import Label
+
+def path_counts(trace: Iterable[Tuple[Label, str]],
+                ngram: int,
+                map_size: int,
+                max_len: Optional[int] = None) -> Tuple[Dict[Label, int], Dict[Label, int]]:
+    """
+        :param trace: the (index, "uid-level") pairs of the feedback, in order
+        :param ngram: number of consecutive blocks hashed together
+        :param map_size: number of slots of the table
+        :param max_len: number of blocks of the trace to look at (all if None)
+        :return: the hit count of each slot and of each block
+    """
+    paths: Counter = Counter()
+    blocks: Counter = Counter()
+
+    # the first blocks of the trace form shorter n-grams
+    window = deque([(0, 0)] * ngram, maxlen=ngram)
+
+    for (_, value) in islice(trace, max_len):
+        (uid, _, level) = value.partition('-')
+        block = (int(uid), int(level or 0))
+
+        window.append(block)
+        paths[hash(tuple(window)) % map_size] += 1
+        blocks[block[0]] += 1
+
+    return (paths, blocks)
@@ -0,0 +1,337 @@
+"""
+    The Pipeline drives the fuzzing loop as three decoupled stages:
+
+        scheduler --(request queue)--> I/O workers --(feedback queue)--> feedback stage
+
+    The scheduler selects and mutates the next requests, the I/O workers send them
+    and read the responses and the feedback stage parses the responses and merges
+    their coverage. The bounded queues between the stages provide back-pressure,
+    so the network stays busy while the CPU bound stages catch up.
+
+    The feedback stage is a single task. Worker.process_response is synchronous
+    and updates the shared corpus and crawler, so more tasks on the same event
+    loop would not process responses in parallel.
+"""
+import asyncio
+import random
+
+from aiohttp        import ClientError
+from itertools      import repeat
+from typing         import List, Tuple, Iterator, Any, Optional
+
+from .environment   import env
+from .node          import Node
+from .types         import get_logger, ExitCode, Statistics
+from .misc          import iter_join
+from .mutator       import Mutator
+from .node_iterator import NodeIterator
+from .crawler       import Crawler
+from .parser        import Parser
+from .detector      import Detector
+from .worker        import Worker
+from .concurrency   import ConcurrencyController
+from .target_pool   import TargetPool
+from .session       import SessionManager
+from .event_log     import EventLog
+from .replay        import Recorder
+from .metrics       import Metrics
+from .profiler      import StageProfiler
+from .feedback_reader import FeedbackReader
+
+# every how many requests to check if
+# we are logged in
+LOGGED_IN_CHECK_INTERVAL = 50
+
+class Pipeline:
+    def __init__(self,
+                 targets: TargetPool,
+                 crawler: Crawler,
+                 mutator: Mutator,
+                 parser: Parser,
+                 detector: Detector,
+                 iterator: NodeIterator,
+                 session_node: Node,
+                 statistics: Statistics,
+                 io_workers: int,
+                 queue_size: int = 0,
+                 controller: Optional[ConcurrencyController] = None,
+                 session_manager: Optional[SessionManager] = None,
+                 event_log: Optional[EventLog] = None,
+                 recorder: Optional[Recorder] = None,
+                 metrics: Optional[Metrics] = None,
+                 profiler: Optional[StageProfiler] = None,
+                 feedback_reader: Optional[FeedbackReader] = None):
+
+        self._targets = targets
+        self._crawler = crawler
+        self._mutator = mutator
+        self._parser = parser
+        self._detector = detector
+        self._node_iterator = iterator
+        self._session_node = session_node
+        self._stats = statistics
+
+        self.io_workers = io_workers
+        self._controller = controller
+        self._session_manager = session_manager
+        self._event_log = event_log
+        self._recorder = recorder
+        self._metrics = metrics or Metrics()
+        self._profiler = profiler or StageProfiler()
+        self._feedback_reader = feedback_reader or FeedbackReader()
+
+        queue_size = queue_size or 2 * io_workers
+        self._request_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._feedback_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        if env.args.catch_phrase:
+            self._periodic: Iterator = repeat(session_node)
+        else:
+            # create an empty iterator
+            self._periodic = repeat(None, 0)
+
+        # requests that have been scheduled but whose
+        # feedback has not been processed yet
+        self._in_flight = 0
+        self._progress = asyncio.Event()
+        self._exit_code = ExitCode.NONE
+
+        # cleared while logging back in, pauses the I/O workers
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+
+        self._metrics.request_queue_depth.set_function(lambda: self.request_queue_depth)
+        self._metrics.feedback_queue_depth.set_function(lambda: self.feedback_queue_depth)
+        self._metrics.in_flight.set_function(lambda: self.in_flight)
+
+    @property
+    def request_queue_depth(self) -> int:
+        return self._request_queue.qsize()
+
+    @property
+    def feedback_queue_depth(self) -> int:
+        return self._feedback_queue.qsize()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def should_stop(self) -> bool:
+        return self._exit_code != ExitCode.NONE or \
+               env.shutdown_signal != ExitCode.NONE
+
+    def _request_done(self) -> None:
+        self._in_flight -= 1
+        self._progress.set()
+
+    def _request_sources(self) -> Iterator[Tuple[Any, Node]]:
+        return iter_join(primary=self._crawler,
+                         secondary=self._node_iterator,
+                         periodic=self._periodic,
+                         interval=LOGGED_IN_CHECK_INTERVAL)
+
+    async def scheduler(self) -> ExitCode:
+        """
+            Producer stage. Picks unvisited nodes from the crawler, or
+            mutates favourable nodes from the corpus, and queues them
+            for the I/O workers.
+        """
+        logger = get_logger(__name__)
+
+        sources = self._request_sources()
+
+        profiler = self._profiler
+
+        while not self.should_stop:
+            try:
+                start = profiler.now()
+                (src, new_request) = next(sources)
+                profiler.record("select", start)
+            except StopIteration:
+                if self._in_flight == 0:
+                    logger.error("Aborting due to lack of fuzz targets")
+                    return ExitCode.EMPTY_QUEUE
+
+                # responses still in flight may bring new links
+                # or corpus nodes, so wait for them
+                self._progress.clear()
+                await self._progress.wait()
+
+                sources = self._request_sources()
+                continue
+
+            if src == self._crawler:
+                logger.info("Chosen an unvisited node")
+
+            elif src == self._node_iterator:
+                # this request isn't new i.e. it came from NodeIterator
+                # thus needs to be mutated first
+                start = profiler.now()
+                new_request = self._mutator.mutate(new_request,
+                                                   self._node_iterator)
+                profiler.record("mutate", start)
+                logger.info("Chosen a mutated node")
+
+            self._in_flight += 1
+            await self._request_queue.put((src, new_request))
+
+        return self._exit_code if self._exit_code != ExitCode.NONE \
+                               else env.shutdown_signal
+
+    async def io_worker(self, worker: Worker) -> None:
+        """
+            I/O stage. Sends the queued requests and hands
+            the responses to the feedback stage.
+        """
+        logger = get_logger(__name__, worker.id)
+        logger.info("Worker reporting Active")
+
+        while True:
+            await self._resumed.wait()
+
+            (src, request) = await self._request_queue.get()
+            queued = False
+            try:
+                # a slot is only held while a request is in flight,
+                # not while waiting for one
+                if self._controller:
+                    await self._controller.acquire()
+
+                try:
+                    queued = await self._send(worker, src, request)
+                except Exception as e:
+                    # a bug (e.g. in the session manager or the event log)
+                    # must not take the worker down with it
+                    logger.error("Dropping request %s: %s", request, e, exc_info=True)
+                finally:
+                    if self._controller:
+                        await self._controller.release()
+            finally:
+                if not queued:
+                    # the feedback stage will not hear of this request
+                    self._request_done()
+
+                self._request_queue.task_done()
+
+    async def _send(self, worker: Worker, src: Iterator, request: Node) -> bool:
+        """
+            :return: True if the response was handed to the feedback stage
+        """
+        logger = get_logger(__name__, worker.id)
+
+        failed = False
+        try:
+            start = self._profiler.now()
+            response = await worker.fetch(request)
+            self._profiler.record("fetch", start)
+            failed = response.status >= 500
+        except Exception as e:
+            if env.args.http_error_at_info:
+                logger.info(e, exc_info=False)
+            else:
+                logger.warning(e, exc_info=False)
+
+            response = None
+            failed = isinstance(e, (asyncio.TimeoutError, ClientError))
+
+            if failed:
+                self._metrics.request_errors.inc()
+
+        if self._controller:
+            self._controller.record(request.exec_time, failed)
+
+        if src == self._periodic:
+            if response is None or not worker.is_logged_in(response):
+                await self._relogin()
+
+            # session checks are not fuzz targets
+            response = None
+
+        elif response is None and self._event_log:
+            self._event_log.record(request)
+
+        if response is None:
+            return False
+
+        await self._feedback_queue.put((worker, response))
+        return True
+
+    async def _relogin(self) -> None:
+        """
+            Pause the I/O workers while the session manager logs back in.
+            If there is no session manager, or it fails, stop the pipeline
+            so that the fuzzer can log in through the browser.
+        """
+        if not self._resumed.is_set():
+            # another worker is already logging in
+            await self._resumed.wait()
+            return
+
+        self._resumed.clear()
+        try:
+            if not self._session_manager or \
+               not await self._session_manager.relogin():
+                self._exit_code = ExitCode.LOGGED_OUT
+        finally:
+            self._resumed.set()
+
+    async def feedback_stage(self) -> None:
+        """
+            Feedback stage. Parses the responses and merges their coverage
+            in the corpus and their links in the crawler.
+        """
+        logger = get_logger(__name__)
+
+        while True:
+            (worker, response) = await self._feedback_queue.get()
+
+            try:
+                worker.process_response(response)
+            except Exception as e:
+                logger.warning(e, exc_info=True)
+            finally:
+                if self._event_log:
+                    self._event_log.record(response.request, response.status)
+
+                if self._recorder:
+                    self._recorder.record(response)
+
+                self._request_done()
+                self._feedback_queue.task_done()
+
+            # let the other stages run between CPU bound iterations
+            await asyncio.sleep(0)
+
+    async def run(self) -> ExitCode:
+        logger = get_logger(__name__)
+        logger.info("Spawning %d I/O workers", self.io_workers)
+
+        stages: List[asyncio.Task] = []
+
+        for _ in range(self.io_workers):
+            worker_id = str(random.randrange(10000, 1000000))
+            worker = Worker(worker_id,
+                            self._targets,
+                            self._crawler,
+                            self._parser,
+                            self._detector,
+                            self._node_iterator,
+                            self._stats,
+                            self._metrics,
+                            self._profiler,
+                            self._feedback_reader)
+
+            stages.append(asyncio.create_task(self.io_worker(worker)))
+
+        stages.append(asyncio.create_task(self.feedback_stage()))
+
+        try:
+            exit_code = await self.scheduler()
+        finally:
+            for stage in stages:
+                stage.cancel()
+
+            await asyncio.gather(*stages, return_exceptions=True)
+
+        return exit_code
@@ -0,0 +1,182 @@
+"""
+    Opt-in profiling of the fuzzing loop (--profile_stages).
+
+    StageProfiler collects the duration of each stage of a request cycle
+    (fetching, instrumentation parsing, HTML parsing, XSS detection, corpus
+    merging, mutation...) from perf_counter_ns spans. Each stage keeps a
+    fixed size reservoir sample of its durations, so percentiles stay cheap
+    to compute no matter how long the fuzzer runs.
+
+    SnapshotProfiler periodically dumps cProfile (or yappi) statistics of the
+    event loop thread, each covering the time since the previous snapshot.
+"""
+import asyncio
+import cProfile
+import random
+
+from array       import array
+from datetime    import datetime
+from os          import mkdir
+from os.path     import isdir
+from time        import perf_counter_ns
+from typing      import Dict, List, Optional
+
+from .environment import env
+from .types       import ExitCode, FuzzerException, SnapshotProfiler as SnapshotProfilerType, get_logger
+
+try:
+    import yappi
+except ImportError:
+    yappi = None
+
+# durations kept per stage for the percentiles
+RESERVOIR_SIZE = 8192
+
+PERCENTILES = (50, 90, 99)
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.samples = array('q')
+        # not the global generator, so that profiling does
+        # not change the random choices of a --seed run
+        self._random = random.Random()
+
+    def add(self, elapsed_ns: int) -> None:
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(elapsed_ns)
+        else:
+            # reservoir sampling: every duration is kept with equal probability
+            slot = self._random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = elapsed_ns
+
+    @staticmethod
+    def percentile(sorted_samples: List[int], p: int) -> int:
+        if not sorted_samples:
+            return 0
+
+        return sorted_samples[min(len(sorted_samples) - 1, len(sorted_samples) * p // 100)]
+
+class StageProfiler:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, StageStats] = {}
+
+    @staticmethod
+    def now() -> int:
+        return perf_counter_ns()
+
+    def record(self, stage: str, start_ns: int) -> int:
+        """
+            Record a span of stage that started at start_ns (a StageProfiler.now() value)
+
+            :return: the duration of the span in ns
+        """
+        elapsed_ns = perf_counter_ns() - start_ns
+
+        if self.enabled:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+
+            stats.add(elapsed_ns)
+
+        return elapsed_ns
+
+    def report(self) -> List[str]:
+        """
+            A table with the count, mean, percentiles and max duration (in ms)
+            of each stage, and its share of the total time of all stages
+        """
+        total_ns = sum(stats.total_ns for stats in self.stages.values()) or 1
+
+        header = "{:<16s} {:>9s} {:>9s} ".format("Stage", "Count", "Mean") + \
+                 " ".join("{:>9s}".format(f"p{p}") for p in PERCENTILES) + \
+                 " {:>9s} {:>6s}".format("Max", "Share")
+        lines = [header]
+
+        for (stage, stats) in sorted(self.stages.items(), key=lambda item: -item[1].total_ns):
+            samples = sorted(stats.samples)
+
+            lines.append("{:<16s} {:>9d} {:>9.3f} ".format(stage, stats.count, stats.total_ns / stats.count / 1e6) + \
+                         " ".join("{:>9.3f}".format(stats.percentile(samples, p) / 1e6) for p in PERCENTILES) + \
+                         " {:>9.3f} {:>5.1f}%".format(stats.max_ns / 1e6, 100 * stats.total_ns / total_ns))
+
+        return lines
+
+class SnapshotProfiler:
+    def __init__(self, type_: SnapshotProfilerType, interval: int):
+        if type_ == SnapshotProfilerType.YAPPI and yappi is None:
+            raise FuzzerException("yappi is not installed, use --profile_snapshot cprofile")
+
+        self.type = type_
+        self.interval = interval
+        self.count = 0
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if self.type == SnapshotProfilerType.YAPPI:
+            yappi.set_clock_type("cpu")
+            yappi.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def snapshot(self) -> str:
+        """
+            Dump the statistics collected since the previous
+            snapshot in pstats format and start over
+
+            :return: the filename of the dump
+        """
+        logger = get_logger(__name__)
+
+        if not isdir("./log"):
+            mkdir("./log")
+
+        dt = datetime.now()
+        self.count += 1
+        filename = f"./log/webFuzz_profile_{dt.day}-{dt.month}_{dt.hour}:{dt.minute}_{self.count}.prof"
+
+        if self.type == SnapshotProfilerType.YAPPI:
+            yappi.get_func_stats().save(filename, type="pstat")
+            yappi.clear_stats()
+        else:
+            self._profile.disable()
+            self._profile.dump_stats(filename)
+            self.start()
+
+        logger.info("Profile snapshot written to %s", filename)
+        return filename
+
+    def stop(self) -> None:
+        if self.type == SnapshotProfilerType.YAPPI:
+            yappi.stop()
+        elif self._profile:
+            self._profile.disable()
+
+    async def run(self) -> None:
+        """
+            Dump a snapshot every interval seconds until shutdown, plus once at the end
+        """
+        self.start()
+
+        elapsed = 0.0
+        while env.shutdown_signal == ExitCode.NONE:
+            await asyncio.sleep(0.5)
+            elapsed += 0.5
+
+            if elapsed >= self.interval:
+                elapsed = 0
+                self.snapshot()
+
+        self.snapshot()
+        self.stop()
@@ -0,0 +1,247 @@
+"""
+    A recording HTTP proxy that runs on the fuzzer's event loop.
+
+    The browser (see browser.py) is pointed to it. Every request that passes
+    through it is forwarded to the target and, if it belongs to the domain
+    being fuzzed, it is turned into a Node. The cookies the browser sends and
+    receives are tracked as well, so that the fuzzer can reuse the session.
+
+    The requests that set new cookies (and the POST requests leading up to them)
+    are also kept in order as the login sequence, which session.SessionManager
+    can replay to log back in without a browser.
+
+    Only plain HTTP traffic is recorded. CONNECT tunnels (HTTPS) are refused,
+    so the browser should only be configured to proxy http urls.
+
+    Requests with a method the fuzzer cannot send (anything but GET and POST)
+    are forwarded but not recorded, neither as nodes nor as login steps.
+"""
+import aiohttp
+
+from aiohttp        import web
+from datetime       import datetime, timezone
+from email.utils    import parsedate_to_datetime
+from http.cookies   import SimpleCookie, CookieError, Morsel
+from typing         import Callable, Dict, List, Optional, Set
+from urllib.parse   import urlparse
+from yarl           import URL
+
+from .node          import Node
+from .types         import HTTPMethod, get_logger
+from .misc          import query_to_dict
+from .parser        import Parser
+
+# maximum number of requests kept in the login sequence
+MAX_LOGIN_SEQUENCE = 20
+
+# headers that apply to a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'proxy-connection',
+    'te',
+    'trailer',
+    'transfer-encoding',
+    'upgrade',
+    'content-length'
+}
+
+class CaptureProxy:
+    def __init__(self,
+                 start_node: Node,
+                 port: int = 8080,
+                 on_node: Optional[Callable[[Node], None]] = None):
+
+        self._start_node = start_node
+        self.port = port
+        self._on_node = on_node
+
+        self.nodes: Set[Node] = set()
+        self.cookies: Dict[str, str] = {}
+        self.login_sequence: List[Node] = []
+
+        # requests that may be part of the login sequence
+        self._login_candidates: List[Node] = []
+
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        logger = get_logger(__name__)
+
+        # forward the body exactly as received
+        self._session = aiohttp.ClientSession(auto_decompress=False,
+                                              cookie_jar=aiohttp.DummyCookieJar())
+
+        app = web.Application(client_max_size=0)
+        app.router.add_route('*', '/{path:.*}', self._handle)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, 'localhost', self.port).start()
+
+        logger.info("Capture proxy listening on port %d", self.port)
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        logger = get_logger(__name__)
+
+        # request.url is always absolute, only a proxy request has an
+        # absolute url in its request line. Forwarding a direct request
+        # would send it back to the proxy
+        if request.method == 'CONNECT' or not URL(request.raw_path).is_absolute():
+            return web.Response(status=501, text="Only http proxy requests are supported")
+
+        body = await request.read()
+        in_scope = self.in_scope(request)
+        node = self.record_request(request, body) if in_scope else None
+
+        headers = { k: v for (k, v) in request.headers.items()
+                        if k.lower() not in HOP_BY_HOP_HEADERS }
+
+        try:
+            async with self._session.request(request.method,
+                                             request.url,
+                                             headers=headers,
+                                             data=body,
+                                             allow_redirects=False) as upstream:
+
+                if in_scope:
+                    set_cookies = upstream.headers.getall('Set-Cookie', [])
+                    self.record_cookies(set_cookies)
+
+                    if node:
+                        self.record_login_step(node, set_cookies)
+
+                response = web.StreamResponse(status=upstream.status,
+                                              reason=upstream.reason)
+
+                for (k, v) in upstream.headers.items():
+                    if k.lower() not in HOP_BY_HOP_HEADERS:
+                        response.headers.add(k, v)
+
+                await response.prepare(request)
+
+                async for chunk in upstream.content.iter_any():
+                    await response.write(chunk)
+
+                await response.write_eof()
+                return response
+
+        except aiohttp.ClientError as e:
+            logger.warning("Proxy failed to forward %s: %s", request.url, e)
+            return web.Response(status=502, text=str(e))
+
+    def in_scope(self, request: web.Request) -> bool:
+        """
+            :return: whether the request belongs to the fuzzed domain
+        """
+        return Parser.is_same_domain(urlparse(str(request.url)), self._start_node.url_object)
+
+    def record_request(self, request: web.Request, body: bytes) -> Optional[Node]:
+        """
+            Turn a proxied request (of the fuzzed domain) into a Node.
+
+            :return: the Node, or None if the fuzzer cannot send the request
+        """
+        logger = get_logger(__name__)
+
+        self.record_cookies([], request.headers.get('Cookie', ''))
+
+        try:
+            method = HTTPMethod[request.method.upper()]
+        except KeyError:
+            # rewriting it to a GET would replay something else
+            logger.warning("Not recording %s %s, the method is not supported",
+                           request.method, request.url)
+            return None
+
+        post_params: Dict[str, List[str]] = {}
+
+        if method == HTTPMethod.POST and \
+           request.content_type == 'application/x-www-form-urlencoded':
+            post_params = query_to_dict(body.decode(request.charset or 'utf-8', errors='replace'))
+
+        node = Node(urlparse(str(request.url)), method, { HTTPMethod.GET: {}, HTTPMethod.POST: post_params })
+        self.nodes.add(node)
+
+        if self._on_node:
+            self._on_node(node)
+
+        return node
+
+    def record_login_step(self, node: Node, set_cookies: List[str]) -> None:
+        """
+            A POST request, or a request whose response sets cookies,
+            may be a step of the login. The login sequence ends with
+            the last request that received new cookies.
+        """
+        sets_cookies = any(not CaptureProxy.is_expired(morsel)
+                               for header in set_cookies
+                               for morsel in CaptureProxy.parse_cookies(header).values())
+
+        if node.method != HTTPMethod.POST and not sets_cookies:
+            return
+
+        self._login_candidates.append(node)
+        self._login_candidates = self._login_candidates[-MAX_LOGIN_SEQUENCE:]
+
+        if sets_cookies:
+            self.login_sequence = list(self._login_candidates)
+
+    def record_cookies(self, set_cookies: List[str], cookie_header: str = "") -> None:
+        """
+            Keep track of the cookies of the browser session, both from the
+            Cookie header the browser sends and the Set-Cookie headers it receives
+        """
+        cookie = CaptureProxy.parse_cookies(cookie_header)
+
+        for header in set_cookies:
+            cookie.update(CaptureProxy.parse_cookies(header))
+
+        for (name, morsel) in cookie.items():
+            if CaptureProxy.is_expired(morsel):
+                self.cookies.pop(name, None)
+            else:
+                self.cookies[name] = morsel.value
+
+    @staticmethod
+    def parse_cookies(header: str) -> SimpleCookie:
+        cookie: SimpleCookie = SimpleCookie()
+
+        try:
+            cookie.load(header)
+        except CookieError:
+            pass
+
+        return cookie
+
+    @staticmethod
+    def is_expired(morsel: Morsel) -> bool:
+        if morsel['max-age']:
+            return morsel['max-age'].lstrip('-').isdigit() and int(morsel['max-age']) <= 0
+
+        if morsel['expires']:
+            try:
+                return parsedate_to_datetime(morsel['expires']) <= datetime.now(timezone.utc)
+            except (TypeError, ValueError):
+                return False
+
+        return False
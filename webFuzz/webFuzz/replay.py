@@ -0,0 +1,172 @@
+"""
+    Record and replay of the traffic of a fuzzing run.
+
+    The Recorder writes every response that reaches the feedback stage, in the
+    order they are processed, as one json line of a gzip file:
+
+        { "id", "parent_id", "method", "url", "params", "exec_time",
+          "mutation_ops", "status", "body", "feedback" }
+
+    where feedback holds the raw (label, value) pairs of the instrumentation,
+    as sent in the I-<label> headers or written to the feedback file. The first
+    line is a header with the version and the instrumentation meta.
+
+    The Replayer feeds the recorded responses through Worker.process_response,
+    without a target, so that changes to the parser, the detector or the corpus
+    can be measured on identical traffic and at CPU speed.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import time
+
+from typing         import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from .environment   import env
+from .node          import Node
+from .types         import get_logger, ExitCode, HTTPMethod, FuzzerException, Label
+from .detector      import MarkerScanner
+from .worker        import Worker, Response
+from .event_log     import EventLog
+
+VERSION = 1
+
+# the records are large (they include the response body) and written
+# on the fuzzing loop, so favour speed over size
+COMPRESS_LEVEL = 1
+
+class Recorder:
+    def __init__(self, filename: str, meta: Dict[str, Any]):
+        self.filename = filename
+        self.count = 0
+
+        self._file: Optional[IO[str]] = gzip.open(filename, "wt",
+                                                  compresslevel=COMPRESS_LEVEL,
+                                                  encoding="utf-8")
+        self._file.write(json.dumps({ "version": VERSION, "meta": meta }) + "\n")
+
+    def record(self, response: Response) -> None:
+        if self._file is None:
+            return
+
+        request = response.request
+
+        self.count += 1
+        request.record_id = self.count
+
+        parent = request.parent_request
+
+        record = {
+            "id": self.count,
+            "parent_id": parent.record_id if parent else 0,
+            "method": request.method.name,
+            "url": request.url,
+            "params": { method.name: params for (method, params) in request.params.items() },
+            "exec_time": request.exec_time,
+            "mutation_ops": request.mutation_ops,
+            "status": response.status,
+            "body": response.raw_html,
+            "feedback": response.feedback
+        }
+
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_records(filename: str) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """
+        :return: the header of a recording and an iterator of its records
+    """
+    f = gzip.open(filename, "rt", encoding="utf-8")
+
+    header = json.loads(f.readline() or "{}")
+    if header.get("version") != VERSION:
+        f.close()
+        raise FuzzerException(f"Unsupported recording {filename}")
+
+    def records() -> Iterator[Dict[str, Any]]:
+        with f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # the last record of an interrupted run
+                    return
+                yield json.loads(line)
+
+    return (header, records())
+
+class Replayer:
+    def __init__(self, filename: str, worker: Worker, event_log: Optional[EventLog] = None):
+        logger = get_logger(__name__)
+
+        self.filename = filename
+        self.count = 0
+        self.elapsed = 0.0
+
+        self._worker = worker
+        self._event_log = event_log
+        (header, self._records) = read_records(filename)
+
+        if header["meta"]["instrument-policy"].upper().replace('-', '_') != env.instrument_args.policy.name:
+            raise FuzzerException("The recording was made with a different instrumentation policy")
+
+        logger.info("Replaying %s", filename)
+
+        # recorded requests by id, to link the mutated ones to their parents
+        self._nodes: Dict[int, Node] = {}
+
+    def to_response(self, record: Dict[str, Any]) -> Response:
+        params = { HTTPMethod[method]: p for (method, p) in record["params"].items() }
+
+        request = Node(record["url"],
+                       HTTPMethod[record["method"]],
+                       params,
+                       parent_request=self._nodes.get(record["parent_id"]),
+                       exec_time=record["exec_time"])
+        request.mutation_ops = record["mutation_ops"]
+        self._nodes[record["id"]] = request
+
+        feedback: List[Tuple[Label, str]] = [(label, value) for (label, value) in record["feedback"]]
+        cfg = request.parse_feedback(feedback)
+
+        scanner = MarkerScanner()
+        scanner.feed(record["body"])
+
+        return Response(request=request,
+                        status=record["status"],
+                        raw_html=record["body"],
+                        has_marker=scanner.found,
+                        cfg=cfg,
+                        feedback=feedback)
+
+    def __iter__(self) -> Iterator[Response]:
+        for record in self._records:
+            if env.shutdown_signal != ExitCode.NONE:
+                return
+            yield self.to_response(record)
+
+    def run(self) -> int:
+        """
+            Process all the recorded responses
+
+            :return: the number of responses replayed
+        """
+        logger = get_logger(__name__)
+
+        start = time.process_time()
+        for response in self:
+            try:
+                self._worker.process_response(response)
+            except Exception as e:
+                logger.warning(e, exc_info=True)
+
+            if self._event_log:
+                self._event_log.record(response.request, response.status)
+
+            self.count += 1
+
+        self.elapsed = time.process_time() - start
+        return self.count
@@ -0,0 +1,173 @@
+"""
+    Streaming reader of seed files.
+
+    Seed files can get very large (e.g. HAR exports of long browsing sessions),
+    so instead of loading them whole, entries are decoded one at a time from
+    a buffer that only holds the part of the file not consumed yet. Supported
+    formats are:
+
+        - a JSON array of entries (the format of Crawler.store_init_seed)
+        - JSON Lines, i.e. one entry per line
+        - a HAR file, whose log.entries array is streamed
+"""
+import json
+import re
+
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# the largest single value (e.g. an entry) that is buffered
+# before giving up on it, so that a malformed file is not
+# read whole into memory while looking for the end of a value
+MAX_VALUE_SIZE = 64 * 1024 * 1024
+
+WHITESPACE_RE = re.compile(r'\s*')
+HAR_ENTRIES_RE = re.compile(r'"entries"\s*:\s*\[')
+
+# how many characters at the start of the file
+# to look at when telling HAR and JSON Lines apart
+FORMAT_SNIFF_SIZE = 4096
+
+class SeedFormatError(Exception):
+    pass
+
+class _StreamBuffer:
+    def __init__(self, f: TextIO, chunk_size: int, max_value_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._max_value_size = max_value_size
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        # offset in the file of the start of buf
+        self.offset = 0
+
+    def fill(self, size: int = 0) -> bool:
+        """
+            Drop the consumed part of the buffer and read more
+
+            :return: False at the end of the file
+        """
+        data = self._f.read(max(size, self._chunk_size))
+        if not data:
+            return False
+
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def lookahead(self, size: int) -> str:
+        """
+            Up to size characters from the current position, without consuming them
+        """
+        while len(self.buf) - self.pos < size and self.fill():
+            pass
+
+        return self.buf[self.pos:self.pos + size]
+
+    def peek(self) -> Optional[str]:
+        """
+            Skip whitespace and return the next character (None at the end)
+        """
+        while True:
+            self.pos = WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+
+            if not self.fill():
+                return None
+
+    def decode(self) -> Any:
+        """
+            Decode the JSON value starting at the next non-whitespace character
+        """
+        self.peek()
+
+        while True:
+            try:
+                (value, end) = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # the value is (probably) incomplete, read as much again
+                # as what we have, so that large values are decoded in
+                # a logarithmic number of attempts
+                size = len(self.buf) - self.pos
+                if size >= self._max_value_size:
+                    raise SeedFormatError(f"Value at offset {self.offset + self.pos} is malformed "
+                                          f"or larger than {self._max_value_size} characters") from e
+
+                if not self.fill(min(size, self._max_value_size - size)):
+                    raise SeedFormatError(f"{e.msg} at offset {self.offset + e.pos}") from e
+                continue
+
+            self.pos = end
+            return value
+
+    def seek(self, pattern: re.Pattern) -> bool:
+        """
+            Move after the first match of pattern (which must be shorter than a chunk)
+        """
+        while True:
+            match = pattern.search(self.buf, self.pos)
+            if match:
+                self.pos = match.end()
+                return True
+
+            # keep a tail in case the match spans two chunks
+            self.pos = max(self.pos, len(self.buf) - self._chunk_size // 2)
+            if not self.fill():
+                return False
+
+    def array_items(self) -> Iterator[Any]:
+        """
+            Decode the items of an array whose opening bracket has been consumed
+        """
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield self.decode()
+
+            separator = self.peek()
+            self.pos += 1
+
+            if separator == ']':
+                return
+
+            if separator != ',':
+                raise SeedFormatError(f"Expected ',' or ']' but found {separator!r}")
+
+def read_seed_entries(filename: str,
+                      chunk_size: int = READ_CHUNK_SIZE,
+                      max_value_size: int = MAX_VALUE_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+        Lazily decode the entries of a seed file, see the module docstring for the formats
+    """
+    with open(filename, "r") as f:
+        stream = _StreamBuffer(f, chunk_size, max_value_size)
+
+        first = stream.peek()
+        if first is None:
+            return
+
+        if first == '[':
+            stream.pos += 1
+            yield from stream.array_items()
+            return
+
+        if first != '{':
+            raise SeedFormatError(f"{filename} is not a JSON seed file")
+
+        head = stream.lookahead(FORMAT_SNIFF_SIZE)
+        if filename.endswith(".har") or re.match(r'\{\s*"log"\s*:', head):
+            if not stream.seek(HAR_ENTRIES_RE):
+                raise SeedFormatError(f"{filename} has no HAR entries")
+
+            yield from stream.array_items()
+            return
+
+        # JSON Lines
+        while stream.peek() is not None:
+            yield stream.decode()
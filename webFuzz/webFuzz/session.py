@@ -0,0 +1,112 @@
+"""
+    The SessionManager logs the fuzzer back in when the session check fails,
+    without having to open a browser again.
+
+    It replays the login sequence recorded by the capture proxy (see proxy.py)
+    over the sessions of the TargetPool. The replay will not succeed if the
+    login form carries single use tokens (e.g. CSRF tokens) as their recorded
+    values will be stale. In that case the fuzzer falls back to the browser.
+"""
+import asyncio
+import json
+
+from aiohttp        import ClientError
+from datetime       import datetime
+from typing         import List
+
+from .environment   import env
+from .node          import Node
+from .types         import HTTPMethod, get_logger
+from .crawler       import Crawler
+from .worker        import Worker
+from .target_pool   import TargetPool
+
+class SessionManager:
+    def __init__(self,
+                 targets: TargetPool,
+                 login_sequence: List[Node],
+                 session_node: Node):
+
+        self._targets = targets
+        self.login_sequence = login_sequence
+        self._session_node = session_node
+        self.relogins = 0
+
+    async def relogin(self) -> bool:
+        """
+            Replay the login sequence and check that the session is valid again
+
+            :return: True if we are logged in
+        """
+        logger = get_logger(__name__)
+
+        if not self.login_sequence:
+            return False
+
+        logger.warning("Replaying login sequence of %d requests", len(self.login_sequence))
+
+        primary = self._targets.primary.session
+        # the replicas share this jar (see TargetPool.sessions)
+        jar = primary.cookie_jar
+
+        # start from a clean state, the stale session
+        # cookies may make the login page redirect us away
+        kept = [(cookie.key, cookie) for cookie in jar]
+        jar.clear()
+
+        try:
+            try:
+                for node in self.login_sequence:
+                    async with primary.request(node.method.name,
+                                               node.url,
+                                               params=node.params[HTTPMethod.GET],
+                                               data=node.params[HTTPMethod.POST],
+                                               trace_request_ctx=node) as r:
+                        await r.read()
+                        logger.debug("Login step %s returned %d", node.url, r.status)
+            finally:
+                # put back the cookies the login did not set (consent, CSRF...)
+                fresh = { cookie.key for cookie in jar }
+                jar.update_cookies([(k, c) for (k, c) in kept if k not in fresh])
+
+            async with primary.get(self._session_node.url,
+                                   trace_request_ctx=self._session_node) as r:
+                raw_html = await r.text(errors='replace')
+
+        except (ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Login replay failed: %s", e)
+            return False
+
+        if not Worker.has_catchphrase(raw_html, env.args.catch_phrase):
+            logger.warning("Login replay did not restore the session")
+            return False
+
+        self.relogins += 1
+        logger.warning("Logged back in by replaying the login sequence")
+        return True
+
+    @staticmethod
+    def parse_login_file(filename: str) -> List[Node]:
+        logger = get_logger(__name__)
+
+        with open(filename, "r") as f:
+            data = json.loads(f.read())
+
+        sequence = [Crawler.entry_to_node(entry) for entry in data]
+
+        logger.info("Login file number of requests %d", len(sequence))
+        return sequence
+
+    @staticmethod
+    def store_login_file(sequence: List[Node]) -> None:
+        logger = get_logger(__name__)
+
+        dt = datetime.now()
+        filename = f"./seeds/webFuzz_login" + \
+                   f"_{dt.day}-{dt.month}" + \
+                   f"_{dt.hour}:{dt.minute}.json"
+
+        logger.info("Writing login sequence to %s", filename)
+
+        with open(filename, "w+") as f:
+            json.dump([Crawler.node_to_entry(node) for node in sequence], f, indent=3)
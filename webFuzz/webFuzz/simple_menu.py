@@ -23,6 +23,8 @@ class Simple_menu:
     def __init__(self, 
                  print_to_file: bool):
 
+        self._print_to_file = print_to_file
+
         if print_to_file:
             f = open("/tmp/fuzzer_stats", "w+")
 
@@ -51,6 +53,7 @@ class Simple_menu:
         past_time = start_time
         past_count = 0
         throughput = 0
+        stage_report = []
 
         while env.shutdown_signal == ExitCode.NONE:
 
@@ -70,6 +73,9 @@ class Simple_menu:
                 logger.info("Total Cov: %0.4f, Throughput: %0.2f", \
                             fuzzer.stats.total_cover_score, throughput)
 
+                if self._print_to_file and fuzzer.profiler.enabled:
+                    stage_report = fuzzer.profiler.report()
+
             self.printer("webFuzz\n-----\n")
             self.printer("Stats\n")
 
@@ -81,6 +87,29 @@ class Simple_menu:
             self.printer('Total Coverage Score: {:0.4f}%'.format(fuzzer.stats.total_cover_score))
             self.printer('Possible XSS: {:d}'.format(fuzzer.stats.total_xss))
 
+            if len(fuzzer.targets) > 1:
+                self.printer('Replicas: {:s}'.format(', '.join(
+                             '{:s} ({:d} in-flight, {:d} total)'.format(r.name, r.in_flight, r.total_requests)
+                                for r in fuzzer.targets.replicas)))
+
+            if env.args.header_fast_path:
+                self.printer('Skipped Parses: {:d} ({:0.1f}%)'.format(
+                             fuzzer.stats.skipped_parses,
+                             100 * fuzzer.stats.skipped_parses / max(fuzzer.stats.total_requests, 1)))
+
+            if fuzzer.pipeline:
+                self.printer('Scheduled Requests: {:d} (Queued: {:d}, Awaiting Feedback: {:d})'.format(
+                             fuzzer.pipeline.in_flight,
+                             fuzzer.pipeline.request_queue_depth,
+                             fuzzer.pipeline.feedback_queue_depth))
+
+            if fuzzer.controller:
+                self.printer('Concurrency Limit: {:d}/{:d} (Last: {:s}, RTT: {:0.3f} sec)'.format(
+                             fuzzer.controller.limit,
+                             fuzzer.controller.max_limit,
+                             fuzzer.controller.last_decision,
+                             fuzzer.controller.last_rtt))
+
             self.printer('Executing link: {:s}'.format(fuzzer.stats.current_node.url[:105]))
             self.printer('Response time: {:0.2f} sec'.format(fuzzer.stats.current_node.exec_time))
 
@@ -89,6 +118,11 @@ class Simple_menu:
             else:
                 self.printer('State: Crawling')
 
+            if stage_report:
+                self.printer('\nStage times (ms):')
+                for line in stage_report:
+                    self.printer(line)
+
             self.printer_flush()
 
         print("Shut Down Initiated. Please wait, this may take a few seconds...")
@@ -0,0 +1,195 @@
+"""
+    A TargetPool spreads the requests of the fuzzer over several replicas
+    of the same instrumented web application (e.g. served on different ports
+    to spread the PHP-FPM load).
+
+    Nodes always carry the url of the primary target (the URL cli argument),
+    so the crawler and the corpus see a single application. Only when a request
+    is sent, its origin is swapped with the one of the chosen replica. Each replica
+    has its own ClientSession and connection pool, but they all share one cookie
+    jar, so that a cookie set (or rotated) by the application through one replica
+    is sent through all of them.
+"""
+from __future__ import annotations
+
+import aiohttp
+import inspect
+
+from aiohttp.client import ClientSession
+from bisect         import bisect
+from contextlib     import asynccontextmanager, AsyncExitStack
+from typing         import AsyncIterator, Dict, List, Optional, Tuple, Union
+from urllib.parse   import urlparse, urlunparse
+from yarl           import URL
+from zlib           import crc32
+
+from .environment   import env
+from .node          import Node
+from .types         import OutputMethod, Policy, Routing, get_logger
+from .misc          import rtt_trace_config
+
+# number of points each replica gets on the consistent hashing ring
+VIRTUAL_NODES = 64
+
+class Replica:
+    def __init__(self, origin: str):
+        url = urlparse(origin)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.in_flight = 0
+        self.total_requests = 0
+        self.session: Optional[ClientSession] = None
+
+    @property
+    def name(self) -> str:
+        return self.netloc
+
+    def rebase(self, url: str) -> str:
+        """
+            Point url to this replica
+        """
+        return urlunparse(urlparse(url)._replace(scheme=self.scheme, netloc=self.netloc))
+
+class PrimaryCookieJar(aiohttp.CookieJar):
+    """
+        Keeps and sends the cookies as if every request went to the primary
+        target, as the application sees the primary's Host either way
+    """
+    def __init__(self, primary: Replica):
+        super().__init__()
+        self._origin = URL(f"{primary.scheme}://{primary.netloc}")
+
+    def _as_primary(self, url: Union[str, URL]) -> URL:
+        url = URL(url)
+        if not url.is_absolute():
+            return url
+
+        return url.with_scheme(self._origin.scheme) \
+                  .with_host(self._origin.host) \
+                  .with_port(self._origin.explicit_port)
+
+    def update_cookies(self, cookies, response_url: URL = URL()) -> None:
+        super().update_cookies(cookies, self._as_primary(response_url))
+
+    def update_cookies_from_headers(self, headers, response_url: URL) -> None:
+        # used by newer aiohttp versions for the cookies of responses
+        super().update_cookies_from_headers(headers, self._as_primary(response_url))
+
+    def filter_cookies(self, request_url: URL = URL()):
+        return super().filter_cookies(self._as_primary(request_url))
+
+class TargetPool:
+    def __init__(self,
+                 primary_url: str,
+                 replicas: List[str] = [],
+                 routing: Routing = Routing.LEAST_LOADED):
+
+        self.primary = Replica(primary_url)
+        self.replicas: List[Replica] = [self.primary]
+
+        for origin in replicas:
+            replica = Replica(origin)
+            if replica.netloc != self.primary.netloc:
+                self.replicas.append(replica)
+
+        self.routing = routing
+
+        # consistent hashing ring of (point, replica index)
+        self._ring: List[Tuple[int, int]] = sorted(
+            (crc32(f"{replica.name}#{v}".encode()), i)
+                for (i, replica) in enumerate(self.replicas)
+                for v in range(VIRTUAL_NODES)
+        )
+        self._ring_points = [point for (point, _) in self._ring]
+
+        # where the least loaded routing starts looking, so that
+        # ties go round robin instead of always to the primary
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    @asynccontextmanager
+    async def sessions(self,
+                       cookies: Dict[str, str],
+                       headers: Dict[str, str],
+                       conn_count: int) -> AsyncIterator[TargetPool]:
+        """
+            Open one ClientSession per replica, all with the same cookie jar
+        """
+        logger = get_logger(__name__)
+        logger.info("New sessions to be created for %d replicas", len(self.replicas))
+
+        # timeout per link in seconds
+        timeout = aiohttp.ClientTimeout(total=env.args.request_timeout) # type: ignore
+
+        if len(self.replicas) > 1:
+            # make the application generate links for the primary
+            # target no matter which replica serves the request
+            headers = dict(headers, Host=self.primary.netloc)
+
+        if env.instrument_args.policy == Policy.PATH:
+            # the application cuts the path trace where the fuzzer stops reading
+            headers = dict(headers, **{"Trace-Limit": str(env.instrument_args.max_trace)})
+
+        session_args = {}
+        if env.instrument_args.output_method == OutputMethod.HTTP and \
+           "max_headers" in inspect.signature(ClientSession).parameters:
+            # newer aiohttp versions limit the number of response headers,
+            # which http instrumentation feedback easily exceeds
+            session_args["max_headers"] = env.instrument_args.max_headers()
+
+        cookie_jar = PrimaryCookieJar(self.primary)
+        cookie_jar.update_cookies(cookies)
+
+        async with AsyncExitStack() as stack:
+            for replica in self.replicas:
+                conn = aiohttp.TCPConnector(limit=conn_count,
+                                            limit_per_host=conn_count,
+                                            keepalive_timeout=env.args.keepalive_timeout)
+
+                replica.session = await stack.enter_async_context(
+                    aiohttp.ClientSession(cookie_jar=cookie_jar,
+                                          headers=headers,
+                                          connector=conn,
+                                          timeout=timeout,
+                                          trace_configs=[rtt_trace_config()],
+                                          **session_args))
+            try:
+                yield self
+            finally:
+                for replica in self.replicas:
+                    replica.session = None
+
+    def route(self, request: Node) -> Replica:
+        if len(self.replicas) == 1:
+            return self.primary
+
+        if self.routing == Routing.HASH:
+            point = crc32(request.url.encode())
+            index = bisect(self._ring_points, point) % len(self._ring)
+            return self.replicas[self._ring[index][1]]
+
+        count = len(self.replicas)
+        index = min(range(self._next, self._next + count),
+                    key=lambda i: self.replicas[i % count].in_flight) % count
+        self._next = index + 1
+
+        return self.replicas[index]
+
+    @asynccontextmanager
+    async def connect(self, request: Node) -> AsyncIterator[Tuple[ClientSession, str]]:
+        """
+            Choose a replica for request and return its session
+            together with the request url pointing to it
+        """
+        replica = self.route(request)
+
+        url = request.url if replica is self.primary else replica.rebase(request.url)
+
+        replica.in_flight += 1
+        replica.total_requests += 1
+        try:
+            yield (replica.session, url)
+        finally:
+            replica.in_flight -= 1
@@ -3,9 +3,13 @@ from __future__ import annotations
 
 import logging
 from logging import FileHandler
+from logging.handlers import QueueHandler, QueueListener
 
+from array        import array
 from tap          import Tap
-from typing       import Any, List, Dict, Set, Union, NamedTuple, Optional
+from typing       import Any, List, Dict, Set, Union, NamedTuple, Optional, Tuple
+from functools    import lru_cache
+from queue        import SimpleQueue
 from enum         import Enum
 from os           import mkdir, unlink, symlink
 from datetime     import datetime
@@ -76,6 +80,7 @@ class Statistics():
     crawler_pending_urls: int = 0
     total_requests: int = 0
     total_xss: int = 0
+    skipped_parses: int = 0
     current_node: Any # actual type: Node (error due to cyclic import)
     
     def __init__(self, initial_node):
@@ -89,12 +94,20 @@ class RunMode(ExtendedEnum):
     AUTO = "auto"
     MANUAL = "manual"
 
+class Routing(ExtendedEnum):
+    LEAST_LOADED = "least-loaded"
+    HASH = "hash"
+
+class SnapshotProfiler(ExtendedEnum):
+    CPROFILE = "cprofile"
+    YAPPI = "yappi"
+
 class Arguments(Tap):
     verbose: int = 0
     """Increase verbosity"""
 
     seed_file: Optional[str] = None
-    """Read initial URL seed from file"""
+    """Read initial URL seed from file (JSON array, JSON Lines or HAR), streamed as the crawler needs more links"""
 
     session: bool = False
     """Retrieve cookies from a browser session"""
@@ -102,8 +115,11 @@ class Arguments(Tap):
     catch_phrase: str = ""
     """Catch phrase to search for when checking if we are logged in"""
 
+    login_file: Optional[str] = None
+    """Replay the login requests stored in file to log back in when logged out"""
+
     proxy: bool = False
-    """Enable Proxy mode. Retrieves URLs executed from a browser session"""
+    """Enable Proxy mode. Retrieves URLs executed from a browser session (plain http only)"""
 
     proxy_port: int = 8090
     """Set the port the proxy should listen to"""
@@ -126,6 +142,60 @@ class Arguments(Tap):
     worker: int = 1
     """Specify the number of workers to spawn that will concurrently send requests"""
 
+    queue_size: int = 0
+    """Set the size of the request and feedback queues between the pipeline stages (Default is 2 x worker)"""
+
+    adaptive_concurrency: bool = False
+    """Adapt the number of in-flight requests (up to --worker) towards --latency_target"""
+
+    latency_target: float = 1.0
+    """Set the target response time in seconds used by --adaptive_concurrency"""
+
+    replica: List[str] = []
+    """Specify the origin of a replica of the target application to spread requests to, e.g. 'http://localhost:8081'"""
+
+    routing: Routing = Routing.LEAST_LOADED
+    """Select how requests are routed to the replicas. Modes: least-loaded, hash (consistent hashing of the base url)"""
+
+    keepalive_timeout: float = 15
+    """Set the time in seconds an idle keep-alive connection to the target is kept open"""
+
+    checkpoint: Optional[str] = None
+    """Periodically save the fuzzing state to this file"""
+
+    checkpoint_interval: int = 300
+    """Set the time in seconds between two checkpoints"""
+
+    resume: bool = False
+    """Restore the fuzzing state from the --checkpoint file before starting"""
+
+    event_log: Optional[str] = None
+    """Write a binary record of every request to this file (see tools/event_reader.py)"""
+
+    metrics_port: Optional[int] = None
+    """Serve metrics in the Prometheus text format at http://<metrics_host>:<metrics_port>/metrics"""
+
+    metrics_host: str = "127.0.0.1"
+    """Set the address the metrics endpoint listens on"""
+
+    profile_stages: bool = False
+    """Time each stage of the request cycle and print their percentiles (also shown in the file run mode stats)"""
+
+    profile_snapshot: Optional[SnapshotProfiler] = None
+    """Periodically dump profiler statistics of the event loop to ./log. Profilers: cprofile, yappi"""
+
+    profile_snapshot_interval: int = 60
+    """Set the time in seconds between two profiler snapshots"""
+
+    seed: Optional[int] = None
+    """Seed the random choices of the fuzzer to make runs repeatable"""
+
+    record: Optional[str] = None
+    """Record the responses and their instrumentation feedback to this file (gzip json lines)"""
+
+    replay: Optional[str] = None
+    """Process the responses recorded with --record, without sending any request, and print the results"""
+
     uniq_frag: bool = False
     """Treat urls with different fragments as different urls"""
 
@@ -135,6 +205,21 @@ class Arguments(Tap):
     request_timeout: int = 100
     """Set the per request timeout in seconds"""
 
+    max_body_size: int = 2048
+    """Set the maximum response body size in KB to read, larger bodies are truncated (0 for no limit)"""
+
+    feedback_inotify: bool = False
+    """Wait for the target to finish writing the feedback file (file output method) before reading it, using inotify"""
+
+    header_fast_path: bool = False
+    """Skip HTML parsing of responses that bring no new coverage, have no xss marker and whose base url is already crawled"""
+
+    path_ngram: int = 4
+    """Number of consecutive basic blocks hashed together into a path label (path instrument policy)"""
+
+    path_map_size: int = 65536
+    """Number of path labels to fold the path hashes into (path instrument policy)"""
+
     run_mode: RunMode = RunMode.SIMPLE
     """Select the run mode. Modes: auto, manual, simple, file"""
 
@@ -165,6 +250,9 @@ class Arguments(Tap):
         self.add_argument('-b', '--block', type=Arguments.parse_single_block_opt, action='append')
         self.add_argument('-w', '--worker')
         self.add_argument('-r', '--run_mode', type=RunMode)
+        self.add_argument('--replica', action='append')
+        self.add_argument('--routing', type=Routing)
+        self.add_argument('--profile_snapshot', type=SnapshotProfiler)
         self.add_argument('URL')
 
         self.add_argument('--version', help="Prints webFuzz latest version", action='version',
@@ -175,6 +263,12 @@ class Arguments(Tap):
 
 # Instrumentation should output a instr.meta file with this format.
 # This is needed to calculate the coverage stats.
+# longest path trace looked at, in basic blocks per block of the application
+PATH_TRACE_FACTOR = 16
+
+# response headers of the application itself, on top of the feedback headers
+EXTRA_HEADERS = 100
+
 INSTR_META_SCHEMA = {
     "title": "instrument-meta",
     "type": "object",
@@ -186,9 +280,11 @@ INSTR_META_SCHEMA = {
         },
         "instrument-policy": {
             "type": "string",
-            "pattern": "^(edge|node-edge|node)$"
+            "pattern": "^(edge|node-edge|node|path)$"
         },
-        "edge-count": { "type": "integer"}
+        "edge-count": { "type": "integer"},
+        "map-size": { "type": "integer", "minimum": 1},
+        "feedback-dir": { "type": "string"}
     },
     "required": ["basic-block-count", "output-method", "instrument-policy"]
 }
@@ -201,12 +297,16 @@ class Policy(ExtendedEnum):
     NODE = 0
     EDGE = 1
     NODE_EDGE = 2
+    PATH = 3
 
 class InstrumentArgs():
     basic_blocks: int
     edges: int
     output_method: OutputMethod
     policy: Policy
+    feedback_dir: str
+    map_size: Optional[int]
+    max_trace: Optional[int]
 
     def __init__(self, meta_json):
         validate(instance=meta_json, schema=INSTR_META_SCHEMA)
@@ -214,35 +314,95 @@ class InstrumentArgs():
         self.basic_blocks = int(meta_json['basic-block-count'])
         self.output_method = OutputMethod[meta_json['output-method'].upper()]
         self.policy = Policy[meta_json['instrument-policy'].upper().replace('-', '_')]
+        # where the file output method writes the maps
+        self.feedback_dir = meta_json.get('feedback-dir', '/var/instr')
 
-        if self.policy != Policy.NODE:
+        if self.policy in (Policy.EDGE, Policy.NODE_EDGE):
             self.edges = int(meta_json['edge-count'])
 
+        # with dense block ids (instrumentor --map-size) the edge
+        # labels are known to be in [0, map-size)
+        self.map_size = meta_json.get('map-size')
+        if self.map_size is not None and self.policy == Policy.EDGE:
+            self.edges = int(self.map_size)
+        else:
+            self.map_size = None
+
+        # a path trace has an entry for every block executed, so loops
+        # make it as long as they like. Only its start is looked at
+        self.max_trace = None
+        if self.policy == Policy.PATH:
+            self.max_trace = max(10000, PATH_TRACE_FACTOR * self.basic_blocks)
+
+    def new_bitmap(self) -> Optional[array]:
+        """
+            :return: a zeroed word for each edge label of a dense map,
+                     none if the labels are sparse
+        """
+        if self.map_size is None:
+            return None
+
+        return array('H', bytes(2 * self.map_size))
+
+    def max_headers(self) -> int:
+        """
+            :return: the number of response headers the http output method can send,
+                     the responses of a longer path trace are rejected by the client
+        """
+        if self.max_trace is not None:
+            return self.max_trace + EXTRA_HEADERS
+
+        return max(10000, self.basic_blocks)
+
 # Logging
 
 class FuzzerLogger(logging.Logger):
+    # writes the queued log records to the log file
+    _listener: Optional[QueueListener] = None
 
     @staticmethod
     def init_logging(args: Arguments) -> None:
     
         logging.setLoggerClass(FuzzerLogger)
+
+        # the log format does not use them, so skip
+        # collecting them for every record
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
         
         file_handler = FuzzerLogger.mk_file_handler()
 
+        # formatting and writing the records is left to a background
+        # thread, the fuzzer only puts them in a queue
+        log_queue: SimpleQueue = SimpleQueue()
+        FuzzerLogger.stop_logging()
+        FuzzerLogger._listener = QueueListener(log_queue, file_handler)
+        FuzzerLogger._listener.start()
+
         # initialize root logger and let descendant module loggers
         # propagate their logs to root module handlers
         # note: descendant loggers will inherit root's log level
         # see: https://docs.python.org/3/_images/logging_flow.png
 
         rootLogger = get_logger()
-        rootLogger.addHandler(file_handler)
+        rootLogger.addHandler(DeferredQueueHandler(log_queue))
 
         levels = [logging.ERROR,
                   logging.WARNING,
                   logging.INFO,
                   logging.DEBUG]
 
-        rootLogger.setLevel(levels[min(args.verbose, 4)])
+        rootLogger.setLevel(levels[min(args.verbose, 3)])
+
+    @staticmethod
+    def stop_logging() -> None:
+        """
+            Write out the queued records and stop the writer thread
+        """
+        if FuzzerLogger._listener:
+            FuzzerLogger._listener.stop()
+            FuzzerLogger._listener = None
 
     @staticmethod
     def mk_file_handler() -> FileHandler:
@@ -273,11 +433,25 @@ class FuzzerLogger(logging.Logger):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+@lru_cache(maxsize=None)
 def get_logger(name: str = "", worker_id: str = "") -> FuzzerLogger:
+    """
+        Loggers live for the whole run, so they are looked up only once per name and worker
+    """
     name += "/" + worker_id if worker_id else ""
 
     return logging.getLogger(name) # type: ignore
 
+class DeferredQueueHandler(QueueHandler):
+    """
+        Only merges the arguments into the message before queueing the record
+        (as they may change afterwards), the formatting of the line happens
+        in the listener thread
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
 
 class CustomFormatter(logging.Formatter):
     """
@@ -299,20 +473,32 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: bold_red
     }
     
-    default_fmt = "[%(asctime)s] %(name)s %(levelname)s %(funcName)s(%(lineno)d) %(message)s"
+    default_fmt = "[%(asctime)s] %(logname)s %(levelname)s %(worker)s%(funcName)s(%(lineno)d) %(message)s"
 
-    def format(self, record):
+    def __init__(self):
+        super().__init__(self.default_fmt)
+
+        self._formatters = {
+            level: logging.Formatter(color + self.default_fmt + self.reset)
+                for (level, color) in self.level_color.items()
+        }
+        # logger name -> (module name, worker tag)
+        self._names: Dict[str, Tuple[str, str]] = {}
+
+    def _split_name(self, name: str) -> Tuple[str, str]:
         # workers use a different logger name format
         # format: {actual logger name}/id
-        if '/' in record.name:
-            (logname, work_id) = record.name.split('/')
-            record.name = logname
-            worker_fmt = f"[%(asctime)s] %(name)s %(levelname)s [Worker {work_id}] %(funcName)s(%(lineno)d) %(message)s"
-            format_str = worker_fmt
-        else:
-            format_str = self.default_fmt
+        if name not in self._names:
+            (logname, _, work_id) = name.partition('/')
+            self._names[name] = (logname, f"[Worker {work_id}] " if work_id else "")
+
+        return self._names[name]
+
+    def format(self, record):
+        (record.logname, record.worker) = self._split_name(record.name)
 
-        fmt = self.level_color[record.levelno] + format_str + self.reset
+        formatter = self._formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
 
-        formatter = logging.Formatter(fmt)
         return formatter.format(record)
@@ -1,60 +1,73 @@
-import asyncio
-import logging
+import codecs
 
-from aiohttp      import ClientSession,ClientResponse
+from aiohttp      import ClientResponse
 from bs4          import BeautifulSoup
-from typing       import Generator, Union, Optional, Dict, Iterator, AsyncIterator
-from itertools    import repeat
+from typing       import Generator, Union, Optional, Dict, Iterator, AsyncIterator, NamedTuple, List, Tuple
 from contextlib   import asynccontextmanager
 
 # User defined modules
 from .environment   import env
 from .node          import Node
-from .types         import FuzzerLogger, get_logger, HTTPMethod, RequestStatus, Statistics, ExitCode, UnimplementedHttpMethod, InvalidContentType, InvalidHttpCode, XSSConfidence
-from .misc          import iter_join, lazyFunc
-from .mutator       import Mutator
+from .types         import FuzzerLogger, get_logger, HTTPMethod, RequestStatus, Statistics, ExitCode, UnimplementedHttpMethod, InvalidContentType, InvalidHttpCode, XSSConfidence, CFGTuple, OutputMethod, Label
 from .node_iterator import NodeIterator
 from .crawler       import Crawler
 from .parser        import Parser
-from .detector      import Detector
-from .browser       import Browser
-
-# every how many requests to check if
-# we are logged in
-LOGGED_IN_CHECK_INTERVAL = 50
+from .detector      import Detector, MarkerScanner
+from .target_pool   import TargetPool
+from .metrics       import Metrics
+from .profiler      import StageProfiler
+from .feedback_reader import FeedbackReader
+
+READ_CHUNK_SIZE = 64 * 1024
+# number of leading bytes checked for binary content
+BINARY_SNIFF_SIZE = 1024
+
+# number of response body characters to write in debug logs
+LOG_BODY_SIZE = 4096
+
+class Response(NamedTuple):
+    request: Node
+    status: int
+    raw_html: str
+    has_marker: bool
+    cfg: CFGTuple
+    # the raw instrumentation feedback, only kept when recording
+    feedback: Optional[List[Tuple[Label, str]]] = None
 
 class Worker():
     def __init__(self,
                  id_: str, 
-                 session: ClientSession, 
+                 targets: TargetPool, 
                  crawler: Crawler, 
-                 mutator: Mutator,
                  parser: Parser,
                  detector: Detector,
                  iterator: NodeIterator,
-                 session_node: Node,
-                 statistics: Statistics):
+                 statistics: Statistics,
+                 metrics: Optional[Metrics] = None,
+                 profiler: Optional[StageProfiler] = None,
+                 feedback_reader: Optional[FeedbackReader] = None):
 
         self.id = id_
-        self._session = session
+        self._targets = targets
         self._crawler = crawler
-        self._mutator = mutator
         self._parser = parser
         self._detector = detector
         self._node_iterator = iterator
-        self._session_node = session_node
         self._stats = statistics
+        self._metrics = metrics or Metrics()
+        self._profiler = profiler or StageProfiler()
+        self._feedback_reader = feedback_reader or FeedbackReader()
 
-    @property
-    def asyncio_task(self) -> Optional[asyncio.Task]:
-        if hasattr(self, "_task"):
-            return self._task
-        else:
-            return None
+        # sequence number of the last request sent
+        self._seq = 0
 
-    def async_run(self):
-        self._task = asyncio.create_task(self.run_worker())
-        return self._task
+    def next_req_id(self) -> str:
+        """
+            :return: a REQ-ID unique to this request, the instrumented
+                     application names the map file of the request after it
+        """
+        self._seq += 1
+        return f"{self.id}-{self._seq}"
 
     def update_stats(self, current_node: Node):
         self._stats.total_cover_score = self._node_iterator.total_cover_score
@@ -73,121 +86,226 @@ class Worker():
         return False
 
     @asynccontextmanager
-    async def http_send(self, new_request: Node) -> AsyncIterator[ClientResponse]:
+    async def http_send(self, new_request: Node, req_id: str) -> AsyncIterator[ClientResponse]:
         logger = get_logger(__name__, self.id)
 
-        if new_request.method == HTTPMethod.GET:
-            aiohttp_send = self._session.get
-        elif new_request.method == HTTPMethod.POST:
-            aiohttp_send = self._session.post
-        else:
+        if new_request.method not in (HTTPMethod.GET, HTTPMethod.POST):
             logger.error("Unimplemented HTTP method")
             raise UnimplementedHttpMethod(new_request.method)
 
-        logger.info("sending request: %s", new_request.url)
+        async with self._targets.connect(new_request) as (session, url):
+            if new_request.method == HTTPMethod.GET:
+                aiohttp_send = session.get
+            else:
+                aiohttp_send = session.post
+
+            logger.info("sending request: %s", url)
+
+            async with aiohttp_send(url,
+                                    headers={ 'REQ-ID' : req_id},
+                                    params=new_request.params[HTTPMethod.GET],
+                                    data=new_request.params[HTTPMethod.POST],
+                                    trace_request_ctx=new_request) as r:
+
+                self._stats.total_requests += 1
+                self._metrics.requests.inc()
+                self._metrics.request_latency.observe(new_request.exec_time)
 
-        async with aiohttp_send(new_request.url,
-                                headers={ 'REQ-ID' : self.id},
-                                params=new_request.params[HTTPMethod.GET],
-                                data=new_request.params[HTTPMethod.POST],
-                                trace_request_ctx=new_request) as r:
+                if r.content_type and r.content_type.lower() != 'text/html':
+                    raise InvalidContentType(r.content_type)
 
-            self._stats.total_requests += 1
+                if r.status >= 400:
+                    logger.info('Got code %d from %s', r.status, r.url)
 
-            if r.content_type and r.content_type.lower() != 'text/html':
-                raise InvalidContentType(r.content_type)
+                    if env.args.ignore_404 and r.status == 404:
+                        raise InvalidHttpCode(404)
 
-            if r.status >= 400:
-                logger.info('Got code %d from %s', r.status, r.url)
+                    if env.args.ignore_4xx:
+                        raise InvalidHttpCode(r.status)
 
-                if env.args.ignore_404 and r.status == 404:
-                    raise InvalidHttpCode(404)
+                yield r
 
-                if env.args.ignore_4xx:
-                    raise InvalidHttpCode(r.status)
+    async def read_body(self, r: ClientResponse) -> Tuple[str, bool]:
+        """
+            Stream the response body in chunks, decoding it and scanning
+            it for the xss marker as it arrives. Bodies larger than
+            --max_body_size are truncated and binary bodies are rejected.
 
-            yield r
+            :return: the decoded body and if it contains the xss marker
+        """
+        logger = get_logger(__name__, self.id)
 
-    async def process_req(self, request: Node) -> RequestStatus:
+        max_size = env.args.max_body_size * 1024
+        try:
+            decoder = codecs.getincrementaldecoder(r.charset or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        scanner = MarkerScanner()
+
+        chunks: List[str] = []
+        size = 0
+        first = True
+
+        async for chunk in r.content.iter_chunked(READ_CHUNK_SIZE):
+            if first and b'\x00' in chunk[:BINARY_SNIFF_SIZE]:
+                # php defaults to text/html even when serving binary files
+                raise InvalidContentType("binary")
+            first = False
+
+            if max_size and size + len(chunk) > max_size:
+                chunk = chunk[:max_size - size]
+
+            size += len(chunk)
+            text = decoder.decode(chunk)
+            scanner.feed(text)
+            chunks.append(text)
+
+            if max_size and size >= max_size:
+                logger.info("Response body truncated to %d KB", env.args.max_body_size)
+                # the rest of the body is not read so
+                # the connection cannot be reused
+                r.close()
+                break
+
+        text = decoder.decode(b'', final=True)
+        scanner.feed(text)
+        chunks.append(text)
+
+        return ("".join(chunks), scanner.found)
+
+    def read_feedback(self, request: Node, r: ClientResponse, req_id: str) -> Tuple[CFGTuple, Optional[List[Tuple[Label, str]]]]:
+        """
+            :return: the parsed instrumentation feedback of the headers
+                     and, when recording (--record), the raw one
+        """
+        if not env.args.record:
+            return (request.parse_instrumentation(r.headers, req_id), None)
+
+        feedback = list(Node.read_instrumentation(r.headers, req_id))
+        return (request.parse_feedback(feedback), feedback)
+
+    async def fetch(self, request: Node) -> Response:
+        """
+            Send the request and collect everything needed by the
+            feedback stage, so that the connection can be released early
+        """
+        logger = get_logger(__name__, self.id)
+        profiler = self._profiler
+        # each request has its own map file, so
+        # requests of a worker may overlap
+        req_id = self.next_req_id()
+
+        if env.instrument_args.output_method != OutputMethod.HTTP:
+            self._feedback_reader.expect(req_id)
+
+        try:
+            async with self.http_send(request, req_id) as r:
+                if env.instrument_args.output_method == OutputMethod.HTTP:
+                    # feedback is complete once the headers arrive
+                    start = profiler.now()
+                    (cfg, feedback) = self.read_feedback(request, r, req_id)
+                    profiler.record("instrumentation", start)
+
+                start = profiler.now()
+                (raw_html, has_marker) = await self.read_body(r)
+                profiler.record("read_body", start)
+
+                logger.debug("Response body: %.*s", LOG_BODY_SIZE, raw_html)
+
+                if env.instrument_args.output_method != OutputMethod.HTTP:
+                    start = profiler.now()
+                    file_feedback = await self._feedback_reader.read(req_id)
+                    cfg = request.parse_feedback(file_feedback)
+                    feedback = file_feedback if env.args.record else None
+                    profiler.record("instrumentation", start)
+
+                return Response(request=request,
+                                status=r.status,
+                                raw_html=raw_html,
+                                has_marker=has_marker,
+                                cfg=cfg,
+                                feedback=feedback)
+        except BaseException:
+            if env.instrument_args.output_method != OutputMethod.HTTP:
+                # the map of a failed (or cancelled) request is never read
+                self._feedback_reader.discard(req_id)
+            raise
+
+    def can_skip_parsing(self, response: Response) -> bool:
+        """
+            A response needs no HTML parsing if it brings no new coverage,
+            contains no xss marker and its links have already been collected
+            from another response of the same base url
+        """
+        return not response.has_marker and \
+               self._crawler.is_crawled(response.request) and \
+               not self._node_iterator.has_new_coverage(response.cfg)
+
+    def process_response(self, response: Response) -> RequestStatus:
         logger = get_logger(__name__, self.id)
 
-        async with self.http_send(request) as r:
-            raw_html: str = await r.text()
+        request = response.request
+        raw_html = response.raw_html
 
-            logger.debug(raw_html)
+        metrics = self._metrics
+        profiler = self._profiler
 
-            if request.label == 'session_check':
-                # special node to check if we are logged in
-                if Worker.has_catchphrase(raw_html, env.args.catch_phrase):
-                    logger.info("Success, we are still logged in")
-                    return RequestStatus.SUCCESS_FOUND_PHRASE
+        if env.args.header_fast_path and self.can_skip_parsing(response):
+            # still offer it to the corpus, as it may be lighter
+            # than the nodes that currently hold its buckets
+            start = profiler.now()
+            self._node_iterator.add(request, response.cfg)
+            metrics.merge_time.observe(profiler.record("corpus_merge", start) / 1e9)
 
-            # html5lib parser is the most identical method to how browsers parse HTMLs
-            soup = lazyFunc(BeautifulSoup, raw_html, "html5lib")
+            self._stats.skipped_parses += 1
+            self._metrics.skipped_parses.inc()
+            self.update_stats(request)
 
-            if self._detector.xss_precheck(raw_html):
-                self._detector.xss_scanner(request, next(soup))
+            logger.info("Request Completed without parsing: %s", request)
+            return RequestStatus.SUCCESS_NOT_INTERESTING
 
-            cfg = request.parse_instrumentation(r.headers, self.id)
+        start = profiler.now()
+        # html5lib parser is the most identical method to how browsers parse HTMLs
+        soup = BeautifulSoup(raw_html, "html5lib")
+        parse_ns = profiler.record("html_parse", start)
 
-            status = RequestStatus.SUCCESS_NOT_INTERESTING
-            
-            self._node_iterator.add(request, cfg)
-            links = self._parser.parse(request, next(soup))
-            self._crawler += links
+        if response.has_marker:
+            start = profiler.now()
+            self._detector.xss_scanner(request, soup)
+            metrics.detector_time.observe(profiler.record("xss_scanner", start) / 1e9)
 
-            status = RequestStatus.SUCCESS_INTERESTING
+        status = RequestStatus.SUCCESS_NOT_INTERESTING
+        
+        start = profiler.now()
+        self._node_iterator.add(request, response.cfg)
+        metrics.merge_time.observe(profiler.record("corpus_merge", start) / 1e9)
 
-            self.update_stats(request)
+        start = profiler.now()
+        links = self._parser.parse(request, soup)
+        parse_ns += profiler.record("link_parse", start)
+        metrics.parse_time.observe(parse_ns / 1e9)
 
-            logger.info("Request Completed: %s", request)
-            if (request._xss_confidence > XSSConfidence['NONE']):
-                logger.warning("Suspicious request %s", request)
+        start = profiler.now()
+        self._crawler += links
+        self._crawler.mark_crawled(request)
+        profiler.record("crawler_add", start)
 
-            return status
-    
-    async def run_worker(self) -> ExitCode:
+        status = RequestStatus.SUCCESS_INTERESTING
+
+        self.update_stats(request)
+
+        logger.info("Request Completed: %s", request)
+        if (request._xss_confidence > XSSConfidence['NONE']):
+            logger.warning("Suspicious request %s", request)
+
+        return status
+
+    def is_logged_in(self, response: Response) -> bool:
         logger = get_logger(__name__, self.id)
-        logger.info("Worker reporting Active")
-
-        if env.args.catch_phrase:
-            periodic = repeat(self._session_node)
-        else:
-            # create an empty iterator
-            periodic = repeat(None, 0)
-
-        for (src, new_request) in iter_join(primary=self._crawler,
-                                            secondary=self._node_iterator, 
-                                            periodic=periodic,
-                                            interval=LOGGED_IN_CHECK_INTERVAL):
-            if src == self._crawler:
-                logger.info("Chosen an unvisited node")
-
-            elif src == self._node_iterator:
-                # this request isn't new i.e. it came from NodeIterator
-                # thus needs to be mutated first
-                new_request = self._mutator.mutate(new_request, 
-                                                   self._node_iterator.node_list)
-                logger.info("Chosen a mutated node")
-
-            try:
-                return_code = await self.process_req(new_request)
-            except Exception as e:
-                if env.args.http_error_at_info:
-                    logger.info(e, exc_info=False)
-                else:
-                    logger.warning(e, exc_info=False)
-
-                return_code = RequestStatus.UNSUCCESSFUL_REQUEST
-            
-            if src == periodic and \
-                return_code != RequestStatus.SUCCESS_FOUND_PHRASE:
-                logger.warning("Fuzzer has been logged out...")
-
-                return ExitCode.LOGGED_OUT
-
-            if env.shutdown_signal != ExitCode.NONE:
-                return env.shutdown_signal
-
-        logger.error("Aborting due to lack of fuzz targets")
-        return ExitCode.EMPTY_QUEUE
+
+        if Worker.has_catchphrase(response.raw_html, env.args.catch_phrase):
+            logger.info("Success, we are still logged in")
+            return True
+
+        logger.warning("Fuzzer has been logged out...")
+        return False